@@ -1,18 +1,60 @@
-from fastapi import FastAPI, Request, HTTPException
+import time
+# Taken before the framework and model imports so worker startup time covers them too
+_startup_started = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import List, Optional
+import asyncio
+import importlib
 import os
-import joblib
-import pandas as pd
-import numpy as np
 import logging
-from pydantic import BaseModel
-from typing import List
+import threading
+_framework_imported = time.perf_counter()
+
+# These stay light: pandas and sklearn are imported only when a code path needs them
+from api.cache import PricingCache
+from api.catalog import ProductCatalog, UnknownProduct
+from api.coalescer import RequestCoalescer
+from api.compiled_forest import compiled_artifact_path, export_compiled_model
+from api.customer_store import CustomerStore, PrecomputedCLV
+from api.executor import ScoringExecutor, ScoringQueueFull, timing_headers
+from api.metrics import REGISTRY, MetricsMiddleware, observe_stage, process_memory_kb
+from api.model_registry import ModelRegistry, TEST_CUSTOMER, validate_engine
+from api.models import CustomerData, BatchCustomerData, CustomerLookupData, ProductPricingData
+from api.parallel_scoring import ParallelScorer
+from api.pricing_engine import PricingEngine, rows_from_columns
+from api.profiling import ProfilerBusy, ProfilingMiddleware, ProfilingService, current_request_profile
+from api.serialization import JSON, FastJSONResponse, columns_response, negotiate, not_acceptable
+from api.streaming import RequestBodyStreamingResponse, stream_format, stream_prices
+
+# Startup phases in seconds; model and data loading is added by load_services()
+startup_timings = {
+    "framework_import": round(_framework_imported - _startup_started, 3),
+    "app_import": round(time.perf_counter() - _framework_imported, 3)
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background so the server binds and answers /health right away
+    start_loading()
+    yield
+    if services_ready():
+        model_registry.stop()
+        scoring_executor.shutdown(wait=False)
 
 # Initialize app
-app = FastAPI(title="Dynamic Pricing Engine")
+app = FastAPI(title="Dynamic Pricing Engine", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+# Admin-only; off unless PRICING_PROFILING=1 and PRICING_ADMIN_TOKEN are set
+profiling_service = ProfilingService.from_env()
+if profiling_service.enabled:
+    app.add_middleware(ProfilingMiddleware, service=profiling_service)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,148 +69,495 @@ app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 # Configure templates
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
-# Pydantic models
-class CustomerData(BaseModel):
-    Recency: float
-    Frequency: float
-    MonetaryValue: float
-    Tenure: float
-    AvgDaysBetweenPurchases: float
-    Age: float
-    UniqueProductsCount: float
-    product_cost: float = 50.0
-
-class BatchCustomerData(BaseModel):
-    customers: List[CustomerData]
-
-# Pricing Engine Class
-class PricingEngine:
-    def __init__(self, model_path: str, base_price: float = 100.0):
-        self.model_path = model_path
-        self.base_price = base_price
-        self.model = self._load_model()
-        
-    def _load_model(self):
-        try:
-            model = joblib.load(self.model_path)
-            logger.info(f"Successfully loaded model from {self.model_path}")
-            return model
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            raise RuntimeError(f"Model loading failed: {str(e)}")
-    
-    def calculate_clv(self, customer_data: dict) -> float:
-        try:
-            input_df = pd.DataFrame([customer_data])
-            required_features = ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
-                               'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount']
-            missing_features = set(required_features) - set(input_df.columns)
-            if missing_features:
-                raise ValueError(f"Missing required features: {missing_features}")
-                
-            clv = self.model.predict(input_df[required_features])[0]
-            return max(0, clv)
-        except Exception as e:
-            logger.error(f"CLV calculation failed: {str(e)}")
-            raise RuntimeError(f"CLV calculation error: {str(e)}")
-    
-    def calculate_dynamic_price(self, customer_data: dict, product_cost: float = 50.0) -> dict:
-        try:
-            clv = self.calculate_clv(customer_data)
-            clv_factor = self._normalize_clv(clv)
-            dynamic_price = max(product_cost * 1.1, self.base_price * clv_factor)
-            
-            return {
-                "base_price": self.base_price,
-                "dynamic_price": round(dynamic_price, 2),
-                "clv": round(clv, 2),
-                "price_adjustment_factor": round(clv_factor, 2),
-                "min_price": round(product_cost * 1.1, 2),
-                "profit_margin": round((dynamic_price - product_cost) / dynamic_price * 100, 2)
-            }
-        except Exception as e:
-            logger.error(f"Price calculation failed: {str(e)}")
-            raise RuntimeError(f"Price calculation error: {str(e)}")
-    
-    def _normalize_clv(self, clv: float) -> float:
-        low_clv = 100
-        high_clv = 1000
-        normalized = np.clip((clv - low_clv) / (high_clv - low_clv), 0, 1)
-        return 0.8 + (0.4 * normalized)
-
 # Initialize pricing engine
-try:
+def create_engine(model_path: str) -> PricingEngine:
+    """Build a PricingEngine (with its own cache) from the environment configuration"""
+    cache_size = int(os.getenv("PRICING_CACHE_SIZE", "10000"))
+    cache_quantum = os.getenv("PRICING_CACHE_QUANTUM")
+    pricing_cache = PricingCache(
+        max_size=cache_size,
+        ttl=float(os.getenv("PRICING_CACHE_TTL", "300")),
+        quantum=float(cache_quantum) if cache_quantum else None
+    ) if cache_size > 0 else None
+    mmap_compiled = os.getenv("PRICING_MODEL_MMAP", "0") == "1"
+    surrogate_tolerance = os.getenv("PRICING_SURROGATE_TOLERANCE")
+    if mmap_compiled:
+        export_compiled_model(model_path)
+    return PricingEngine(
+        model_path=model_path,
+        base_price=100.0,
+        fast_path=os.getenv("PRICING_FAST_PATH", "1") == "1",
+        compile_forest=os.getenv("PRICING_COMPILE_FOREST", "1") == "1",
+        cache=pricing_cache,
+        mmap_compiled=mmap_compiled,
+        surrogate_tolerance=float(surrogate_tolerance) if surrogate_tolerance else None,
+        segment_pricing=os.getenv("PRICING_CLV_SEGMENTS", "0") == "1"
+    )
+
+# Set by load_services() once the model and data stores are loaded
+model_registry: Optional[ModelRegistry] = None
+scoring_executor: Optional[ScoringExecutor] = None
+request_coalescer: Optional[RequestCoalescer] = None
+customer_store: Optional[CustomerStore] = None
+precomputed_clv: Optional[PrecomputedCLV] = None
+product_catalog: Optional[ProductCatalog] = None
+worker_startup_seconds: Optional[float] = None
+_loading: Optional[Future] = None
+_loading_lock = threading.Lock()
+
+def _timed_phase(name: str, started: float) -> float:
+    now = time.perf_counter()
+    startup_timings[name] = round(now - started, 3)
+    return now
+
+def load_services():
+    """Load the model and data stores (blocking); the pricing endpoints wait for this"""
+    global model_registry, scoring_executor, request_coalescer, customer_store, precomputed_clv, product_catalog
+    global worker_startup_seconds
+    started = time.perf_counter()
     model_path = str(BASE_DIR / "models/clv_model.pkl")
-    pricing_engine = PricingEngine(model_path=model_path, base_price=100.0)
+    if os.getenv("PRICING_MODEL_MMAP", "0") != "1" or not os.path.exists(compiled_artifact_path(model_path)):
+        # Unpickling the forest imports sklearn anyway; time it on its own
+        importlib.import_module("sklearn.ensemble")
+        started = _timed_phase("ml_import", started)
+    registry = ModelRegistry(create_engine, model_path)
+    registry.load()
+    started = _timed_phase("model_load", started)
+
+    executor = ScoringExecutor(
+        registry.engine,
+        mode=os.getenv("PRICING_EXECUTOR", "thread"),
+        max_workers=int(os.getenv("PRICING_WORKERS", "4")),
+        max_queue=int(os.getenv("PRICING_QUEUE_DEPTH", "64")),
+        fanout=ParallelScorer.from_env(registry.engine)
+    )
+    coalescer = RequestCoalescer(
+        executor,
+        max_wait_ms=float(os.getenv("PRICING_COALESCE_MAX_WAIT_MS", "2")),
+        max_batch_size=int(os.getenv("PRICING_COALESCE_MAX_BATCH", "64"))
+    ) if os.getenv("PRICING_COALESCE", "0") == "1" else None
+    registry.on_swap(executor.replace_engine)
+    started = _timed_phase("executor_start", started)
+
+    customer_features_path = os.getenv(
+        "PRICING_CUSTOMER_FEATURES", str(BASE_DIR / "data/processed/clv_preprocessed_data.csv"))
+    if customer_features_path and os.path.exists(customer_features_path):
+        customer_store = CustomerStore(customer_features_path)
+        customer_store.load()
+    elif customer_features_path:
+        logger.warning(f"Customer features {customer_features_path} not found, lookup by CustomerID disabled")
+    started = _timed_phase("customer_features_load", started)
+
+    clv_table_path = os.getenv("PRICING_CLV_TABLE", str(BASE_DIR / "results/clv_table.joblib"))
+    if clv_table_path and os.path.exists(clv_table_path):
+        precomputed_clv = PrecomputedCLV(clv_table_path)
+        precomputed_clv.load()
+    started = _timed_phase("clv_table_load", started)
+
+    catalog_path = os.getenv("PRICING_PRODUCT_CATALOG", str(BASE_DIR / "data/processed/product_data.csv"))
+    if catalog_path and os.path.exists(catalog_path):
+        product_catalog = ProductCatalog.from_csv(catalog_path)
+    elif catalog_path:
+        logger.warning(f"Product catalog {catalog_path} not found, pricing by product_id disabled")
+    _timed_phase("product_catalog_load", started)
+
+    registry.watch(float(os.getenv("PRICING_MODEL_WATCH_INTERVAL", "0")))
+    if coalescer is not None:
+        REGISTRY.register_histogram("pricing_coalesced_batch_size", "Requests per coalesced model call",
+                                    coalescer.batch_sizes)
+        REGISTRY.register_histogram("pricing_coalesce_wait_ms", "Time requests waited for a coalesced batch",
+                                    coalescer.coalesce_wait_ms)
+    scoring_executor, request_coalescer = executor, coalescer
+    # Assigned last: a non-None registry is what marks the services as ready
+    model_registry = registry
+    worker_startup_seconds = startup_timings["total"] = round(time.perf_counter() - _startup_started, 3)
     logger.info("Pricing engine initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize pricing engine: {str(e)}")
-    raise RuntimeError("Could not start application - pricing engine failed")
+    logger.info(f"Worker {os.getpid()} ready in {worker_startup_seconds}s {startup_timings}, "
+                f"memory: {process_memory_kb()}")
+
+def start_loading() -> Future:
+    """Start load_services() on a background thread once; later calls return the same future.
+
+    A plain Future rather than an asyncio task, so it can be awaited from any event loop
+    (TestClient without a context manager runs each request on a fresh one).
+    """
+    global _loading
+    with _loading_lock:
+        if _loading is None:
+            _loading = Future()
+
+            def run():
+                try:
+                    load_services()
+                    _loading.set_result(None)
+                except Exception as e:
+                    logger.error(f"Failed to initialize pricing engine: {str(e)}")
+                    _loading.set_exception(e)
+
+            threading.Thread(target=run, name="startup", daemon=True).start()
+        return _loading
+
+def services_ready() -> bool:
+    return model_registry is not None
+
+async def require_ready():
+    """Dependency for endpoints that need the model: waits for startup, 503 if it failed"""
+    if services_ready():
+        return
+    try:
+        await asyncio.wrap_future(start_loading())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Pricing engine failed to start: {str(e)}")
 
 # Routes
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/api/calculate_price/")
-async def calculate_price(customer: CustomerData):
+def observe_parse(request: Request):
+    """Time from the request reaching the app until the handler runs: routing, body read and validation"""
+    started = getattr(request.state, "request_started", None)
+    if started is not None:
+        observe_stage("parse", started)
+
+def timed_json(content, **kwargs) -> JSONResponse:
+    """Fast JSON response whose serialization time is recorded as the 'serialize' stage"""
+    started = time.perf_counter()
+    response = FastJSONResponse(content, **kwargs)
+    observe_stage("serialize", started)
+    return response
+
+def timed_columns(media_type: str, columns: dict, rows: int, **kwargs) -> Response:
+    """Column-oriented response (see api.serialization), timed like timed_json"""
+    started = time.perf_counter()
+    response = columns_response(media_type, columns, rows, **kwargs)
+    observe_stage("serialize", started)
+    return response
+
+def count_error(endpoint: str, error: Exception):
+    REGISTRY.inc("pricing_errors_total", endpoint=endpoint, type=type(error).__name__)
+
+def resolve_products(customers: List[dict]) -> List[Optional[dict]]:
+    """Apply catalog pricing to the customers that name a product_id; raises UnknownProduct"""
+    if all(customer.get("product_id") is None for customer in customers):
+        return [None] * len(customers)
+    if product_catalog is None:
+        raise HTTPException(status_code=503, detail="Product catalog is not configured")
+    return [product_catalog.apply(customer) for customer in customers]
+
+def unknown_product(error: UnknownProduct) -> JSONResponse:
+    # Returned directly: the 404 handler below reports every HTTPException 404 as a missing endpoint
+    return JSONResponse(status_code=404, content={"status": "error", "message": f"Unknown ProductID: {error.args[0]}"})
+
+async def price_single(customer: dict):
+    """Score one customer through the coalescer when enabled, otherwise straight on the executor"""
+    # Profiled requests skip the coalescer so the engine call runs under the request's profile
+    if request_coalescer is not None and current_request_profile() is None:
+        return await request_coalescer.submit(customer)
+    return await scoring_executor.run("calculate_dynamic_price", customer, customer["product_cost"],
+                                      customer.get("base_price"), customer.get("price_multiplier", 1.0))
+
+@app.post("/api/calculate_price/", dependencies=[Depends(require_ready)])
+async def calculate_price(customer: CustomerData, request: Request):
+    observe_parse(request)
+    customer = customer.dict()
+    try:
+        product = resolve_products([customer])[0]
+    except UnknownProduct as e:
+        return unknown_product(e)
+    try:
+        result, timings = await price_single(customer)
+        if product is not None:
+            result = {**result, **product}
+        return timed_json({"status": "success", "data": result}, headers=timing_headers(timings))
+    except ScoringQueueFull as e:
+        count_error("calculate_price", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        count_error("calculate_price", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/calculate_price_by_customer/", dependencies=[Depends(require_ready)])
+async def calculate_price_by_customer(lookup: CustomerLookupData, request: Request):
+    """Price a known customer from precomputed data; callers send only the ID.
+
+    A CLV table built by the live model answers directly with the pricing formula; otherwise
+    the customer's features are looked up and scored by the forest.
+    """
+    if customer_store is None and precomputed_clv is None:
+        raise HTTPException(status_code=503, detail="Customer feature store is not configured")
+    observe_parse(request)
+    pricing = {"product_cost": lookup.product_cost, "product_id": lookup.product_id}
+    try:
+        product = resolve_products([pricing])[0] or {}
+    except UnknownProduct as e:
+        return unknown_product(e)
     try:
-        result = pricing_engine.calculate_dynamic_price(
-            customer_data=customer.dict(),
-            product_cost=customer.product_cost
-        )
-        return JSONResponse({"status": "success", "data": result})
+        if precomputed_clv is not None:
+            clv = precomputed_clv.get(lookup.CustomerID, model_registry.version)
+            if clv is not None:
+                result = model_registry.engine.price_from_clv(clv, pricing["product_cost"], pricing.get("base_price"),
+                                                              pricing.get("price_multiplier", 1.0))
+                return timed_json({"status": "success",
+                                   "data": {"CustomerID": lookup.CustomerID, **result, **product}},
+                                  headers={"X-CLV-Source": "table"})
+
+        features = customer_store.get(lookup.CustomerID) if customer_store is not None else None
+        if features is None:
+            # Returned directly: the 404 handler below reports every HTTPException 404 as a missing endpoint
+            return JSONResponse(status_code=404, content={
+                "status": "error", "message": f"Unknown CustomerID: {lookup.CustomerID}"})
+        result, timings = await price_single({**features, **pricing})
+        return timed_json({"status": "success", "data": {"CustomerID": lookup.CustomerID, **result, **product}},
+                          headers={**timing_headers(timings), "X-CLV-Source": "model"})
+    except ScoringQueueFull as e:
+        count_error("calculate_price_by_customer", e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        count_error("calculate_price_by_customer", e)
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/api/calculate_batch_prices/")
-async def calculate_batch_prices(batch_data: BatchCustomerData):
+@app.post("/api/calculate_batch_prices/", dependencies=[Depends(require_ready)])
+async def calculate_batch_prices(batch_data: BatchCustomerData, request: Request):
+    """Rows of results as JSON by default; Accept picks a columnar JSON or Arrow response instead"""
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        return not_acceptable()
+    observe_parse(request)
+    REGISTRY.observe("pricing_batch_size", len(batch_data.customers))
+    customers = [customer.dict() for customer in batch_data.customers]
+    try:
+        products = resolve_products(customers)
+    except UnknownProduct as e:
+        return unknown_product(e)
+    try:
+        columns, timings = await scoring_executor.run("calculate_batch_columns", customers)
+        if media_type != JSON:
+            if any(product is not None for product in products):
+                for name in ("product_id", "inventory_level", "inventory_multiplier"):
+                    columns[name] = [product[name] if product is not None else None for product in products]
+            return timed_columns(media_type, columns, len(customers), headers=timing_headers(timings))
+        started = time.perf_counter()
+        results = rows_from_columns(columns)
+        observe_stage("rows", started)
+        for result, product in zip(results, products):
+            if product is not None:
+                result.update(product)
+        return timed_json({"status": "success", "data": results}, headers=timing_headers(timings))
+    except ScoringQueueFull as e:
+        count_error("calculate_batch_prices", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        count_error("calculate_batch_prices", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/calculate_product_prices/", dependencies=[Depends(require_ready)])
+async def calculate_product_prices(pricing: ProductPricingData, request: Request):
+    """Price every customer against every listed catalog product; CLV is predicted once per customer"""
+    if product_catalog is None:
+        raise HTTPException(status_code=503, detail="Product catalog is not configured")
+    observe_parse(request)
+    REGISTRY.observe("pricing_batch_size", len(pricing.customers) * len(pricing.product_ids))
+    try:
+        arrays = product_catalog.pricing_arrays(pricing.product_ids, pricing.product_cost)
+    except UnknownProduct as e:
+        return unknown_product(e)
     try:
-        results = []
-        for customer in batch_data.customers:
-            result = pricing_engine.calculate_dynamic_price(
-                customer_data=customer.dict(),
-                product_cost=customer.product_cost
-            )
-            results.append(result)
-        return JSONResponse({"status": "success", "data": results})
+        features = model_registry.engine.build_feature_matrix([customer.dict() for customer in pricing.customers])
+        columns, timings = await scoring_executor.run(
+            "calculate_product_price_grid", features, arrays["product_costs"], arrays["base_prices"],
+            arrays["price_multipliers"])
+        products = [product_catalog.get(product_id) for product_id in pricing.product_ids]
+        results = [
+            {"clv": clv, "price_adjustment_factor": factor, "prices": [
+                {"product_id": product["product_id"], "base_price": product["base_price"],
+                 "inventory_level": product["inventory_level"],
+                 "inventory_multiplier": product["inventory_multiplier"], "min_price": min_price,
+                 "dynamic_price": price, "profit_margin": margin}
+                for product, min_price, price, margin in zip(products, columns["min_price"].tolist(), prices, margins)
+            ]}
+            for clv, factor, prices, margins in zip(columns["clv"].tolist(),
+                                                    columns["price_adjustment_factor"].tolist(),
+                                                    columns["dynamic_price"].tolist(),
+                                                    columns["profit_margin"].tolist())
+        ]
+        if "clv_segment" in columns:
+            for result, segment, multiplier in zip(results, columns["clv_segment"].tolist(),
+                                                   columns["segment_multiplier"].tolist()):
+                result.update(clv_segment=segment, segment_multiplier=multiplier)
+        return timed_json({"status": "success", "data": results}, headers=timing_headers(timings))
+    except ScoringQueueFull as e:
+        count_error("calculate_product_prices", e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        count_error("calculate_product_prices", e)
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/api/test_model/")
+@app.post("/api/calculate_prices_stream/", dependencies=[Depends(require_ready)])
+async def calculate_prices_stream(request: Request):
+    """Price an NDJSON or CSV upload (customer_data.csv layout) chunk by chunk, streaming results back"""
+    fmt = stream_format(request.headers.get("content-type"))
+    # One engine for the whole response, so a reload mid-stream cannot change the model or columns
+    engine = model_registry.engine
+
+    async def score(features, product_costs):
+        columns, _ = await scoring_executor.run("calculate_dynamic_prices_arrays", features, product_costs,
+                                                engine=engine)
+        return columns
+
+    return RequestBodyStreamingResponse(
+        stream_prices(request.stream(), fmt, score,
+                      chunk_size=int(os.getenv("PRICING_STREAM_CHUNK_SIZE", "5000")),
+                      fields=engine.result_fields),
+        media_type=fmt
+    )
+
+@app.get("/api/test_model/", dependencies=[Depends(require_ready)])
 async def test_model():
     try:
-        test_customer = {
-            "Recency": 30,
-            "Frequency": 5,
-            "MonetaryValue": 500,
-            "Tenure": 365,
-            "AvgDaysBetweenPurchases": 30,
-            "Age": 35,
-            "UniqueProductsCount": 3,
-            "product_cost": 50.0
-        }
-        
-        result = pricing_engine.calculate_dynamic_price(test_customer)
-        
-        if not isinstance(result["dynamic_price"], float):
-            raise ValueError("Invalid price prediction")
-        if result["dynamic_price"] < result["min_price"]:
-            raise ValueError("Price below minimum threshold")
-            
+        result = validate_engine(model_registry.engine)
         return JSONResponse({
             "status": "success",
             "message": "Model working correctly",
             "test_result": result,
-            "test_input": test_customer
+            "test_input": TEST_CUSTOMER
         })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model test failed: {str(e)}")
 
-# Health check endpoint
+@app.post("/api/reload_model/", dependencies=[Depends(require_ready)])
+async def reload_model():
+    """Load, validate and swap in the current model file without restarting"""
+    started = model_registry.reload_in_background()
+    return JSONResponse(
+        status_code=202 if started else 409,
+        content={
+            "status": "accepted" if started else "error",
+            "message": "Model reload started" if started else "A model reload is already running",
+            "model": model_registry.info()
+        }
+    )
+
+@app.post("/api/reload_customer_features/", dependencies=[Depends(require_ready)])
+async def reload_customer_features():
+    """Re-index the customer feature CSV in the background; all workers pick up the new table"""
+    if customer_store is None:
+        raise HTTPException(status_code=503, detail="Customer feature store is not configured")
+    started = customer_store.rebuild_in_background()
+    return JSONResponse(
+        status_code=202 if started else 409,
+        content={
+            "status": "accepted" if started else "error",
+            "message": "Customer feature rebuild started" if started else "A rebuild is already running",
+            "customer_features": customer_store.info()
+        }
+    )
+
+def require_admin(request: Request):
+    # Disabled profiling answers like any unknown endpoint
+    if not profiling_service.enabled:
+        raise HTTPException(status_code=404)
+    if not profiling_service.authorized(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/api/admin/profile/")
+async def profile_process(request: Request, seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample every thread's stack for `seconds`; returns collapsed stacks for flamegraph.pl/speedscope"""
+    require_admin(request)
+    try:
+        collapsed = await asyncio.get_running_loop().run_in_executor(
+            None, profiling_service.sample, seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapsed, headers={
+        "Content-Disposition": f'attachment; filename="pricing-{os.getpid()}.collapsed"'})
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request):
+    """cProfile dump of a request sent with X-Profile: cprofile (see its X-Profile-Id header)"""
+    require_admin(request)
+    dump = profiling_service.get(profile_id)
+    if dump is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"Unknown profile: {profile_id}"})
+    return Response(dump, media_type="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.prof"'})
+
+@app.get("/api/cache_stats/", dependencies=[Depends(require_ready)])
+async def cache_stats():
+    cache = model_registry.engine.cache
+    if cache is None:
+        return JSONResponse({"status": "success", "data": {"enabled": False}})
+    return JSONResponse({"status": "success", "data": {"enabled": True, **cache.stats()}})
+
+@app.get("/api/coalescer_stats/", dependencies=[Depends(require_ready)])
+async def coalescer_stats():
+    if request_coalescer is None:
+        return JSONResponse({"status": "success", "data": {"enabled": False}})
+    return JSONResponse({"status": "success", "data": {"enabled": True, **request_coalescer.stats()}})
+
+@app.get("/api/worker_info/", dependencies=[Depends(require_ready)])
+async def worker_info():
+    return JSONResponse({"status": "success", "data": {
+        "pid": os.getpid(),
+        "startup_seconds": worker_startup_seconds,
+        "startup_phases": startup_timings,
+        "model_mmap": model_registry.engine.mmap_compiled and model_registry.engine.compiled_model is not None,
+        "sklearn_model_loaded": model_registry.engine.sklearn_model_loaded,
+        "surrogate": model_registry.engine.surrogate_report,
+        "fanout": scoring_executor.fanout.stats() if scoring_executor.fanout is not None else None,
+        "clv_segments": model_registry.engine.segments.info() if model_registry.engine.segments else None,
+        "memory": process_memory_kb()
+    }})
+
+def _model_info():
+    if services_ready():
+        yield {"version": model_registry.version or "none"}, 1
+
+def _cache_lookups():
+    cache = model_registry.engine.cache if services_ready() else None
+    if cache is not None:
+        stats = cache.stats()
+        yield {"result": "hit"}, stats["hits"]
+        yield {"result": "miss"}, stats["misses"]
+
+def _memory():
+    for name, value in process_memory_kb().items():
+        yield {"kind": name}, value
+
+REGISTRY.gauge("pricing_model_info", "Version of the model currently serving", _model_info)
+REGISTRY.gauge("pricing_cache_lookups", "Result cache lookups since the cache was created", _cache_lookups)
+REGISTRY.gauge("pricing_process_memory_kb", "Memory of this worker process", _memory)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this worker's counters, histograms and gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# Liveness: answers as soon as the server is up, whether or not the model has loaded
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Dynamic Pricing Engine is running"}
+    ready = services_ready()
+    return {
+        "status": "healthy",
+        "message": "Dynamic Pricing Engine is running",
+        "ready": ready,
+        "model": model_registry.info() if ready else None,
+        "customer_features": customer_store.info() if ready and customer_store is not None else None,
+        "clv_table": precomputed_clv.info() if ready and precomputed_clv is not None else None,
+        "product_catalog": product_catalog.info() if ready and product_catalog is not None else None
+    }
+
+# Readiness: 200 only once the model is loaded, so traffic is routed to warm workers only
+@app.get("/ready")
+async def readiness_check():
+    if services_ready():
+        return {"status": "ready", "startup": startup_timings}
+    # Also starts loading when the app runs without lifespan events (e.g. httpx.ASGITransport)
+    loading = start_loading()
+    if loading.done() and loading.exception() is not None:
+        return JSONResponse(status_code=503, content={
+            "status": "failed", "message": str(loading.exception()), "startup": startup_timings})
+    return JSONResponse(status_code=503, content={"status": "loading", "startup": startup_timings})
 
 # Error handler
 @app.exception_handler(404)
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class PricingCache:
+    """Bounded LRU cache with a TTL for CLV and price results.
+
+    Keys are tuples of (optionally quantized) feature values. When watch() is given the
+    model file, the cache clears itself as soon as that file's mtime or size changes.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, quantum: Optional[float] = None,
+                 check_interval: float = 1.0):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.quantum = quantum
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch_path: Optional[str] = None
+        self._watch_signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def quantize(self, value: float) -> float:
+        if not self.quantum:
+            return float(value)
+        return round(value / self.quantum) * self.quantum
+
+    def make_key(self, *values: float) -> Tuple[float, ...]:
+        return tuple(self.quantize(value) for value in values)
+
+    def watch(self, path: str):
+        """Invalidate the cache whenever the file at path changes"""
+        with self._lock:
+            self._watch_path = path
+            self._watch_signature = self._file_signature(path)
+            self._next_check = time.monotonic() + self.check_interval
+
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_source(self, now: float):
+        if self._watch_path is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._file_signature(self._watch_path)
+        if signature != self._watch_signature:
+            logger.info(f"Model file {self._watch_path} changed, invalidating pricing cache")
+            self._watch_signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on a miss or an expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_source(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "quantum": self.quantum,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,149 @@
+import csv
+import logging
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Scarce stock carries a premium, overstock a discount. Applied on top of the CLV factor, so prices
+# are not comparable with results/dynamic_prices.csv, which has no CLV factor.
+INVENTORY_MULTIPLIERS = {"low": 1.05, "medium": 1.0, "high": 0.95}
+DEFAULT_INVENTORY_LEVEL = "medium"
+
+def normalize_inventory_level(value) -> str:
+    """An Inventory_Level cell as a multiplier key; missing or blank cells mean the default level"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return DEFAULT_INVENTORY_LEVEL
+    return str(value).strip().lower() or DEFAULT_INVENTORY_LEVEL
+
+def inventory_price_multipliers(levels: Sequence, inventory_multipliers: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Price multiplier for each Inventory_Level value; raises ValueError on levels with no multiplier.
+
+    Shared by ProductCatalog and the offline batch job so both price the same catalog alike.
+    """
+    multipliers = INVENTORY_MULTIPLIERS if inventory_multipliers is None else inventory_multipliers
+    normalized = [normalize_inventory_level(level) for level in levels]
+    unknown_levels = set(normalized) - set(multipliers)
+    if unknown_levels:
+        raise ValueError(f"Unknown inventory levels: {unknown_levels}")
+    return np.array([multipliers[level] for level in normalized], dtype=np.float64)
+
+class UnknownProduct(KeyError):
+    """Raised for ProductIDs that are not in the catalog"""
+
+class ProductCatalog:
+    """Products held as parallel arrays behind a ProductID -> row index.
+
+    Pricing gathers base price, cost and inventory multiplier by row number, so any number of
+    customer x product pairs is priced with array indexing and broadcasting. Products without
+    a Product_Cost column value have a NaN cost; the request's product_cost applies to them.
+    """
+
+    def __init__(self, product_ids: Sequence[str], base_prices: Sequence[float],
+                 costs: Optional[Sequence[float]] = None, inventory_levels: Optional[Sequence[str]] = None,
+                 inventory_multipliers: Optional[Dict[str, float]] = None):
+        self.product_ids = [str(product_id) for product_id in product_ids]
+        self.index = {product_id: row for row, product_id in enumerate(self.product_ids)}
+        if len(self.index) != len(self.product_ids):
+            raise ValueError("ProductIDs must be unique")
+        count = len(self.product_ids)
+        self.base_prices = np.asarray(base_prices, dtype=np.float64)
+        self.costs = np.full(count, np.nan) if costs is None else np.asarray(costs, dtype=np.float64)
+        self.inventory_multipliers = dict(inventory_multipliers or INVENTORY_MULTIPLIERS)
+        self.inventory_levels = (list(inventory_levels) if inventory_levels is not None
+                                 else [DEFAULT_INVENTORY_LEVEL] * count)
+        self.price_multipliers = inventory_price_multipliers(self.inventory_levels, self.inventory_multipliers)
+        if not (self.base_prices.shape == self.costs.shape == (count,)):
+            raise ValueError("base_prices and costs must have one entry per product")
+        self.path: Optional[str] = None
+
+    @classmethod
+    def from_csv(cls, path: str, inventory_multipliers: Optional[Dict[str, float]] = None) -> "ProductCatalog":
+        """Read ProductID, Base_Price and optional Product_Cost and Inventory_Level columns.
+
+        Files like product_data.csv list a product once per customer it is assigned to; the
+        last row for a ProductID wins.
+        """
+        products: Dict[str, dict] = {}
+        with open(path, newline="") as handle:
+            reader = csv.DictReader(handle)
+            missing_cols = {"ProductID", "Base_Price"} - set(reader.fieldnames or [])
+            if missing_cols:
+                raise ValueError(f"Missing columns in product catalog: {missing_cols}")
+            for row in reader:
+                product_id = row["ProductID"].strip()
+                previous = products.get(product_id)
+                if previous is not None and previous["Base_Price"] != row["Base_Price"]:
+                    logger.warning(f"Conflicting Base_Price for {product_id} in {path}, using the last one")
+                if previous is not None and (normalize_inventory_level(previous.get("Inventory_Level"))
+                                             != normalize_inventory_level(row.get("Inventory_Level"))):
+                    logger.warning(f"Conflicting Inventory_Level for {product_id} in {path}, using the last one")
+                products[product_id] = row
+
+        rows = list(products.values())
+        cost_values = [(row.get("Product_Cost") or "").strip() for row in rows]
+        catalog = cls(
+            list(products),
+            [float(row["Base_Price"]) for row in rows],
+            [float(value) if value else np.nan for value in cost_values],
+            [normalize_inventory_level(row.get("Inventory_Level")) for row in rows],
+            inventory_multipliers
+        )
+        catalog.path = path
+        logger.info(f"Loaded {len(catalog)} products from {path}")
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def positions(self, product_ids: Sequence[str]) -> np.ndarray:
+        """Row numbers of product_ids, for gathering from the catalog arrays"""
+        try:
+            return np.fromiter((self.index[product_id] for product_id in product_ids), dtype=np.intp,
+                               count=len(product_ids))
+        except KeyError as e:
+            raise UnknownProduct(e.args[0])
+
+    def pricing_arrays(self, product_ids: Sequence[str], default_cost: float) -> Dict[str, np.ndarray]:
+        """base_prices, product_costs and price_multipliers for product_ids, ready for the engine"""
+        rows = self.positions(product_ids)
+        costs = self.costs[rows]
+        return {
+            "product_costs": np.where(np.isnan(costs), default_cost, costs),
+            "base_prices": self.base_prices[rows],
+            "price_multipliers": self.price_multipliers[rows]
+        }
+
+    def get(self, product_id: str) -> dict:
+        row = self.index.get(product_id)
+        if row is None:
+            raise UnknownProduct(product_id)
+        cost = self.costs[row]
+        return {
+            "product_id": product_id,
+            "base_price": float(self.base_prices[row]),
+            "product_cost": None if np.isnan(cost) else float(cost),
+            "inventory_level": self.inventory_levels[row],
+            "inventory_multiplier": float(self.price_multipliers[row])
+        }
+
+    def apply(self, customer: dict) -> Optional[dict]:
+        """Fill a request dict's base_price, price_multiplier and (if known) product_cost from its
+        product_id; returns the product's fields for the response, or None without a product_id"""
+        product_id = customer.get("product_id")
+        if product_id is None:
+            return None
+        product = self.get(product_id)
+        customer["base_price"] = product["base_price"]
+        customer["price_multiplier"] = product["inventory_multiplier"]
+        if product["product_cost"] is not None:
+            customer["product_cost"] = product["product_cost"]
+        return {name: product[name] for name in ("product_id", "inventory_level", "inventory_multiplier")}
+
+    def info(self) -> dict:
+        return {
+            "path": self.path,
+            "products": len(self),
+            "inventory_multipliers": self.inventory_multipliers
+        }
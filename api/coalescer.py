@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.executor import ScoringExecutor, ScoringQueueFull
+from api.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BOUNDS = [0.25, 0.5, 1, 2, 5, 10, 20, 50]
+
+class RequestCoalescer:
+    """Groups concurrent single-customer price requests into one batch prediction.
+
+    A batch is flushed once max_batch_size requests are waiting or max_wait_ms after the
+    first one arrived, whichever comes first. Each caller gets back its own row.
+    """
+
+    def __init__(self, executor: ScoringExecutor, max_wait_ms: float = 2.0, max_batch_size: int = 64):
+        if max_batch_size <= 0 or max_wait_ms < 0:
+            raise ValueError("max_batch_size must be positive and max_wait_ms non-negative")
+        self.executor = executor
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[dict, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batch_sizes = Histogram(BATCH_SIZE_BOUNDS)
+        self.coalesce_wait_ms = Histogram(WAIT_MS_BOUNDS)
+
+    async def submit(self, customer_data: dict) -> Tuple[dict, Dict[str, float]]:
+        """Queue one customer (including its product_cost) and wait for its priced row"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((customer_data, future, time.monotonic()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._score(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch: List[Tuple[dict, asyncio.Future, float]]):
+        flushed = time.monotonic()
+        self.batch_sizes.observe(len(batch))
+        waits = []
+        for _, _, enqueued in batch:
+            wait_ms = (flushed - enqueued) * 1000
+            self.coalesce_wait_ms.observe(wait_ms)
+            waits.append(round(wait_ms, 3))
+
+        customers = [customer_data for customer_data, _, _ in batch]
+        try:
+            results, timings = await self.executor.run("calculate_dynamic_prices_batch", customers)
+            outcomes = [(result, timings) for result in results]
+        except ScoringQueueFull as e:
+            outcomes = [e] * len(batch)
+        except Exception as e:
+            # One bad row fails the whole batch; re-score rows individually so only it errors
+            logger.warning(f"Coalesced batch of {len(batch)} failed, scoring rows individually: {str(e)}")
+            outcomes = await asyncio.gather(*(
+                self.executor.run("calculate_dynamic_price", customer_data,
+                                  customer_data.get("product_cost", 50.0), customer_data.get("base_price"),
+                                  customer_data.get("price_multiplier", 1.0))
+                for customer_data in customers
+            ), return_exceptions=True)
+
+        for (_, future, _), outcome, wait_ms in zip(batch, outcomes, waits):
+            if future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                result, timings = outcome
+                future.set_result((result, {**timings, "coalesce_wait_ms": wait_ms,
+                                            "batch_size": len(batch)}))
+
+    def stats(self) -> dict:
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batch_size": self.batch_sizes.snapshot(),
+            "coalesce_wait_ms": self.coalesce_wait_ms.snapshot()
+        }
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+import joblib
+import numpy as np
+
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+ARRAY_FIELDS = ("feature", "threshold", "children", "value", "roots")
+
+def file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def model_version(model_path: str) -> str:
+    """Content hash of a model file; unlike file_signature it survives copies and redeploys"""
+    return _file_digest(os.path.abspath(model_path), file_signature(model_path))
+
+@lru_cache(maxsize=16)
+def _file_digest(path: str, signature: Tuple[int, int]) -> str:
+    # Keyed on the signature so each version of a file is hashed once per process
+    digest = hashlib.sha256()
+    with open(path, "rb") as model_file:
+        for block in iter(lambda: model_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+class CompiledForest:
+    """Flat array form of a fitted forest regressor, evaluated for all trees at once.
+
+    Every tree's nodes are packed into shared feature / threshold / children / value arrays.
+    Leaves point to themselves, so each row walks all trees in lock step for max_depth steps.
+    Predictions follow sklearn exactly: inputs are cast to float32, a row goes left when
+    X <= threshold, and leaf values are summed tree by tree before averaging.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, n_features: int,
+                 chunk_size: int = 512):
+        self.feature = feature
+        self.threshold = threshold
+        # Interleaved [left, right] pairs so one gather picks the next node
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.chunk_size = chunk_size
+
+    @property
+    def children_left(self) -> np.ndarray:
+        return self.children[0::2]
+
+    @property
+    def children_right(self) -> np.ndarray:
+        return self.children[1::2]
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def supports(cls, model: "BaseEstimator") -> bool:
+        # Imported here: sklearn takes seconds to import and mmap-mode workers never need it
+        from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+        return (isinstance(model, (RandomForestRegressor, ExtraTreesRegressor))
+                and hasattr(model, "estimators_")
+                and getattr(model, "n_outputs_", 1) == 1)
+
+    @classmethod
+    def from_model(cls, model: "BaseEstimator") -> "CompiledForest":
+        if not cls.supports(model):
+            raise ValueError(f"Cannot compile model of type {type(model).__name__}")
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        node_counts = np.array([tree.node_count for tree in trees], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(node_counts)[:-1])).astype(np.intp)
+
+        feature, threshold, children_left, children_right, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            local_nodes = np.arange(tree.node_count, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+            feature.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            threshold.append(tree.threshold.astype(np.float64))
+            children_left.append(np.where(is_leaf, local_nodes, tree.children_left) + offset)
+            children_right.append(np.where(is_leaf, local_nodes, tree.children_right) + offset)
+            value.append(tree.value[:, 0, 0].astype(np.float64))
+
+        children = np.column_stack((np.concatenate(children_left), np.concatenate(children_right)))
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            children=children.astype(np.intp).ravel(),
+            value=np.concatenate(value),
+            roots=offsets,
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+        )
+
+    def save(self, path: str, source_path: Optional[str] = None):
+        """Write the flat arrays uncompressed so load() can memory-map them.
+
+        source_path (the pickled sklearn model) is fingerprinted so stale artifacts can be detected.
+        The file is written under a temporary name and renamed, so readers never see a partial file.
+        """
+        payload = {name: np.ascontiguousarray(getattr(self, name)) for name in ARRAY_FIELDS}
+        payload.update(
+            version=ARTIFACT_VERSION,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            source_signature=file_signature(source_path) if source_path else None,
+        )
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(payload, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def is_current(path: str, source_path: str) -> bool:
+        """True when the artifact at path was exported from the current source_path file"""
+        try:
+            payload = joblib.load(path, mmap_mode="r")
+            return (payload.get("version") == ARTIFACT_VERSION
+                    and tuple(payload.get("source_signature") or ()) == file_signature(source_path))
+        except Exception:
+            return False
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "CompiledForest":
+        """Load a saved artifact; with mmap_mode='r' the arrays are shared through the page cache"""
+        payload = joblib.load(path, mmap_mode=mmap_mode)
+        if payload.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported compiled model version: {payload.get('version')}")
+        # np.asarray drops the memmap subclass without copying, so results are plain ndarrays
+        arrays = {name: np.asarray(payload[name]) for name in ARRAY_FIELDS}
+        return cls(max_depth=payload["max_depth"], n_features=payload["n_features"], **arrays)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n_samples, {self.n_features}), got {X.shape}")
+        if len(X) <= self.chunk_size:
+            return self._predict_chunk(X)
+        return np.concatenate([
+            self._predict_chunk(X[start:start + self.chunk_size])
+            for start in range(0, len(X), self.chunk_size)
+        ])
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        # sklearn trees compare float32 inputs against float64 thresholds
+        flat_X = np.ascontiguousarray(X, dtype=np.float32).astype(np.float64).ravel()
+        row_offsets = (np.arange(len(X), dtype=np.intp) * self.n_features)[:, None]
+
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            go_right = flat_X[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        # Sequential sum over trees (cumsum) reproduces sklearn's accumulation order exactly
+        leaf_values = self.value[nodes.T]
+        return np.cumsum(leaf_values, axis=0)[-1] / self.n_trees
+
+def compile_model(model: "BaseEstimator") -> Optional[CompiledForest]:
+    """Compile a fitted forest, or return None when the model type is not supported"""
+    if not CompiledForest.supports(model):
+        logger.info(f"Model type {type(model).__name__} is not compilable, using sklearn predict")
+        return None
+    compiled = CompiledForest.from_model(model)
+    logger.info(f"Compiled {compiled.n_trees} trees ({len(compiled.value)} nodes, "
+                f"max depth {compiled.max_depth}) into flat arrays")
+    return compiled
+
+def compiled_artifact_path(model_path: str) -> str:
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.compiled.joblib"
+
+def export_compiled_model(model_path: str, output_path: Optional[str] = None, force: bool = False) -> str:
+    """Write the memory-mappable compiled artifact next to model_path unless it is already current"""
+    output_path = output_path or compiled_artifact_path(model_path)
+    if not force and os.path.exists(output_path) and CompiledForest.is_current(output_path, model_path):
+        logger.info(f"Compiled model {output_path} is up to date")
+        return output_path
+    compiled = CompiledForest.from_model(joblib.load(model_path))
+    compiled.save(output_path, source_path=model_path)
+    logger.info(f"Exported compiled model to {output_path}")
+    return output_path
@@ -0,0 +1,349 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import joblib
+import numpy as np
+
+from api.compiled_forest import file_signature
+from api.pricing_engine import REQUIRED_FEATURES
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+
+def key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def save_artifact(path: str, payload: dict):
+    """joblib.dump under a temporary name, then rename, so readers never see a partial file"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(payload, tmp_path)
+    os.replace(tmp_path, path)
+
+class KeyIndex:
+    """Open-addressing hash table from customer key to row number, stored as flat arrays.
+
+    keys are fixed-width bytes, hashes their 64-bit hashes and table a power-of-two slot array
+    holding row numbers (-1 for empty). At most half the slots are used, so a lookup is O(1)
+    with short linear probes, and all three arrays can be memory-mapped.
+    """
+
+    def __init__(self, keys: np.ndarray, hashes: np.ndarray, table: np.ndarray):
+        self.keys = keys
+        self.hashes = hashes
+        self.table = table
+        self.mask = len(table) - 1
+
+    @staticmethod
+    def encode(key) -> bytes:
+        return str(key).strip().encode("utf-8")
+
+    @classmethod
+    def build(cls, keys: Iterable) -> "KeyIndex":
+        encoded = [cls.encode(key) for key in keys]
+        if len(set(encoded)) != len(encoded):
+            raise ValueError("Customer keys must be unique")
+        hashes = np.fromiter((key_hash(key) for key in encoded), dtype=np.uint64, count=len(encoded))
+        table = np.full(max(8, 1 << (2 * len(encoded) - 1).bit_length()), -1, dtype=np.int64)
+        mask = np.uint64(len(table) - 1)
+
+        # Insert in vectorized rounds: every pending key claims its slot if free, losers probe on
+        pending = np.arange(len(encoded))
+        slots = (hashes & mask).astype(np.int64)
+        while len(pending):
+            free = table[slots] == -1
+            claimed, first = np.unique(slots[free], return_index=True)
+            table[claimed] = pending[free][first]
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[np.flatnonzero(free)[first]] = True
+            pending, slots = pending[~placed], (slots[~placed] + 1) & int(mask)
+        return cls(np.array(encoded, dtype=bytes), hashes, table)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, key) -> int:
+        """Row number of key, or -1 when it isn't indexed"""
+        encoded = self.encode(key)
+        hashed = key_hash(encoded)
+        slot = hashed & self.mask
+        while True:
+            row = int(self.table[slot])
+            if row < 0:
+                return -1
+            if int(self.hashes[row]) == hashed and self.keys[row] == encoded:
+                return row
+            slot = (slot + 1) & self.mask
+
+class CustomerFeatureTable:
+    """Precomputed model features per CustomerID, indexed for O(1) lookups.
+
+    Built from clv_preprocessed_data.csv and saved next to it in a memory-mappable artifact,
+    so every worker shares one copy through the page cache.
+    """
+
+    ARRAY_FIELDS = ("keys", "hashes", "table", "features")
+
+    def __init__(self, index: KeyIndex, features: np.ndarray):
+        self.index = index
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "CustomerFeatureTable":
+        import pandas as pd
+        data = pd.read_csv(path, usecols=lambda name: name in ["CustomerID"] + REQUIRED_FEATURES)
+        missing_cols = set(["CustomerID"] + REQUIRED_FEATURES) - set(data.columns)
+        if missing_cols:
+            raise ValueError(f"Missing columns in customer features: {missing_cols}")
+        data = data.drop_duplicates("CustomerID", keep="last")
+        index = KeyIndex.build(data["CustomerID"].tolist())
+        return cls(index, data[REQUIRED_FEATURES].to_numpy(dtype=np.float64))
+
+    def get(self, customer_id) -> Optional[Dict[str, float]]:
+        """Feature dict for customer_id, or None when the customer is unknown"""
+        row = self.index.find(customer_id)
+        if row < 0:
+            return None
+        return dict(zip(REQUIRED_FEATURES, self.features[row].tolist()))
+
+    def save(self, path: str, source_path: Optional[str] = None):
+        """Write the arrays uncompressed so load() can memory-map them"""
+        payload = {
+            "keys": self.index.keys,
+            "hashes": self.index.hashes,
+            "table": self.index.table,
+            "features": np.ascontiguousarray(self.features),
+            "version": ARTIFACT_VERSION,
+            "source_signature": file_signature(source_path) if source_path else None
+        }
+        save_artifact(path, payload)
+
+    @staticmethod
+    def is_current(path: str, source_path: str) -> bool:
+        try:
+            payload = joblib.load(path, mmap_mode="r")
+            return (payload.get("version") == ARTIFACT_VERSION
+                    and tuple(payload.get("source_signature") or ()) == file_signature(source_path))
+        except Exception:
+            return False
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "CustomerFeatureTable":
+        payload = joblib.load(path, mmap_mode=mmap_mode)
+        if payload.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported customer feature table version: {payload.get('version')}")
+        arrays = {name: np.asarray(payload[name]) for name in cls.ARRAY_FIELDS}
+        return cls(KeyIndex(arrays["keys"], arrays["hashes"], arrays["table"]), arrays["features"])
+
+def customer_store_path(source_path: str) -> str:
+    root, _ = os.path.splitext(source_path)
+    return f"{root}.index.joblib"
+
+def export_customer_store(source_path: str, output_path: Optional[str] = None, force: bool = False) -> str:
+    """Build the indexed artifact next to source_path unless it is already current"""
+    output_path = output_path or customer_store_path(source_path)
+    if not force and os.path.exists(output_path) and CustomerFeatureTable.is_current(output_path, source_path):
+        return output_path
+    started = time.perf_counter()
+    table = CustomerFeatureTable.from_csv(source_path)
+    table.save(output_path, source_path=source_path)
+    logger.info(f"Indexed {len(table)} customers from {source_path} in {time.perf_counter() - started:.2f}s")
+    return output_path
+
+class WatchedArtifact:
+    """Memory-mapped table that is remapped when its file changes on disk.
+
+    The file signature is checked at most once per check_interval, so a table rewritten by
+    any process (a rebuild through another worker, a training run) reaches every worker.
+    """
+
+    description = "table"
+
+    def __init__(self, artifact_path: str, check_interval: float = 1.0):
+        self.artifact_path = artifact_path
+        self.check_interval = check_interval
+        self.table = None
+        self.loaded_at: Optional[str] = None
+        self._signature = None
+        self._next_check = 0.0
+
+    def _load_table(self):
+        raise NotImplementedError
+
+    def _activate(self):
+        signature = file_signature(self.artifact_path)
+        self.table = self._load_table()
+        self._signature = signature
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            if file_signature(self.artifact_path) != self._signature:
+                self._activate()
+                logger.info(f"Reloaded {self.description} from {self.artifact_path}")
+        except Exception as e:
+            logger.error(f"Reloading {self.description} failed, keeping current table: {str(e)}")
+
+class CustomerStore(WatchedArtifact):
+    """Serves feature lookups from the current artifact and rebuilds it without a restart.
+
+    rebuild_in_background() re-indexes the source CSV in a thread; the other workers pick
+    the new artifact up through WatchedArtifact.
+    """
+
+    description = "customer features"
+
+    def __init__(self, source_path: str, check_interval: float = 1.0):
+        super().__init__(customer_store_path(source_path), check_interval)
+        self.source_path = source_path
+        self.rebuilding = False
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        export_customer_store(self.source_path, self.artifact_path)
+        self._activate()
+
+    def _load_table(self) -> CustomerFeatureTable:
+        return CustomerFeatureTable.load(self.artifact_path)
+
+    def get(self, customer_id) -> Optional[Dict[str, float]]:
+        self._refresh()
+        return self.table.get(customer_id)
+
+    def rebuild_in_background(self) -> bool:
+        """Re-index the source CSV; returns False if a rebuild is already running"""
+        with self._lock:
+            if self.rebuilding:
+                return False
+            self.rebuilding = True
+
+        def rebuild():
+            try:
+                export_customer_store(self.source_path, self.artifact_path, force=True)
+                self._activate()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Customer feature rebuild failed, keeping current table: {str(e)}")
+            finally:
+                self.rebuilding = False
+
+        threading.Thread(target=rebuild, name="customer-store-rebuild", daemon=True).start()
+        return True
+
+    def info(self) -> dict:
+        return {
+            "source": self.source_path,
+            "customers": len(self.table) if self.table is not None else 0,
+            "loaded_at": self.loaded_at,
+            "rebuilding": self.rebuilding,
+            "last_error": self.last_error
+        }
+
+class CLVTable:
+    """Precomputed CLV per CustomerID, tagged with the version of the model that produced it"""
+
+    ARRAY_FIELDS = ("keys", "hashes", "table", "clv")
+
+    def __init__(self, index: KeyIndex, clv: np.ndarray, model_version: Optional[str],
+                 built_at: Optional[str] = None):
+        self.index = index
+        self.clv = clv
+        self.model_version = model_version
+        self.built_at = built_at or datetime.now(timezone.utc).isoformat()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_predictions(cls, customer_ids: Iterable, clv: np.ndarray, model_version: str) -> "CLVTable":
+        return cls(KeyIndex.build(customer_ids), np.maximum(np.asarray(clv, dtype=np.float64), 0),
+                   model_version)
+
+    def get(self, customer_id) -> Optional[float]:
+        row = self.index.find(customer_id)
+        return None if row < 0 else self.clv[row]
+
+    def save(self, path: str):
+        save_artifact(path, {
+            "keys": self.index.keys,
+            "hashes": self.index.hashes,
+            "table": self.index.table,
+            "clv": np.ascontiguousarray(self.clv),
+            "version": ARTIFACT_VERSION,
+            "model_version": self.model_version,
+            "built_at": self.built_at
+        })
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "CLVTable":
+        payload = joblib.load(path, mmap_mode=mmap_mode)
+        if payload.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported CLV table version: {payload.get('version')}")
+        arrays = {name: np.asarray(payload[name]) for name in cls.ARRAY_FIELDS}
+        return cls(KeyIndex(arrays["keys"], arrays["hashes"], arrays["table"]), arrays["clv"],
+                   payload["model_version"], payload["built_at"])
+
+class PrecomputedCLV(WatchedArtifact):
+    """CLV lookups that are only trusted while the table matches the live model version.
+
+    A stale table (written by an older or newer model than the one serving) is ignored, so
+    callers fall back to the forest until a matching table is written.
+    """
+
+    description = "CLV table"
+
+    def __init__(self, artifact_path: str, check_interval: float = 1.0):
+        super().__init__(artifact_path, check_interval)
+        self.hits = 0
+        self.misses = 0
+        self.stale_lookups = 0
+        self.live_version: Optional[str] = None
+
+    def load(self):
+        self._activate()
+
+    def _load_table(self) -> CLVTable:
+        return CLVTable.load(self.artifact_path)
+
+    def get(self, customer_id, model_version: Optional[str]) -> Optional[float]:
+        """CLV for customer_id if the table was built by model_version, otherwise None"""
+        self._refresh()
+        self.live_version = model_version
+        if self.table.model_version != model_version:
+            self.stale_lookups += 1
+            return None
+        clv = self.table.get(customer_id)
+        if clv is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return clv
+
+    def info(self) -> dict:
+        return {
+            "path": self.artifact_path,
+            "customers": len(self.table) if self.table is not None else 0,
+            "table_model_version": self.table.model_version if self.table is not None else None,
+            "live_model_version": self.live_version,
+            "stale": self.table is not None and self.live_version is not None
+                     and self.table.model_version != self.live_version,
+            "built_at": self.table.built_at if self.table is not None else None,
+            "loaded_at": self.loaded_at,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_lookups": self.stale_lookups
+        }
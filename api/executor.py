@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from api.profiling import current_request_profile
+
+logger = logging.getLogger(__name__)
+
+# Engine owned by each worker process in "process" mode
+_worker_engine = None
+
+class ScoringQueueFull(RuntimeError):
+    """Raised when every worker is busy and the wait queue is at capacity"""
+
+def _init_worker_engine(engine_kwargs: dict):
+    global _worker_engine
+    from api.pricing_engine import PricingEngine
+    _worker_engine = PricingEngine(**engine_kwargs)
+
+def worker_engine_kwargs(engine) -> dict:
+    """PricingEngine arguments that rebuild engine in a worker process"""
+    return {
+        "model_path": engine.model_path,
+        "base_price": engine.base_price,
+        "fast_path": engine.fast_path,
+        "compile_forest": engine.compile_forest,
+        "mmap_compiled": engine.mmap_compiled,
+        "surrogate_tolerance": engine.surrogate_tolerance,
+        "segment_pricing": engine.segment_pricing,
+    }
+
+def _timed_call(target, method: str, args: tuple) -> Tuple[Any, float, float]:
+    started = time.monotonic()
+    engine = target if target is not None else _worker_engine
+    result = getattr(engine, method)(*args)
+    return result, started, time.monotonic()
+
+class ScoringExecutor:
+    """Runs PricingEngine calls off the event loop on a bounded thread or process pool.
+
+    At most max_workers calls run at once and up to max_queue more may wait; anything beyond
+    that is rejected with ScoringQueueFull so the caller can answer 503 instead of piling up.
+    With a fanout (a ParallelScorer), batches it accepts are split across its worker processes
+    instead; one such batch runs at a time, since each already uses every fan-out worker.
+    """
+
+    def __init__(self, engine, mode: str = "thread", max_workers: int = 4, max_queue: int = 64,
+                 fanout=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        if max_workers <= 0 or max_queue < 0:
+            raise ValueError("max_workers must be positive and max_queue non-negative")
+        self.engine = engine
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._in_flight = 0
+        self._pool = self._create_pool()
+        self.fanout = fanout
+        self._fanout_dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fanout") if fanout else None
+
+    def _create_pool(self) -> Executor:
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scoring")
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker_engine,
+                                   initargs=(worker_engine_kwargs(self.engine),))
+
+    def replace_engine(self, engine):
+        """Route new calls to engine; calls already submitted finish on the previous one"""
+        self.engine = engine
+        if self.mode == "process":
+            old_pool, self._pool = self._pool, self._create_pool()
+            old_pool.shutdown(wait=False)
+        if self.fanout is not None:
+            self.fanout.replace_engine(engine)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, method: str, *args, engine=None) -> Tuple[Any, Dict[str, float]]:
+        """Call engine.<method>(*args) on the pool; returns the result and its timings in ms.
+
+        engine pins the call to an engine captured earlier (e.g. at the start of a stream), so a
+        reload in between does not switch models mid-request. Once that engine has been replaced,
+        its calls run on a thread, since process and fan-out workers only hold the current one.
+        """
+        engine = self.engine if engine is None else engine
+        profile = current_request_profile()
+        if profile is not None:
+            return self._run_profiled(profile, engine, method, args)
+        if self._in_flight >= self.capacity:
+            raise ScoringQueueFull(f"Scoring queue full ({self._in_flight} requests in flight)")
+
+        self._in_flight += 1
+        try:
+            current = engine is self.engine
+            # Thread workers share the current engine; process workers use their own copy
+            target = None if self.mode == "process" and current else engine
+            pool = self._pool if self.mode == "thread" or current else None
+            if current and self.fanout is not None and self.fanout.accepts(method, args):
+                target, pool = self.fanout, self._fanout_dispatcher
+            submitted = time.monotonic()
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                pool, functools.partial(_timed_call, target, method, args)
+            )
+        finally:
+            self._in_flight -= 1
+
+        timings = {
+            "queue_wait_ms": round((started - submitted) * 1000, 3),
+            "execution_ms": round((finished - started) * 1000, 3),
+        }
+        logger.debug(f"{method}: queue wait {timings['queue_wait_ms']}ms, "
+                     f"execution {timings['execution_ms']}ms")
+        return result, timings
+
+    def _run_profiled(self, profile, engine, method: str, args: tuple) -> Tuple[Any, Dict[str, float]]:
+        """Run the call inline under the request's cProfile (which only sees its own thread).
+
+        This blocks the event loop for the duration of one call; it is only used for
+        admin-requested profiles.
+        """
+        profile.enable()
+        try:
+            result, started, finished = _timed_call(engine, method, args)
+        finally:
+            profile.disable()
+        return result, {"queue_wait_ms": 0.0, "execution_ms": round((finished - started) * 1000, 3)}
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "fanout": self.fanout.stats() if self.fanout is not None else None
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+        if self.fanout is not None:
+            self._fanout_dispatcher.shutdown(wait=wait)
+            self.fanout.shutdown(wait=wait)
+
+TIMING_HEADERS = {
+    "queue_wait_ms": "X-Queue-Wait-Ms",
+    "execution_ms": "X-Execution-Ms",
+    "coalesce_wait_ms": "X-Coalesce-Wait-Ms",
+    "batch_size": "X-Batch-Size",
+}
+
+def timing_headers(timings: Optional[Dict[str, float]]) -> Dict[str, str]:
+    if not timings:
+        return {}
+    return {header: str(timings[key]) for key, header in TIMING_HEADERS.items() if key in timings}
@@ -0,0 +1,217 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts observations <= bounds[i], the last one the overflow"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+            buckets["overflow"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "mean": round(self.total / self.count, 3) if self.count else 0.0,
+                "max": round(self.max, 3),
+                "buckets": buckets
+            }
+
+    def prometheus_lines(self, name: str, labels: str = "") -> List[str]:
+        """Cumulative le buckets plus _sum and _count in Prometheus text format"""
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.total
+        separator = "," if labels else ""
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.bounds, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {total:.9g}")
+        lines.append(f"{name}_count{suffix} {count}")
+        return lines
+
+# Seconds; spans the ~10us compiled-forest predict up to multi-second batch requests
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped))
+
+class MetricsRegistry:
+    """Process-wide labelled counters and histograms rendered in Prometheus text format.
+
+    Recording is a dict lookup plus a locked increment, cheap enough for every request.
+    Gauges are callbacks evaluated only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._bounds: Dict[str, Sequence[float]] = {}
+        self._gauges: Dict[str, Callable[[], Iterable[Tuple[dict, float]]]] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._descriptions[name] = ("counter", help_text)
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self._descriptions[name] = ("histogram", help_text)
+        self._bounds[name] = bounds
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Iterable[Tuple[dict, float]]]):
+        """collect() returns (labels, value) pairs at scrape time"""
+        self._descriptions[name] = ("gauge", help_text)
+        self._gauges[name] = collect
+
+    def register_histogram(self, name: str, help_text: str, histogram: Histogram):
+        """Expose a histogram owned elsewhere (e.g. the coalescer's) under name"""
+        self._descriptions[name] = ("histogram", help_text)
+        self._bounds[name] = histogram.bounds
+        with self._lock:
+            self._histograms[(name, ())] = histogram
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def labelled_histogram(self, name: str, **labels) -> Histogram:
+        """The histogram for one label set; hot paths can hold on to it and call observe() directly"""
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self._bounds[name]))
+        return histogram
+
+    def observe(self, name: str, value: float, **labels):
+        self.labelled_histogram(name, **labels).observe(value)
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        lines = []
+        for name, (kind, help_text) in sorted(self._descriptions.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        suffix = f"{{{_format_labels(labels)}}}" if labels else ""
+                        lines.append(f"{name}{suffix} {value:g}")
+            elif kind == "histogram":
+                for (metric, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                    if metric == name:
+                        lines.extend(histogram.prometheus_lines(name, _format_labels(labels)))
+            else:
+                try:
+                    samples = list(self._gauges[name]())
+                except Exception:
+                    samples = []
+                for labels, value in samples:
+                    formatted = _format_labels(tuple(sorted(labels.items())))
+                    lines.append(f"{name}{{{formatted}}} {value:g}" if formatted else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+REGISTRY.histogram("pricing_stage_seconds", "Time spent in each pricing stage")
+REGISTRY.histogram("pricing_request_seconds", "End-to-end HTTP request latency")
+REGISTRY.counter("pricing_requests_total", "HTTP requests by route and status code")
+REGISTRY.counter("pricing_errors_total", "Pricing failures by exception type")
+REGISTRY.histogram("pricing_batch_size", "Customers per batch pricing request", SIZE_BUCKETS)
+
+_stage_histograms: Dict[str, Histogram] = {}
+
+def observe_stage(stage: str, started: float) -> float:
+    """Record the time since started (a perf_counter value) for stage; returns the current time"""
+    now = time.perf_counter()
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms[stage] = REGISTRY.labelled_histogram("pricing_stage_seconds", stage=stage)
+    histogram.observe(now - started)
+    return now
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template and status.
+
+    It doesn't wrap receive(), so streaming endpoints that read the body while responding
+    are unaffected. The start time is left in the request state for per-stage timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_started"] = started
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REGISTRY.inc("pricing_requests_total", route=path, method=scope["method"], status=str(status["code"]))
+            REGISTRY.observe("pricing_request_seconds", time.perf_counter() - started, route=path)
+
+def process_memory_kb() -> Dict[str, int]:
+    """Current RSS of this process, split into private (anon) and file-backed/shared pages.
+
+    Memory-mapped model arrays show up under rss_file_kb and are shared between workers.
+    """
+    memory = {}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem", "VmHWM"):
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else 0
+    return {
+        "rss_kb": memory.get("VmRSS", 0),
+        "rss_anon_kb": memory.get("RssAnon", 0),
+        "rss_file_kb": memory.get("RssFile", 0),
+        "rss_shmem_kb": memory.get("RssShmem", 0),
+        # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+        "peak_rss_kb": memory.get("VmHWM", peak // 1024 if sys.platform == "darwin" else peak)
+    }
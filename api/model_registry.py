@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from api.compiled_forest import file_signature, model_version
+from api.pricing_engine import PricingEngine
+
+logger = logging.getLogger(__name__)
+
+# Smoke-test customer shared with /api/test_model/
+TEST_CUSTOMER = {
+    "Recency": 30,
+    "Frequency": 5,
+    "MonetaryValue": 500,
+    "Tenure": 365,
+    "AvgDaysBetweenPurchases": 30,
+    "Age": 35,
+    "UniqueProductsCount": 3,
+    "product_cost": 50.0
+}
+
+def validate_engine(engine: PricingEngine) -> dict:
+    """Price the smoke-test customer and check the result is sane; raises ValueError otherwise"""
+    result = engine.calculate_dynamic_price(TEST_CUSTOMER, product_cost=TEST_CUSTOMER["product_cost"])
+    if not isinstance(result["dynamic_price"], float):
+        raise ValueError("Invalid price prediction")
+    if result["dynamic_price"] < result["min_price"]:
+        raise ValueError("Price below minimum threshold")
+    return result
+
+class ModelRegistry:
+    """Holds the live PricingEngine and swaps in newly trained models without a restart.
+
+    A reload builds and validates a new engine in the background; only when that succeeds is
+    the engine reference replaced. Requests already holding the old engine finish on it.
+    """
+
+    def __init__(self, engine_factory: Callable[[str], PricingEngine], model_path: str):
+        self.engine_factory = engine_factory
+        self.model_path = model_path
+        self._lock = threading.Lock()
+        # Held from reload_in_background until its thread finishes
+        self._background = threading.Lock()
+        self._listeners: List[Callable[[PricingEngine], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.reloading = False
+        self.last_error: Optional[str] = None
+        self.engine: Optional[PricingEngine] = None
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._signature = None
+
+    def on_swap(self, listener: Callable[[PricingEngine], None]):
+        """Register a callback run with the new engine after each swap"""
+        self._listeners.append(listener)
+
+    def load(self, model_path: Optional[str] = None) -> PricingEngine:
+        """Build, validate and activate an engine synchronously; the old one stays on failure"""
+        model_path = model_path or self.model_path
+        with self._lock:
+            self.reloading = True
+            try:
+                started = time.perf_counter()
+                engine, version, signature = self._load_consistent(model_path)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Model reload from {model_path} failed, keeping current model: {str(e)}")
+                raise
+            finally:
+                self.reloading = False
+
+            self.engine = engine
+            self.model_path = model_path
+            self.version = version
+            self._signature = signature
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.loaded_at = datetime.now(timezone.utc).isoformat()
+            self.last_error = None
+        logger.info(f"Activated model {version} from {model_path} in {self.load_seconds}s")
+        for listener in self._listeners:
+            listener(engine)
+        return engine
+
+    def _load_consistent(self, model_path: str, attempts: int = 3) -> tuple:
+        """Build and validate an engine from a file that did not change while it was loading.
+
+        The version is hashed before the engine reads the file and the signature re-checked
+        afterwards; if the file was replaced in between the load is retried, so the engine's
+        version (which precomputed tables and segments are matched against) is its own.
+        """
+        for _ in range(attempts):
+            signature = file_signature(model_path)
+            version = model_version(model_path)
+            engine = self.engine_factory(model_path)
+            validate_engine(engine)
+            if file_signature(model_path) == signature:
+                return engine, version, signature
+            logger.info(f"{model_path} changed while loading; loading it again")
+        raise RuntimeError(f"{model_path} kept changing during {attempts} load attempts")
+
+    def reload_in_background(self, model_path: Optional[str] = None) -> bool:
+        """Start a background reload; returns False if one is already running"""
+        # Claimed here rather than in the thread, so two concurrent calls cannot both start one
+        if not self._background.acquire(blocking=False):
+            return False
+        if self._lock.locked():  # a synchronous load() is already running
+            self._background.release()
+            return False
+        try:
+            thread = threading.Thread(target=self._reload_in_thread, args=(model_path,),
+                                      name="model-reload", daemon=True)
+            thread.start()
+        except Exception:
+            self._background.release()
+            raise
+        return True
+
+    def _reload_in_thread(self, model_path: Optional[str]):
+        try:
+            self._reload_quietly(model_path)
+        finally:
+            self._background.release()
+
+    def _reload_quietly(self, model_path: Optional[str]):
+        try:
+            self.load(model_path)
+        except Exception:
+            pass  # already logged and kept in last_error
+
+    def watch(self, interval: float):
+        """Poll the model file and reload whenever it changes"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def poll():
+            last_attempt = None
+            while not self._stop_watching.wait(interval):
+                try:
+                    signature = file_signature(self.model_path)
+                except OSError:
+                    continue  # file is being replaced
+                # Try each new file once, so a model that fails validation is not reloaded in a loop
+                if signature != self._signature and signature != last_attempt:
+                    last_attempt = signature
+                    logger.info(f"Detected new model file at {self.model_path}")
+                    self._reload_quietly(None)
+
+        self._watcher = threading.Thread(target=poll, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_watching.set()
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.model_path,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "reloading": self.reloading,
+            "last_error": self.last_error
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class CustomerData(BaseModel):
     Recency: float
@@ -10,6 +10,20 @@ class CustomerData(BaseModel):
     Age: float
     UniqueProductsCount: float
     product_cost: float = 50.0
+    # Prices this catalog product: its base price, inventory multiplier and cost (if listed)
+    product_id: Optional[str] = None
 
 class BatchCustomerData(BaseModel):
-    customers: List[CustomerData]
\ No newline at end of file
+    customers: List[CustomerData]
+
+class CustomerLookupData(BaseModel):
+    CustomerID: str
+    product_cost: float = 50.0
+    product_id: Optional[str] = None
+
+class ProductPricingData(BaseModel):
+    """Every customer priced against every listed product"""
+    customers: List[CustomerData]
+    product_ids: List[str]
+    # Cost of listed products that have no Product_Cost in the catalog
+    product_cost: float = 50.0
\ No newline at end of file
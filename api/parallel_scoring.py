@@ -0,0 +1,179 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from api.executor import worker_engine_kwargs
+from api.pricing_engine import rows_from_columns
+
+logger = logging.getLogger(__name__)
+
+# Engine owned by each fan-out worker process, loaded once when the worker starts
+_worker_engine = None
+
+def _init_worker(engine_kwargs: dict):
+    global _worker_engine
+    from api.pricing_engine import PricingEngine
+    _worker_engine = PricingEngine(**engine_kwargs)
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+def _input_views(buffer, rows: int, n_features: int) -> tuple:
+    """features (rows x n_features), product_costs, base_prices, price_multipliers laid out back to back"""
+    features = np.ndarray((rows, n_features), dtype=np.float64, buffer=buffer)
+    vectors = np.ndarray((3, rows), dtype=np.float64, buffer=buffer, offset=features.nbytes)
+    return features, vectors[0], vectors[1], vectors[2]
+
+def _score_rows(input_name: str, output_name: str, rows: int, n_features: int, fields: List[str],
+                start: int, stop: int):
+    """Price rows start:stop of the shared input and write each result field into the shared output"""
+    inputs, outputs = SharedMemory(name=input_name), SharedMemory(name=output_name)
+    try:
+        features, costs, base_prices, multipliers = _input_views(inputs.buf, rows, n_features)
+        output = np.ndarray((len(fields), rows), dtype=np.float64, buffer=outputs.buf)
+        columns = _worker_engine.calculate_dynamic_prices_arrays(
+            features[start:stop], costs[start:stop], base_prices[start:stop], multipliers[start:stop])
+        for row, name in enumerate(fields):
+            values = columns[name]
+            if name == "clv_segment":
+                # Labels travel as their index into segments.labels
+                values = np.argmax(values[:, None] == np.asarray(_worker_engine.segments.labels), axis=1)
+            output[row, start:stop] = values
+        # Views must be gone before the blocks can be closed
+        del features, costs, base_prices, multipliers, output
+    finally:
+        inputs.close()
+        outputs.close()
+
+class ParallelScorer:
+    """Splits large pricing batches across a persistent pool of worker processes.
+
+    Each worker loads the model once at startup. Feature matrices and result columns move
+    through multiprocessing.shared_memory rather than being pickled, so a call only sends
+    block names and row ranges to the workers. Batches under min_rows are scored in the
+    calling process, where the fan-out overhead would outweigh the extra cores.
+    """
+
+    def __init__(self, engine, workers: int, min_rows: int = 2000):
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        self.engine = engine
+        self.workers = workers
+        self.min_rows = min_rows
+        self._pool = self._create_pool()
+
+    @classmethod
+    def from_env(cls, engine) -> Optional["ParallelScorer"]:
+        """Enabled by PRICING_FANOUT_WORKERS >= 2 (default 0: off).
+
+        Every server process starts its own pool, each worker holding its own engine, so under
+        WEB_CONCURRENCY server workers the pool is capped to keep the total within one process
+        per core, and fan-out stays off when that leaves fewer than two.
+        """
+        workers = int(os.getenv("PRICING_FANOUT_WORKERS", "0"))
+        if workers < 2:
+            return None
+        server_workers = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+        if server_workers > 1:
+            limit = (os.cpu_count() or 1) // server_workers
+            if limit < 2:
+                logger.warning(f"Fan-out disabled: {server_workers} server workers already use every core")
+                return None
+            if workers > limit:
+                logger.warning(f"Fan-out capped at {limit} workers per server process "
+                               f"({server_workers} server workers)")
+                workers = limit
+        return cls(engine, workers, min_rows=int(os.getenv("PRICING_FANOUT_MIN_ROWS", "2000")))
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # Workers must share the parent's resource tracker: one of their own would unlink the
+        # parent's blocks (and warn about leaks) when the worker exits
+        resource_tracker.ensure_running()
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(worker_engine_kwargs(self.engine),))
+        # Start every worker now so the model is loaded before the first large batch arrives
+        for _ in range(self.workers):
+            pool.submit(_worker_pid)
+        return pool
+
+    def replace_engine(self, engine):
+        """Start workers on the new model; calls already running finish on the old pool"""
+        self.engine = engine
+        old_pool, self._pool = self._pool, self._create_pool()
+        old_pool.shutdown(wait=False)
+
+    def accepts(self, method: str, args: tuple) -> bool:
+        """Whether a ScoringExecutor call is large enough to fan out"""
+        if method not in ("calculate_dynamic_prices_arrays", "calculate_dynamic_prices_batch",
+                          "calculate_batch_columns"):
+            return False
+        return len(args[0]) >= self.min_rows
+
+    def calculate_dynamic_prices_arrays(self, features: np.ndarray, product_costs: np.ndarray,
+                                        base_prices: Optional[Sequence[float]] = None,
+                                        price_multipliers: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """Same result as PricingEngine.calculate_dynamic_prices_arrays, scored on all workers"""
+        engine = self.engine
+        rows = len(features)
+        if rows < self.min_rows:
+            return engine.calculate_dynamic_prices_arrays(features, product_costs, base_prices, price_multipliers)
+        n_features = features.shape[1]
+        fields = engine.result_fields
+        inputs = SharedMemory(create=True, size=rows * (n_features + 3) * 8)
+        outputs = SharedMemory(create=True, size=rows * len(fields) * 8)
+        try:
+            shared_features, costs, base, multipliers = _input_views(inputs.buf, rows, n_features)
+            shared_features[:] = features
+            costs[:] = product_costs
+            base[:] = engine.base_price if base_prices is None else base_prices
+            # Multiplying by 1.0 leaves every price bit-identical to passing no multipliers
+            multipliers[:] = 1.0 if price_multipliers is None else price_multipliers
+            del shared_features, costs, base, multipliers
+
+            bounds = np.linspace(0, rows, self.workers + 1).astype(int)
+            futures = [
+                self._pool.submit(_score_rows, inputs.name, outputs.name, rows, n_features, fields,
+                                  int(start), int(stop))
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            ]
+            for future in futures:
+                future.result()
+
+            output = np.ndarray((len(fields), rows), dtype=np.float64, buffer=outputs.buf)
+            columns = {name: output[row].copy() for row, name in enumerate(fields)}
+            del output
+        finally:
+            inputs.close()
+            inputs.unlink()
+            outputs.close()
+            outputs.unlink()
+        if "clv_segment" in columns:
+            columns["clv_segment"] = np.asarray(engine.segments.labels)[columns["clv_segment"].astype(np.intp)]
+        return columns
+
+    def calculate_batch_columns(self, customers: Sequence[dict],
+                                product_costs: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """Same result as PricingEngine.calculate_batch_columns, scored on all workers"""
+        if len(customers) < self.min_rows:
+            return self.engine.calculate_batch_columns(customers, product_costs)
+        try:
+            return self.calculate_dynamic_prices_arrays(*self.engine.batch_arrays(customers, product_costs))
+        except Exception as e:
+            logger.error(f"Parallel batch price calculation failed: {str(e)}")
+            raise RuntimeError(f"Batch price calculation error: {str(e)}")
+
+    def calculate_dynamic_prices_batch(self, customers: Sequence[dict],
+                                       product_costs: Optional[Sequence[float]] = None) -> List[dict]:
+        """Same result as PricingEngine.calculate_dynamic_prices_batch, scored on all workers"""
+        return rows_from_columns(self.calculate_batch_columns(customers, product_costs))
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "min_rows": self.min_rows}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
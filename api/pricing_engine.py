@@ -1,61 +1,456 @@
 import joblib
-import pandas as pd
 import numpy as np
 import logging
-from sklearn.base import BaseEstimator
+import threading
+import time
+import warnings
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Union
+from pydantic import BaseModel
+from api.cache import PricingCache
+from api.compiled_forest import CompiledForest, compile_model, compiled_artifact_path
+from api.metrics import observe_stage
+from api.segments import CLVSegments, load_segments
+from api.surrogate import load_surrogate
+
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
 
 logger = logging.getLogger(__name__)
 
+# The model is fitted on a DataFrame, so sklearn warns whenever it is handed a bare matrix.
+# Matrices built here always follow REQUIRED_FEATURES order, which makes them equivalent.
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+REQUIRED_FEATURES = ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
+                     'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount']
+RESULT_FIELDS = ['base_price', 'dynamic_price', 'clv', 'price_adjustment_factor',
+                 'min_price', 'profit_margin']
+# Added to results when segment pricing is on and the model has CLV segments (see api.segments)
+SEGMENT_FIELDS = ['clv_segment', 'segment_multiplier']
+
+def _round_like_python(values: np.ndarray) -> np.ndarray:
+    """Round to 2 decimals with the same result as the builtin round() on a float.
+
+    np.round scales by 100 before rounding, which can pick the other side of a
+    near-tie (e.g. 2.675). Those few elements are re-rounded in Python.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100.0
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near_tie):
+        # Flat views so this works for the 2-D customer x product grids too
+        flat_rounded, flat_values = rounded.reshape(-1), values.reshape(-1)
+        for i in near_tie:
+            flat_rounded[i] = round(float(flat_values[i]), 2)
+    return rounded
+
+def rows_from_columns(columns: Dict[str, np.ndarray]) -> List[dict]:
+    """Turn the column arrays from calculate_dynamic_prices_arrays into per-row result dicts"""
+    names = [name for name in RESULT_FIELDS + SEGMENT_FIELDS if name in columns]
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
 class PricingEngine:
-    def __init__(self, model_path: str, base_price: float = 100.0):
+    required_features = REQUIRED_FEATURES
+    # Above this many rows sklearn's Cython traversal beats the NumPy one
+    compiled_max_rows = 1024
+    # CLV range mapped onto the 0.8-1.2 price adjustment factor
+    clv_low = 100
+    clv_high = 1000
+
+    def __init__(self, model_path: str, base_price: float = 100.0, fast_path: bool = False,
+                 compile_forest: bool = True, cache: Optional[PricingCache] = None,
+                 mmap_compiled: bool = False, surrogate_tolerance: Optional[float] = None,
+                 segment_pricing: bool = False):
         self.model_path = model_path
         self.base_price = base_price
-        self.model = self._load_model()
-        
-    def _load_model(self) -> BaseEstimator:
+        self.fast_path = fast_path
+        self.compile_forest = compile_forest
+        self.mmap_compiled = mmap_compiled
+        self.surrogate_tolerance = surrogate_tolerance
+        self.segment_pricing = segment_pricing
+        self.compiled_model: Optional[CompiledForest] = None
+        self._model: Optional["BaseEstimator"] = None
+        self.surrogate_report: Optional[dict] = None
+        if surrogate_tolerance is not None and self._load_surrogate(surrogate_tolerance):
+            pass
+        elif not (mmap_compiled and self._load_compiled_artifact()):
+            self._model = self._load_model()
+        # With segment pricing on, the segment multiplier replaces the continuous CLV factor
+        self.segments: Optional[CLVSegments] = load_segments(model_path) if segment_pricing else None
+        if self.segments is not None:
+            logger.info(f"Pricing with CLV segment boundaries {self.segments.info()['boundaries']}")
+        elif segment_pricing:
+            logger.warning(f"Segment pricing is on but {model_path} has no CLV segments; using the CLV factor")
+        self._buffers = threading.local()
+        self.cache = cache
+        if self.cache is not None:
+            self.cache.watch(self.model_path)
+
+    @property
+    def model(self) -> "BaseEstimator":
+        """The sklearn model; deferred in mmap mode until a call actually needs it"""
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    @property
+    def sklearn_model_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def result_fields(self) -> List[str]:
+        """Fields of every priced result from this engine, in output order"""
+        return RESULT_FIELDS + SEGMENT_FIELDS if self.segments is not None else list(RESULT_FIELDS)
+
+    def _load_compiled_artifact(self) -> bool:
+        """Memory-map the exported compiled forest so worker processes share its pages"""
+        artifact_path = compiled_artifact_path(self.model_path)
+        if not CompiledForest.is_current(artifact_path, self.model_path):
+            logger.warning(f"No current compiled model at {artifact_path}, loading {self.model_path}")
+            return False
+        try:
+            self.compiled_model = CompiledForest.load(artifact_path, mmap_mode="r")
+        except Exception as e:
+            logger.warning(f"Failed to memory-map compiled model: {str(e)}")
+            return False
+        # Score every batch size on the shared arrays rather than a private sklearn copy
+        self.compiled_max_rows = float("inf")
+        logger.info(f"Memory-mapped compiled model from {artifact_path}")
+        return True
+
+    def _load_surrogate(self, tolerance: float) -> bool:
+        """Serve from the distilled surrogate when its recorded price error is within tolerance"""
+        surrogate = load_surrogate(self.model_path, tolerance)
+        if surrogate is None:
+            return False
+        self._model, self.surrogate_report = surrogate
+        if self.compile_forest:
+            self.compiled_model = compile_model(self._model)
+        logger.info(f"Serving distilled surrogate for {self.model_path} "
+                    f"(max price error {self.surrogate_report['max_rel_price_error']:.4%})")
+        return True
+
+    def _load_model(self) -> "BaseEstimator":
         try:
             model = joblib.load(self.model_path)
             logger.info(f"Successfully loaded model from {self.model_path}")
-            return model
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             raise RuntimeError(f"Model loading failed: {str(e)}")
-    
-    def calculate_clv(self, customer_data: dict) -> float:
+
+        if self.compile_forest and self.compiled_model is None:
+            try:
+                self.compiled_model = compile_model(model)
+            except Exception as e:
+                # sklearn predict stays available as the reference implementation
+                logger.warning(f"Model compilation failed, falling back to sklearn: {str(e)}")
+                self.compiled_model = None
+        return model
+
+    def _predict_matrix(self, features: np.ndarray) -> np.ndarray:
+        """Predict raw CLV for a feature matrix, preferring the compiled forest"""
+        if (self.compiled_model is not None and len(features) <= self.compiled_max_rows
+                and np.isfinite(features).all()):
+            return self.compiled_model.predict(features)
+        return self.model.predict(features)
+
+    def _cache_key(self, customer_data: Union[dict, BaseModel], *extra: float) -> tuple:
+        try:
+            if isinstance(customer_data, dict):
+                features = [customer_data[name] for name in self.required_features]
+            else:
+                features = [getattr(customer_data, name) for name in self.required_features]
+        except (KeyError, AttributeError):
+            fields = customer_data if isinstance(customer_data, dict) else customer_data.__fields__
+            missing_features = set(self.required_features) - set(fields)
+            raise RuntimeError(f"CLV calculation error: Missing required features: {missing_features}")
+        return self.cache.make_key(*features) + tuple(float(value) for value in extra)
+
+    def calculate_clv(self, customer_data: Union[dict, BaseModel]) -> float:
+        if self.cache is None:
+            return self._compute_clv(customer_data)
+        key = ("clv",) + self._cache_key(customer_data)
+        clv = self.cache.get(key)
+        if clv is None:
+            clv = self._compute_clv(customer_data)
+            self.cache.put(key, clv)
+        return clv
+
+    def _compute_clv(self, customer_data: Union[dict, BaseModel]) -> float:
+        if self.fast_path:
+            return self._calculate_clv_fast(customer_data)
+        if isinstance(customer_data, BaseModel):
+            customer_data = customer_data.dict()
+        # pandas is only needed on this reference path; importing it lazily keeps startup fast
+        import pandas as pd
         try:
+            started = time.perf_counter()
             input_df = pd.DataFrame([customer_data])
-            required_features = ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
-                               'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount']
+            required_features = self.required_features
             missing_features = set(required_features) - set(input_df.columns)
             if missing_features:
                 raise ValueError(f"Missing required features: {missing_features}")
-                
-            clv = self.model.predict(input_df[required_features])[0]
+            input_df = input_df[required_features]
+            started = observe_stage("features", started)
+
+            clv = self.model.predict(input_df)[0]
+            observe_stage("predict", started)
             return max(0, clv)
         except Exception as e:
             logger.error(f"CLV calculation failed: {str(e)}")
             raise RuntimeError(f"CLV calculation error: {str(e)}")
-    
-    def calculate_dynamic_price(self, customer_data: dict, product_cost: float = 50.0) -> dict:
+
+    def _feature_buffer(self) -> np.ndarray:
+        """Per-thread preallocated 1 x n_features row reused across single-customer calls"""
+        buffer = getattr(self._buffers, "features", None)
+        if buffer is None:
+            buffer = np.empty((1, len(self.required_features)), dtype=np.float64)
+            self._buffers.features = buffer
+        return buffer
+
+    def _calculate_clv_fast(self, customer_data: Union[dict, BaseModel]) -> float:
+        """Score one customer without pandas, reading fields straight into the feature buffer"""
         try:
-            clv = self.calculate_clv(customer_data)
-            clv_factor = self._normalize_clv(clv)
-            dynamic_price = max(product_cost * 1.1, self.base_price * clv_factor)
-            
-            return {
-                "base_price": self.base_price,
-                "dynamic_price": round(dynamic_price, 2),
-                "clv": round(clv, 2),
-                "price_adjustment_factor": round(clv_factor, 2),
-                "min_price": round(product_cost * 1.1, 2),
-                "profit_margin": round((dynamic_price - product_cost) / dynamic_price * 100, 2)
-            }
+            started = time.perf_counter()
+            buffer = self._feature_buffer()
+            row = buffer[0]
+            if isinstance(customer_data, dict):
+                try:
+                    for i, name in enumerate(self.required_features):
+                        row[i] = customer_data[name]
+                except KeyError:
+                    missing_features = set(self.required_features) - set(customer_data)
+                    raise ValueError(f"Missing required features: {missing_features}")
+            else:
+                for i, name in enumerate(self.required_features):
+                    row[i] = getattr(customer_data, name)
+            started = observe_stage("features", started)
+
+            clv = self._predict_matrix(buffer)[0]
+            observe_stage("predict", started)
+            return max(0, clv)
+        except Exception as e:
+            logger.error(f"CLV calculation failed: {str(e)}")
+            raise RuntimeError(f"CLV calculation error: {str(e)}")
+
+    def calculate_dynamic_price(self, customer_data: Union[dict, BaseModel], product_cost: float = 50.0,
+                                base_price: Optional[float] = None, price_multiplier: float = 1.0) -> dict:
+        """Price one customer. base_price and price_multiplier come from the product being priced
+        (see ProductCatalog); without them the engine's base_price applies unchanged."""
+        if base_price is None:
+            base_price = self.base_price
+        if self.cache is None:
+            return self._compute_dynamic_price(customer_data, product_cost, base_price, price_multiplier)
+        key = ("price",) + self._cache_key(customer_data, product_cost, base_price, price_multiplier)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._compute_dynamic_price(customer_data, product_cost, base_price, price_multiplier)
+            self.cache.put(key, result)
+        return dict(result)
+
+    def _compute_dynamic_price(self, customer_data: Union[dict, BaseModel], product_cost: float = 50.0,
+                               base_price: Optional[float] = None, price_multiplier: float = 1.0) -> dict:
+        try:
+            return self.price_from_clv(self.calculate_clv(customer_data), product_cost, base_price, price_multiplier)
         except Exception as e:
             logger.error(f"Price calculation failed: {str(e)}")
             raise RuntimeError(f"Price calculation error: {str(e)}")
-    
+
+    def price_from_clv(self, clv: float, product_cost: float = 50.0, base_price: Optional[float] = None,
+                       price_multiplier: float = 1.0) -> dict:
+        """Apply the pricing formula to an already known CLV (e.g. from a precomputed table).
+
+        price_multiplier scales the CLV-adjusted price before the cost floor is applied. Under
+        segment pricing the CLV factor is the customer's segment multiplier.
+        """
+        started = time.perf_counter()
+        if base_price is None:
+            base_price = self.base_price
+        if self.segments is not None:
+            segment, clv_factor = self.segments.lookup(clv)
+        else:
+            segment, clv_factor = None, self._normalize_clv(clv)
+        dynamic_price = max(product_cost * 1.1, base_price * clv_factor * price_multiplier)
+
+        result = {
+            "base_price": base_price,
+            "dynamic_price": round(dynamic_price, 2),
+            "clv": round(clv, 2),
+            "price_adjustment_factor": round(clv_factor, 2),
+            "min_price": round(product_cost * 1.1, 2),
+            "profit_margin": round((dynamic_price - product_cost) / dynamic_price * 100, 2)
+        }
+        if segment is not None:
+            result["clv_segment"] = segment
+            result["segment_multiplier"] = clv_factor
+        observe_stage("pricing", started)
+        return result
+
+    def build_feature_matrix(self, customers: Sequence[dict]) -> np.ndarray:
+        """Stack customer feature dicts into a C-contiguous float64 matrix in required_features order"""
+        features = np.empty((len(customers), len(self.required_features)), dtype=np.float64)
+        for row, customer_data in enumerate(customers):
+            try:
+                features[row] = [customer_data[name] for name in self.required_features]
+            except KeyError:
+                missing_features = set(self.required_features) - set(customer_data)
+                raise ValueError(f"Missing required features: {missing_features}")
+        return features
+
+    def predict_clv_batch(self, features: np.ndarray) -> np.ndarray:
+        """Run the model once over a feature matrix and clip CLV at zero"""
+        clv = self._predict_matrix(features)
+        return np.maximum(clv, 0)
+
+    def _per_row(self, values: Optional[np.ndarray], rows: int, default: float, name: str) -> np.ndarray:
+        if values is None:
+            return np.full(rows, default, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (rows,):
+            raise ValueError(f"{name} must have one entry per customer")
+        return values
+
+    def calculate_dynamic_prices_arrays(self, features: np.ndarray, product_costs: np.ndarray,
+                                        base_prices: Optional[np.ndarray] = None,
+                                        price_multipliers: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Vectorized pricing of a feature matrix; returns one rounded array per result field.
+
+        Values match calculate_dynamic_price row for row. base_prices and price_multipliers give
+        per-row values (e.g. from a product catalog); by default the engine's base_price and a
+        multiplier of 1 are broadcast.
+        """
+        costs = np.asarray(product_costs, dtype=np.float64)
+        if costs.shape != (len(features),):
+            raise ValueError("product_costs must have one entry per customer")
+        base = self._per_row(base_prices, len(features), self.base_price, "base_prices")
+        if price_multipliers is not None:
+            price_multipliers = self._per_row(price_multipliers, len(features), 1.0, "price_multipliers")
+        started = time.perf_counter()
+        clv = self.predict_clv_batch(features)
+        started = observe_stage("predict", started)
+        columns = self._price_columns(clv, self.clv_factor(clv), costs, base, price_multipliers)
+        observe_stage("pricing", started)
+        return columns
+
+    def calculate_product_price_grid(self, features: np.ndarray, product_costs: np.ndarray,
+                                     base_prices: np.ndarray, price_multipliers: np.ndarray) -> Dict[str, np.ndarray]:
+        """Price every customer (rows of features) against every product in one broadcast.
+
+        CLV is predicted once per customer; "clv" and "price_adjustment_factor" have one entry per
+        customer, "base_price" and "min_price" one per product and the remaining fields are
+        customers x products. Each cell equals calculate_dynamic_price for that pair.
+        """
+        costs = np.asarray(product_costs, dtype=np.float64)
+        base = np.asarray(base_prices, dtype=np.float64)
+        multipliers = np.asarray(price_multipliers, dtype=np.float64)
+        if not (costs.ndim == 1 and costs.shape == base.shape == multipliers.shape):
+            raise ValueError("product_costs, base_prices and price_multipliers must have one entry per product")
+        started = time.perf_counter()
+        clv = self.predict_clv_batch(features)
+        started = observe_stage("predict", started)
+        clv_factor = self.clv_factor(clv)
+        columns = self._price_columns(clv, clv_factor[:, None], costs[None, :], base[None, :], multipliers[None, :])
+        columns["price_adjustment_factor"] = columns["price_adjustment_factor"][:, 0]
+        columns["base_price"], columns["min_price"] = base, columns["min_price"][0]
+        observe_stage("pricing", started)
+        return columns
+
+    def dynamic_price_matrix(self, clv: np.ndarray, product_costs: np.ndarray, base_prices: np.ndarray,
+                             price_multipliers: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+        """Rounded dynamic prices (customers x products) for already predicted CLVs.
+
+        The lean core of calculate_product_price_grid for price-matrix generation: prices only,
+        cast to dtype (float32 halves the output; cents stay exact below ~100k). Rounding is
+        np.round throughout, so a cell can differ from the API by a cent on half-cent ties.
+        """
+        prices = np.multiply.outer(self.clv_factor(clv), np.asarray(base_prices, dtype=np.float64))
+        if price_multipliers is not None:
+            prices *= np.asarray(price_multipliers, dtype=np.float64)
+        np.maximum(prices, np.asarray(product_costs, dtype=np.float64) * 1.1, out=prices)
+        return np.round(prices, 2, out=prices).astype(dtype, copy=False)
+
+    def _price_columns(self, clv: np.ndarray, clv_factor: np.ndarray, costs: np.ndarray, base: np.ndarray,
+                       multipliers: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+        """The pricing formula over broadcastable arrays, rounded exactly like price_from_clv"""
+        min_price = costs * 1.1
+        clv_price = base * clv_factor
+        if multipliers is not None:
+            clv_price = clv_price * multipliers
+        floor_applies = ~(clv_price > min_price)
+        dynamic_price = np.where(floor_applies, min_price, clv_price)
+        profit_margin = (dynamic_price - costs) / dynamic_price * 100
+
+        # Scalar path rounds NumPy scalars with np.round and Python floats with round();
+        # mirror that per element so batch rows stay identical to single-row results.
+        # The segment multiplier is a Python float, so segment prices are Python floats throughout.
+        python_floats = floor_applies if self.segments is None else np.ones_like(floor_applies)
+        columns = {
+            "base_price": base,
+            "dynamic_price": np.where(python_floats, _round_like_python(dynamic_price),
+                                      np.round(dynamic_price, 2)),
+            "clv": np.round(clv, 2),
+            "price_adjustment_factor": np.round(clv_factor, 2),
+            "min_price": _round_like_python(min_price),
+            "profit_margin": np.where(python_floats, _round_like_python(profit_margin),
+                                      np.round(profit_margin, 2)),
+        }
+        if self.segments is not None:
+            columns["clv_segment"], columns["segment_multiplier"] = self.segments.lookup_batch(clv)
+        return columns
+
+    def batch_arrays(self, customers: Sequence[dict], product_costs: Optional[Sequence[float]] = None) -> tuple:
+        """Arguments for calculate_dynamic_prices_arrays from customer dicts: features, product costs,
+        and per-row base prices and multipliers (None unless some customer sets them)"""
+        if product_costs is None:
+            product_costs = [customer_data.get("product_cost", 50.0) for customer_data in customers]
+        if len(product_costs) != len(customers):
+            raise ValueError("product_costs must have one entry per customer")
+        started = time.perf_counter()
+        features = self.build_feature_matrix(customers)
+        observe_stage("features", started)
+        base_prices = price_multipliers = None
+        if any("base_price" in customer_data or "price_multiplier" in customer_data
+               for customer_data in customers):
+            base_prices = [self.base_price if customer_data.get("base_price") is None
+                           else customer_data["base_price"] for customer_data in customers]
+            price_multipliers = [customer_data.get("price_multiplier", 1.0) for customer_data in customers]
+        return features, np.asarray(product_costs, dtype=np.float64), base_prices, price_multipliers
+
+    def calculate_dynamic_prices_batch(self, customers: Sequence[dict],
+                                       product_costs: Optional[Sequence[float]] = None) -> List[dict]:
+        """Price a whole batch with a single model.predict call.
+
+        Produces the same per-row dicts as calculate_dynamic_price. product_costs defaults to
+        each customer's 'product_cost' entry, or 50.0 when absent; 'base_price' and
+        'price_multiplier' entries (set for catalog products) are honoured per row.
+        """
+        columns = self.calculate_batch_columns(customers, product_costs)
+        started = time.perf_counter()
+        rows = rows_from_columns(columns)
+        observe_stage("rows", started)
+        return rows
+
+    def calculate_batch_columns(self, customers: Sequence[dict],
+                                product_costs: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """calculate_dynamic_prices_batch as one array per result field, for responses that are
+        serialized straight from the arrays"""
+        try:
+            if not customers:
+                if product_costs:
+                    raise ValueError("product_costs must have one entry per customer")
+                return {name: np.empty(0) for name in self.result_fields}
+            return self.calculate_dynamic_prices_arrays(*self.batch_arrays(customers, product_costs))
+        except Exception as e:
+            logger.error(f"Batch price calculation failed: {str(e)}")
+            raise RuntimeError(f"Batch price calculation error: {str(e)}")
+
+    def clv_factor(self, clv: np.ndarray) -> np.ndarray:
+        """The price adjustment factor for predicted CLVs: the segment multiplier under segment
+        pricing, otherwise the continuous 0.8-1.2 scale"""
+        if self.segments is not None:
+            return self.segments.lookup_batch(clv)[1]
+        return self._normalize_clv(clv)
+
     def _normalize_clv(self, clv: float) -> float:
-        low_clv = 100
-        high_clv = 1000
-        normalized = np.clip((clv - low_clv) / (high_clv - low_clv), 0, 1)
+        normalized = np.clip((clv - self.clv_low) / (self.clv_high - self.clv_low), 0, 1)
         return 0.8 + (0.4 * normalized)
\ No newline at end of file
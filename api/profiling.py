@@ -0,0 +1,155 @@
+import cProfile
+import contextvars
+import hmac
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# cProfile of the request being handled, set by ProfilingMiddleware for X-Profile requests
+_request_profile: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+def current_request_profile() -> Optional[cProfile.Profile]:
+    return _request_profile.get()
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a sampling session is already running"""
+
+def _frame_label(code, labels: Dict) -> str:
+    label = labels.get(code)
+    if label is None:
+        filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+        label = labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """Sample the stack of every other thread each interval for seconds.
+
+    Returns collapsed stacks (root first, ';'-separated, thread name as the root frame)
+    mapped to the number of samples they were seen in.
+    """
+    own_thread = threading.get_ident()
+    labels: Dict = {}
+    counts: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code, labels))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+def collapsed_text(counts: Counter) -> str:
+    """Brendan Gregg's collapsed format, as read by flamegraph.pl, speedscope and inferno"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+def profile_dump(profile: cProfile.Profile) -> bytes:
+    """The bytes Profile.dump_stats would write; load with pstats.Stats or snakeviz"""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+class ProfilingService:
+    """Admin-only on-demand profiling of the serving process, off unless enabled.
+
+    Two modes: sample() records every thread's stack for a few seconds and returns
+    collapsed stacks; requests sent with an X-Profile header have their engine call run
+    under cProfile and the dump kept for download. Both need the admin token.
+    """
+
+    def __init__(self, enabled: bool = False, admin_token: Optional[str] = None,
+                 max_seconds: float = 60.0, keep: int = 16):
+        # Never enabled without a token, whatever the flag says
+        self.enabled = enabled and bool(admin_token)
+        self.admin_token = admin_token
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self._sampling = threading.Lock()
+        self._profiles: "OrderedDict[str, bytes]" = OrderedDict()
+        self._profiles_lock = threading.Lock()
+        if enabled and not admin_token:
+            logger.warning("Profiling requested but PRICING_ADMIN_TOKEN is not set; profiling disabled")
+
+    @classmethod
+    def from_env(cls) -> "ProfilingService":
+        return cls(
+            enabled=os.getenv("PRICING_PROFILING", "0") == "1",
+            admin_token=os.getenv("PRICING_ADMIN_TOKEN") or None,
+            max_seconds=float(os.getenv("PRICING_PROFILE_MAX_SECONDS", "60"))
+        )
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def sample(self, seconds: float, interval: float = 0.005) -> str:
+        """Blocking; run it off the event loop. Raises ProfilerBusy if a session is running."""
+        seconds = min(max(seconds, interval), self.max_seconds)
+        if not self._sampling.acquire(blocking=False):
+            raise ProfilerBusy("A profiling session is already running")
+        try:
+            logger.info(f"Sampling stacks for {seconds}s every {interval * 1000:g}ms")
+            return collapsed_text(sample_stacks(seconds, interval))
+        finally:
+            self._sampling.release()
+
+    def store(self, profile_id: str, profile: cProfile.Profile):
+        """Keep the dump under profile_id; only the most recent `keep` dumps are retained"""
+        dump = profile_dump(profile)
+        with self._profiles_lock:
+            self._profiles[profile_id] = dump
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[bytes]:
+        with self._profiles_lock:
+            return self._profiles.get(profile_id)
+
+class ProfilingMiddleware:
+    """Profiles requests carrying X-Profile: cprofile and a valid X-Admin-Token.
+
+    The profile is exposed to ScoringExecutor through a context variable; the response
+    gets an X-Profile-Id header naming the stored dump.
+    """
+
+    def __init__(self, app, service: ProfilingService):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"cprofile" or not self.service.authorized(
+                headers.get(b"x-admin-token", b"").decode("latin-1") or None):
+            await self.app(scope, receive, send)
+            return
+
+        profile = cProfile.Profile()
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []),
+                                                   (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        token = _request_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_profile.reset(token)
+            self.service.store(profile_id, profile)
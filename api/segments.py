@@ -0,0 +1,167 @@
+import logging
+import os
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from api.compiled_forest import model_version
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_VERSION = 2
+SEGMENT_LABELS = ("low", "medium", "high")
+# Segment cut points as quantiles of the predicted CLV distribution (equal-sized tertiles)
+SEGMENT_QUANTILES = (1 / 3, 2 / 3)
+# Low-CLV customers pay a little more, high-CLV a little less
+SEGMENT_MULTIPLIERS = {"low": 1.05, "medium": 1.0, "high": 0.95}
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch (a KLL-style compactor stack).
+
+    Level h holds items that each stand for 2**h inputs. When a level reaches capacity it is
+    sorted and every other item (from a random offset) moves up a level, so memory stays at
+    about capacity * log2(n / capacity) items and a quantile's rank error stays near
+    log2(n / capacity) / capacity of n, however many CLVs are added.
+    """
+
+    def __init__(self, capacity: int = 1024, seed: int = 0):
+        self.capacity = capacity
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def update(self, values: Sequence[float]):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def merge(self, other: "QuantileSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self.capacity:
+                items = np.sort(items)
+                # An odd item out stays behind so total weight is preserved exactly
+                odd = len(items) % 2
+                self.levels[level] = items[len(items) - odd:]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                promoted = items[self._rng.integers(2):len(items) - odd:2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        if not self.count:
+            raise ValueError("Quantiles of an empty sketch are undefined")
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        ranks = np.cumsum(weights[order])
+        positions = np.searchsorted(ranks, np.asarray(qs, dtype=np.float64) * ranks[-1], side="left")
+        return values[order][np.minimum(positions, len(values) - 1)]
+
+class CLVSegments:
+    """CLV segment boundaries for one model, derived from a quantile sketch of its predictions.
+
+    Segment i covers boundaries[i - 1] <= clv < boundaries[i]; lookups are a binary search
+    over the boundary array. The sketch is kept so new predictions can move the boundaries
+    without re-sorting every CLV seen so far.
+    """
+
+    def __init__(self, sketch: QuantileSketch, quantiles: Sequence[float] = SEGMENT_QUANTILES,
+                 labels: Sequence[str] = SEGMENT_LABELS, multipliers: Optional[Dict[str, float]] = None):
+        if len(labels) != len(quantiles) + 1:
+            raise ValueError("Need exactly one more segment label than quantile cut point")
+        self.sketch = sketch
+        self.quantiles = tuple(quantiles)
+        self.labels = tuple(labels)
+        self.multipliers = dict(SEGMENT_MULTIPLIERS if multipliers is None else multipliers)
+        self._label_array = np.asarray(self.labels)
+        self._multiplier_array = np.array([self.multipliers.get(label, 1.0) for label in self.labels])
+        self.refresh()
+
+    @classmethod
+    def from_predictions(cls, clv: Sequence[float], **kwargs) -> "CLVSegments":
+        sketch = QuantileSketch()
+        sketch.update(np.maximum(np.asarray(clv, dtype=np.float64), 0))
+        return cls(sketch, **kwargs)
+
+    def refresh(self):
+        """Recompute the boundaries from the sketch"""
+        self.boundaries = self.sketch.quantiles(self.quantiles)
+
+    def update(self, clv: Sequence[float]):
+        """Fold newly predicted CLVs into the sketch and move the boundaries accordingly"""
+        self.sketch.update(np.maximum(np.asarray(clv, dtype=np.float64), 0))
+        self.refresh()
+
+    def lookup(self, clv: float) -> tuple:
+        """(segment label, multiplier) for one CLV"""
+        index = int(np.searchsorted(self.boundaries, clv, side="right"))
+        return self.labels[index], float(self._multiplier_array[index])
+
+    def lookup_batch(self, clv: np.ndarray) -> tuple:
+        """Segment labels and multipliers for an array of CLVs, same shape as clv"""
+        index = np.searchsorted(self.boundaries, clv, side="right")
+        return self._label_array[index], self._multiplier_array[index]
+
+    def info(self) -> dict:
+        return {
+            "labels": list(self.labels),
+            "quantiles": [round(q, 4) for q in self.quantiles],
+            "boundaries": [round(float(boundary), 2) for boundary in self.boundaries],
+            "multipliers": self.multipliers,
+            "customers_seen": len(self.sketch)
+        }
+
+def segments_artifact_path(model_path: str) -> str:
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.segments.joblib"
+
+def save_segments(model_path: str, segments: CLVSegments, path: Optional[str] = None,
+                  version: Optional[str] = None):
+    """Store segments next to the model they were computed from, tied to its model_version.
+
+    version lets a trainer write the segments before the new model file is moved into place.
+    """
+    path = path or segments_artifact_path(model_path)
+    payload = {
+        "version": SEGMENTS_VERSION,
+        "model_version": version or model_version(model_path),
+        "segments": segments
+    }
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(payload, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_segments(model_path: str) -> Optional[CLVSegments]:
+    """The segments stored for model_path, or None when there are none for this exact model"""
+    path = segments_artifact_path(model_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = joblib.load(path)
+    except Exception as e:
+        logger.warning(f"Failed to load CLV segments {path}: {str(e)}")
+        return None
+    if payload.get("version") != SEGMENTS_VERSION:
+        logger.warning(f"Ignoring CLV segments {path}: unsupported version {payload.get('version')}")
+        return None
+    if payload.get("model_version") != model_version(model_path):
+        logger.warning(f"Ignoring CLV segments {path}: they were computed for a different model")
+        return None
+    return payload["segments"]
@@ -0,0 +1,95 @@
+import importlib.util
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+# Arrow responses are offered only when pyarrow is installed; it is imported on first use
+# because importing it would add to every worker's startup time
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+JSON = "application/json"
+# {"status", "rows", "data": {field: [one value per row]}}: every key appears once, not once per row
+COLUMNAR_JSON = "application/vnd.pricing.columns+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, as JSONResponse renders it; orjson (which also takes NumPy arrays
+    and scalars directly) when installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":"), default=_numpy_default).encode("utf-8")
+
+def _numpy_default(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def response_formats() -> List[str]:
+    return [JSON, COLUMNAR_JSON] + ([ARROW_STREAM] if ARROW_AVAILABLE else [])
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """The response media type for an Accept header: the supported type with the highest q,
+    JSON for a missing header or wildcards, None when nothing acceptable is supported"""
+    if not accept:
+        return JSON
+    supported = response_formats()
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        media_type, q = media_type.strip().lower(), 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+def _column_values(values) -> Any:
+    # orjson serializes numeric arrays natively; string and object columns go through lists
+    if isinstance(values, np.ndarray) and (orjson is None or values.dtype.kind not in "fiub"):
+        return values.tolist()
+    return values
+
+def columnar_content(columns: Dict[str, Sequence], rows: int) -> dict:
+    return {"status": "success", "rows": rows,
+            "data": {name: _column_values(values) for name, values in columns.items()}}
+
+def arrow_stream(columns: Dict[str, Sequence]) -> bytes:
+    """Columns as one record batch in an Arrow IPC stream"""
+    import pyarrow
+    import pyarrow.ipc
+    table = pyarrow.table({name: pyarrow.array(values) for name, values in columns.items()})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def columns_response(media_type: str, columns: Dict[str, Sequence], rows: int, **kwargs) -> Response:
+    """Columnar results in the negotiated format (COLUMNAR_JSON or ARROW_STREAM)"""
+    if media_type == ARROW_STREAM:
+        return Response(arrow_stream(columns), media_type=ARROW_STREAM, **kwargs)
+    return Response(dumps(columnar_content(columns, rows)), media_type=COLUMNAR_JSON, **kwargs)
+
+def not_acceptable() -> JSONResponse:
+    return JSONResponse(status_code=406, content={
+        "status": "error", "message": f"Supported response types: {', '.join(response_formats())}"})
@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+from api.pricing_engine import REQUIRED_FEATURES, RESULT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+DEFAULT_PRODUCT_COST = 50.0
+
+# (features, product_costs) -> column arrays, e.g. the executor running calculate_dynamic_prices_arrays
+ArrayScorer = Callable[[np.ndarray, np.ndarray], Awaitable[Dict[str, np.ndarray]]]
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """StreamingResponse whose generator may still be reading the request body.
+
+    The stock response watches for client disconnect by calling receive() concurrently,
+    which swallows the body chunks request.stream() is waiting for.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def stream_format(content_type: Optional[str]) -> str:
+    """Pick the stream format from a Content-Type header; NDJSON unless CSV is asked for"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CSV if media_type in (CSV, "application/csv") else NDJSON
+
+class RecordParser:
+    """Incrementally splits raw body bytes into records, keeping any partial last line"""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line_number = 0
+        self._remainder = b""
+
+    def feed(self, data: bytes) -> List[Tuple[int, object]]:
+        lines = (self._remainder + data).split(b"\n")
+        self._remainder = lines.pop()
+        return self._parse(lines)
+
+    def close(self) -> List[Tuple[int, object]]:
+        lines, self._remainder = [self._remainder], b""
+        return self._parse(lines)
+
+    def _parse(self, lines: List[bytes]) -> List[Tuple[int, object]]:
+        """Returns (line_number, dict) for good lines and (line_number, Exception) for bad ones"""
+        records = []
+        for raw in lines:
+            self.line_number += 1
+            try:
+                text = raw.decode("utf-8-sig" if self.line_number == 1 else "utf-8").strip()
+                if not text:
+                    continue
+                if self.fmt == CSV:
+                    values = next(csv.reader([text]))
+                    if self.header is None:
+                        self.header = [name.strip() for name in values]
+                        continue
+                    records.append((self.line_number, dict(zip(self.header, values))))
+                else:
+                    record = json.loads(text)
+                    if not isinstance(record, dict):
+                        raise ValueError("each line must be a JSON object")
+                    records.append((self.line_number, record))
+            except Exception as e:
+                records.append((self.line_number, e))
+        return records
+
+def records_to_arrays(records: Sequence[Tuple[int, dict]]):
+    """Validate records into a feature matrix; bad rows come back separately as (line, message)"""
+    features = np.empty((len(records), len(REQUIRED_FEATURES)), dtype=np.float64)
+    costs = np.empty(len(records), dtype=np.float64)
+    kept, errors = [], []
+    for line_number, record in records:
+        row = len(kept)
+        try:
+            features[row] = [float(record[name]) for name in REQUIRED_FEATURES]
+            cost = record.get("product_cost")
+            costs[row] = DEFAULT_PRODUCT_COST if cost in (None, "") else float(cost)
+        except KeyError as e:
+            errors.append((line_number, f"Missing required feature: {e.args[0]}"))
+            continue
+        except (TypeError, ValueError) as e:
+            errors.append((line_number, f"Invalid value: {str(e)}"))
+            continue
+        kept.append((line_number, record.get("CustomerID")))
+    return features[:len(kept)], costs[:len(kept)], kept, errors
+
+class ResultWriter:
+    """Formats priced rows and per-line errors in the response stream format"""
+
+    def __init__(self, fmt: str, fields: Sequence[str] = RESULT_FIELDS):
+        self.fmt = fmt
+        self.fields = list(fields)
+        self.columns = ["CustomerID"] + self.fields
+
+    def header(self) -> str:
+        return ",".join(self.columns + ["error"]) + "\n" if self.fmt == CSV else ""
+
+    def rows(self, kept: Sequence[Tuple[int, object]], columns: Dict[str, np.ndarray]) -> str:
+        values = [columns[name].tolist() for name in self.fields]
+        if self.fmt == CSV:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerows([customer_id, *row, ""]
+                             for (_, customer_id), row in zip(kept, zip(*values)))
+            return buffer.getvalue()
+        return "".join(
+            json.dumps({"CustomerID": customer_id, **dict(zip(self.fields, row))}) + "\n"
+            for (_, customer_id), row in zip(kept, zip(*values))
+        )
+
+    def error(self, line_number: int, message: str) -> str:
+        if self.fmt == CSV:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerow(
+                [""] * len(self.columns) + [f"line {line_number}: {message}"])
+            return buffer.getvalue()
+        return json.dumps({"status": "error", "line": line_number, "message": message}) + "\n"
+
+async def stream_prices(body: AsyncIterator[bytes], fmt: str, score: ArrayScorer,
+                        chunk_size: int = 5000, fields: Sequence[str] = RESULT_FIELDS) -> AsyncIterator[str]:
+    """Parse the body as it arrives and yield priced output every chunk_size rows.
+
+    Only one chunk of records is held at a time, so memory stays flat however large the input.
+    Rows that fail validation are reported in place; a scoring failure ends the stream.
+    """
+    parser = RecordParser(fmt)
+    writer = ResultWriter(fmt, fields)
+    yield writer.header()
+
+    pending: List[Tuple[int, object]] = []
+
+    async def flush(records):
+        good = [(line, record) for line, record in records if not isinstance(record, Exception)]
+        output = [writer.error(line, f"Unparseable line: {str(record)}")
+                  for line, record in records if isinstance(record, Exception)]
+        features, costs, kept, errors = records_to_arrays(good)
+        output.extend(writer.error(line, message) for line, message in errors)
+        if kept:
+            columns = await score(features, costs)
+            output.append(writer.rows(kept, columns))
+        return "".join(output)
+
+    try:
+        async for data in body:
+            pending.extend(parser.feed(data))
+            while len(pending) >= chunk_size:
+                chunk, pending = pending[:chunk_size], pending[chunk_size:]
+                yield await flush(chunk)
+        pending.extend(parser.close())
+        if pending:
+            yield await flush(pending)
+    except Exception as e:
+        logger.error(f"Streaming price calculation failed: {str(e)}")
+        yield writer.error(parser.line_number, f"Stream aborted: {str(e)}")
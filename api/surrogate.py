@@ -0,0 +1,54 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import joblib
+
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
+
+from api.compiled_forest import model_version
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_VERSION = 2
+
+def surrogate_artifact_path(model_path: str) -> str:
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.surrogate.joblib"
+
+def save_surrogate(path: str, model: "BaseEstimator", teacher_path: str, report: dict):
+    """Store a distilled model with its price-error report, tied to the teacher's model_version"""
+    payload = {
+        "version": SURROGATE_VERSION,
+        "model": model,
+        "teacher_version": model_version(teacher_path),
+        "report": report
+    }
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(payload, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_surrogate(teacher_path: str, tolerance: float) -> Optional[Tuple["BaseEstimator", dict]]:
+    """The surrogate for teacher_path if it was distilled from that exact model and its
+    worst-case relative price error is within tolerance; None otherwise"""
+    path = surrogate_artifact_path(teacher_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = joblib.load(path)
+    except Exception as e:
+        logger.warning(f"Failed to load surrogate model {path}: {str(e)}")
+        return None
+    if payload.get("version") != SURROGATE_VERSION:
+        logger.warning(f"Ignoring surrogate {path}: unsupported version {payload.get('version')}")
+        return None
+    if payload.get("teacher_version") != model_version(teacher_path):
+        logger.warning(f"Ignoring surrogate {path}: it was distilled from a different model")
+        return None
+    report = payload["report"]
+    if report["max_rel_price_error"] > tolerance:
+        logger.warning(f"Ignoring surrogate {path}: price error {report['max_rel_price_error']:.4%} "
+                       f"exceeds tolerance {tolerance:.4%}")
+        return None
+    return payload["model"], report
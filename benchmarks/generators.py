@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data/processed/clv_preprocessed_data.csv"
+
+FEATURES = ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
+            'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount']
+DISTRIBUTIONS = ('realistic', 'uniform', 'heavy_tail', 'edge')
+
+def _realistic(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Resample real customers and jitter them so rows (and cache keys) don't repeat"""
+    source = pd.read_csv(DATA_PATH, usecols=FEATURES)
+    sample = source.sample(n, replace=True, random_state=rng.integers(2**31)).reset_index(drop=True)
+    return sample * rng.lognormal(0, 0.1, sample.shape)
+
+def _uniform(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Recency': rng.integers(1, 365, n),
+        'Frequency': rng.integers(1, 50, n),
+        'MonetaryValue': rng.uniform(50, 5000, n),
+        'Tenure': rng.integers(30, 365 * 5, n),
+        'AvgDaysBetweenPurchases': rng.integers(7, 90, n),
+        'Age': rng.integers(18, 80, n),
+        'UniqueProductsCount': rng.integers(1, 10, n)
+    }).astype(float)
+
+def _heavy_tail(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """A few very large spenders and frequent buyers, as in real retail data"""
+    frequency = np.ceil(rng.pareto(1.5, n) + 1)
+    tenure = rng.integers(0, 730, n).astype(float)
+    return pd.DataFrame({
+        'Recency': rng.exponential(60, n).round(),
+        'Frequency': frequency,
+        'MonetaryValue': rng.lognormal(5.5, 1.2, n),
+        'Tenure': tenure,
+        'AvgDaysBetweenPurchases': tenure / frequency,
+        'Age': rng.normal(40, 12, n).clip(18, 90).round(),
+        'UniqueProductsCount': np.ceil(rng.pareto(1.2, n) * 10 + 1)
+    })
+
+def _edge(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Zeros, negatives (returns) and extreme values mixed into uniform rows"""
+    frame = _uniform(n, rng)
+    for name in FEATURES:
+        rows = rng.random(n) < 0.1
+        frame.loc[rows, name] = rng.choice([0.0, -1.0, 1e6], rows.sum())
+    return frame
+
+def generate_customers(n: int, distribution: str = 'realistic', seed: int = 42,
+                       product_cost: float = 50.0) -> pd.DataFrame:
+    """n synthetic customers with the model features and a product_cost column"""
+    generators = {'realistic': _realistic, 'uniform': _uniform, 'heavy_tail': _heavy_tail, 'edge': _edge}
+    if distribution not in generators:
+        raise ValueError(f"Unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+    rng = np.random.default_rng(seed)
+    frame = generators[distribution](n, rng)[FEATURES].astype(float)
+    frame['product_cost'] = rng.uniform(0.5, 1.5, n).round(2) * product_cost
+    return frame
+
+def generate_products(n: int, seed: int = 42) -> pd.DataFrame:
+    """A synthetic catalog of n products in the product_data.csv layout, with costs"""
+    rng = np.random.default_rng(seed)
+    base_price = rng.lognormal(4.2, 0.8, n).round(2)
+    return pd.DataFrame({
+        'ProductID': [f"SKU{i:06d}" for i in range(n)],
+        'Base_Price': base_price,
+        'Product_Cost': (base_price * rng.uniform(0.3, 0.9, n)).round(2),
+        'Inventory_Level': rng.choice(['low', 'medium', 'high'], n, p=[0.2, 0.6, 0.2])
+    })
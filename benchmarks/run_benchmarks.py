@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.metrics import process_memory_kb
+from api.parallel_scoring import ParallelScorer
+from api.pricing_engine import PricingEngine, rows_from_columns
+from api.serialization import ARROW_AVAILABLE, arrow_stream, columnar_content, dumps
+from generators import DISTRIBUTIONS, FEATURES, generate_customers
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+RESULTS_DIR = BASE_DIR / "benchmarks/results"
+BASELINE_PATH = BASE_DIR / "benchmarks/baseline.json"
+# Metrics compared against the baseline and whether a larger value is a regression
+TRACKED_METRICS = {
+    'p50_ms': True,
+    'p95_ms': True,
+    'p99_ms': True,
+    'rows_per_second': False,
+    'peak_rss_kb': True
+}
+
+def reset_peak_rss() -> bool:
+    """Lower this process's peak RSS (VmHWM) to its current RSS; False where Linux's
+    /proc/self/clear_refs is not available"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def summarize(latencies: List[float], rows: int, wall_seconds: float) -> dict:
+    """Latency percentiles in ms, throughput and this process's memory after the scenario.
+
+    The peak is reset after it is read, so peak_rss_kb covers only the scenario since the
+    previous summarize. Where it cannot be reset, the process-lifetime peak is reported as
+    process_peak_rss_kb instead and is not compared against the baseline.
+    """
+    latencies_ms = np.asarray(latencies) * 1000
+    memory = process_memory_kb()
+    peak_field = 'peak_rss_kb' if reset_peak_rss() else 'process_peak_rss_kb'
+    return {
+        'requests': len(latencies_ms),
+        'rows': rows,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 4),
+        'rows_per_second': round(rows / wall_seconds, 1),
+        'rss_kb': memory['rss_kb'],
+        peak_field: memory['peak_rss_kb']
+    }
+
+def time_calls(call: Callable[[int], None], count: int, warmup: int = 50) -> List[float]:
+    for i in range(min(warmup, count)):
+        call(i)
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+class PricingBenchmark:
+    """Runs the in-process, batch endpoint, concurrent load, fan-out scaling and response encoding
+    scenarios on synthetic customers"""
+
+    def __init__(self, config):
+        self.config = config
+        self.customers = generate_customers(config['rows'], config['distribution'], seed=config['seed'])
+        self.records = self.customers.to_dict(orient='records')
+        self.results: Dict[str, dict] = {}
+
+    def _record(self, name: str, result: dict):
+        self.results[name] = result
+        logger.info(f"{name:<32} p50 {result['p50_ms']:>8.3f}ms  p95 {result['p95_ms']:>8.3f}ms  "
+                    f"p99 {result['p99_ms']:>8.3f}ms  {result['rows_per_second']:>12,.0f} rows/s")
+
+    def run_engine(self):
+        """PricingEngine called directly, one customer per call, without the result cache"""
+        engine = PricingEngine(model_path=self.config['model_path'], fast_path=True)
+        features = [{name: record[name] for name in FEATURES} for record in self.records]
+        count = len(features)
+
+        for name, call in (
+            ('engine.calculate_clv', lambda i: engine.calculate_clv(features[i])),
+            ('engine.calculate_dynamic_price',
+             lambda i: engine.calculate_dynamic_price(features[i], self.records[i]['product_cost']))
+        ):
+            started = time.perf_counter()
+            latencies = time_calls(call, count)
+            self._record(name, summarize(latencies, count, time.perf_counter() - started))
+
+    def run_scaling(self):
+        """One --rows matrix priced in-process, then fanned out over 1..N worker processes"""
+        engine = PricingEngine(model_path=self.config['model_path'], fast_path=True)
+        features = self.customers[FEATURES].to_numpy(dtype=np.float64)
+        product_costs = self.customers['product_cost'].to_numpy(dtype=np.float64)
+        repeats = self.config['batch_repeats']
+
+        def measure(name, score):
+            latencies = time_calls(lambda i: score(features, product_costs), repeats, warmup=1)
+            result = summarize(latencies, len(features) * repeats, sum(latencies))
+            self._record(name, result)
+            return result
+
+        in_process = measure('fanout[in_process]', engine.calculate_dynamic_prices_arrays)
+        for workers in range(1, self.config['max_workers'] + 1):
+            scorer = ParallelScorer(engine, workers, min_rows=0)
+            try:
+                result = measure(f"fanout[workers={workers}]", scorer.calculate_dynamic_prices_arrays)
+                result['speedup'] = round(result['rows_per_second'] / in_process['rows_per_second'], 3)
+            finally:
+                scorer.shutdown()
+
+    def run_serialization(self):
+        """Encode one --rows batch result in each response format: encode time and payload size"""
+        from fastapi.responses import JSONResponse
+        engine = PricingEngine(model_path=self.config['model_path'], fast_path=True)
+        columns = engine.calculate_batch_columns(self.records)
+        rows = len(self.records)
+        encoders = {
+            # What the batch endpoint did before: stdlib json over a list of row dicts
+            'json_stdlib_rows': lambda: JSONResponse({"status": "success", "data": rows_from_columns(columns)}).body,
+            'json_rows': lambda: dumps({"status": "success", "data": rows_from_columns(columns)}),
+            'json_columns': lambda: dumps(columnar_content(columns, rows))
+        }
+        if ARROW_AVAILABLE:
+            encoders['arrow_stream'] = lambda: arrow_stream(columns)
+        for name, encode in encoders.items():
+            latencies = time_calls(lambda i: encode(), self.config['batch_repeats'], warmup=1)
+            result = summarize(latencies, rows * len(latencies), sum(latencies))
+            result['payload_bytes'] = len(encode())
+            result['bytes_per_row'] = round(result['payload_bytes'] / rows, 1)
+            self._record(f"serialize[{name}]", result)
+            logger.info(f"{'':<32} {result['payload_bytes']:,} bytes ({result['bytes_per_row']} per row)")
+
+    async def _client(self):
+        import httpx
+        if self.config['url']:
+            return httpx.AsyncClient(base_url=self.config['url'], timeout=60)
+        from api.app import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+
+    async def _run_batches(self):
+        async with await self._client() as client:
+            for size in self.config['batch_sizes']:
+                payloads = [
+                    {'customers': [self.records[(start + i) % len(self.records)] for i in range(size)]}
+                    for start in range(0, size * self.config['batch_repeats'], size)
+                ]
+                latencies = []
+                started = time.perf_counter()
+                for payload in payloads:
+                    request_started = time.perf_counter()
+                    response = await client.post("/api/calculate_batch_prices/", json=payload)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - request_started)
+                self._record(f"batch_endpoint[{size}]",
+                             summarize(latencies, size * len(payloads), time.perf_counter() - started))
+
+    async def _run_concurrent(self):
+        total = self.config['requests']
+        concurrency = self.config['concurrency']
+        latencies = []
+        next_request = iter(range(total))
+
+        async def worker(client):
+            for i in next_request:
+                request_started = time.perf_counter()
+                response = await client.post("/api/calculate_price/", json=self.records[i % len(self.records)])
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+
+        async with await self._client() as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            self._record(f"calculate_price[concurrency={concurrency}]",
+                         summarize(latencies, total, time.perf_counter() - started))
+
+    def run(self) -> bool:
+        try:
+            scenarios = self.config['scenarios']
+            # Start the first scenario's peak window here rather than at process start
+            reset_peak_rss()
+            if 'engine' in scenarios:
+                self.run_engine()
+            if 'batch' in scenarios:
+                asyncio.run(self._run_batches())
+            if 'concurrent' in scenarios:
+                asyncio.run(self._run_concurrent())
+            if 'scaling' in scenarios:
+                self.run_scaling()
+            if 'serialize' in scenarios:
+                self.run_serialization()
+            return True
+        except Exception as e:
+            logger.error(f"Benchmark failed: {str(e)}")
+            return False
+
+    def report(self) -> dict:
+        import sklearn
+        return {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'sklearn': sklearn.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'config': {key: value for key, value in self.config.items() if key != 'model_path'}
+            },
+            'results': self.results
+        }
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float,
+            min_delta_ms: float = 0.05) -> List[dict]:
+    """Metrics that moved the wrong way by more than tolerance (a fraction) versus the baseline.
+
+    Latency changes smaller than min_delta_ms are ignored; sub-millisecond percentiles jitter
+    by more than any sensible tolerance from run to run.
+    """
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            continue
+        for metric, higher_is_worse in TRACKED_METRICS.items():
+            if not previous.get(metric) or metric not in current:
+                continue
+            if metric.endswith('_ms') and abs(current[metric] - previous[metric]) < min_delta_ms:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append({'scenario': scenario, 'metric': metric, 'baseline': previous[metric],
+                                    'current': current[metric], 'change': round(change, 4)})
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pricing latency and throughput")
+    parser.add_argument('--model', default=str(BASE_DIR / 'models/clv_model.pkl'))
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='realistic')
+    parser.add_argument('--rows', type=int, default=2000, help="Synthetic customers (and in-process calls)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scenarios', default='engine,batch,concurrent',
+                        help="Comma-separated; also 'scaling' (1..--max-workers fan-out) and 'serialize' "
+                             "(response formats)")
+    parser.add_argument('--batch-sizes', default='1,10,100,1000')
+    parser.add_argument('--batch-repeats', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000, help="Requests in the concurrent scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help="Largest fan-out pool in the scaling scenario")
+    parser.add_argument('--url', help="Benchmark a running server instead of the app in-process")
+    parser.add_argument('--output', help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative change before flagging")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="Ignore smaller latency changes")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    benchmark = PricingBenchmark({
+        'model_path': args.model,
+        'distribution': args.distribution,
+        'rows': args.rows,
+        'seed': args.seed,
+        'scenarios': args.scenarios.split(','),
+        'batch_sizes': [int(size) for size in args.batch_sizes.split(',')],
+        'batch_repeats': args.batch_repeats,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'max_workers': args.max_workers,
+        'url': args.url
+    })
+    if not benchmark.run():
+        logger.error("❌ Benchmark failed")
+        sys.exit(1)
+
+    report = benchmark.report()
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    logger.info(f"Results saved to {output}")
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2))
+        logger.info(f"✅ Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report['results'], baseline['results'], args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            logger.error(f"Regression in {regression['scenario']} {regression['metric']}: "
+                         f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})")
+        if regressions:
+            logger.error(f"❌ {len(regressions)} regressions against {args.baseline}")
+            sys.exit(1)
+        logger.info(f"✅ No regressions against {args.baseline}")
+    else:
+        logger.info("✅ Benchmark completed (no baseline to compare against; use --save-baseline)")
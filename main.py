@@ -1,5 +1,35 @@
-from api.app import app
+import argparse
+import logging
+import os
+from pathlib import Path
 import uvicorn
 
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = str(BASE_DIR / "models/clv_model.pkl")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Dynamic Pricing Engine API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--production", action="store_true",
+                        help="Multi-worker mode: reload off, model shared via a memory-mapped compiled artifact")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes in production mode. Each one also starts its own "
+                             "PRICING_FANOUT_WORKERS scoring processes when fan-out is enabled, so the total "
+                             "is workers x (1 + PRICING_FANOUT_WORKERS); fan-out is capped to fit the cores")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    uvicorn.run("api.app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    args = parse_args()
+    if args.production:
+        from api.compiled_forest import export_compiled_model
+
+        logging.basicConfig(level=logging.INFO)
+        # Export once in the parent so every worker maps the same file instead of unpickling the forest
+        export_compiled_model(MODEL_PATH)
+        os.environ["PRICING_MODEL_MMAP"] = "1"
+        # Read by ParallelScorer.from_env to size fan-out pools for this many server processes
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        uvicorn.run("api.app:app", host=args.host, port=args.port, workers=args.workers, reload=False)
+    else:
+        uvicorn.run("api.app:app", host=args.host, port=args.port, reload=True)
\ No newline at end of file
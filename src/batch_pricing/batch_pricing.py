@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Make the api package importable when run as a script
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.catalog import INVENTORY_MULTIPLIERS, inventory_price_multipliers
+from api.compiled_forest import file_signature
+from api.pricing_engine import PricingEngine, REQUIRED_FEATURES, RESULT_FIELDS, SEGMENT_FIELDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+
+# Engine owned by each worker process
+_worker_engine = None
+
+def _init_worker(model_path: str, base_price: float, segment_pricing: bool = False):
+    global _worker_engine
+    _worker_engine = PricingEngine(model_path=model_path, base_price=base_price, fast_path=True,
+                                   segment_pricing=segment_pricing)
+
+def _score_chunk(features: np.ndarray, product_costs: np.ndarray, base_prices: np.ndarray,
+                 price_multipliers: np.ndarray) -> dict:
+    return _worker_engine.calculate_dynamic_prices_arrays(features, product_costs, base_prices, price_multipliers)
+
+class BatchPricingJob:
+    """Reprices the full customer base in chunks, in parallel, with crash-safe resume.
+
+    Each chunk becomes one part file in the output directory. A part is written under a
+    temporary name and renamed, then recorded in the manifest, so after a crash the job
+    resumes from the first chunk that is not in the manifest.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.output_dir = Path(config['output_dir'])
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+        self.catalog = None
+
+    def _job_fingerprint(self) -> dict:
+        """Settings that must match for a resumed run to be consistent with earlier parts"""
+        catalog_path = self.config.get('catalog_path')
+        return {
+            'customers_path': str(self.config['customers_path']),
+            'customers_signature': list(file_signature(self.config['customers_path'])),
+            'catalog_path': str(catalog_path or ''),
+            'catalog_signature': list(file_signature(catalog_path)) if catalog_path else None,
+            'model_signature': list(file_signature(self.config['model_path'])),
+            'chunk_size': self.config['chunk_size'],
+            'format': self.config['format'],
+            'product_cost': self.config['product_cost'],
+            'base_price': self.config['base_price'],
+            'segment_pricing': self.config.get('segment_pricing', False),
+            'inventory_multipliers': INVENTORY_MULTIPLIERS
+        }
+
+    def _load_manifest(self) -> dict:
+        fingerprint = self._job_fingerprint()
+        if self.manifest_path.exists() and not self.config.get('restart'):
+            manifest = json.loads(self.manifest_path.read_text())
+            if manifest.get('job') != fingerprint:
+                raise ValueError(f"{self.manifest_path} belongs to a different job; use --restart to start over")
+            logger.info(f"Resuming: {len(manifest['completed_chunks'])} chunks already done")
+            return manifest
+        for stale_part in self.output_dir.glob('part-*'):
+            stale_part.unlink()
+        return {'job': fingerprint, 'completed_chunks': [], 'rows_written': 0, 'finished': False}
+
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_catalog(self):
+        """Load the product catalog (CustomerID -> ProductID, Base_Price, Inventory_Level)"""
+        catalog_path = self.config.get('catalog_path')
+        if not catalog_path:
+            return
+        self.catalog = pd.read_csv(catalog_path)
+        missing_cols = {'CustomerID', 'Base_Price'} - set(self.catalog.columns)
+        if missing_cols:
+            raise ValueError(f"Missing columns in catalog: {missing_cols}")
+        self.catalog['CustomerID'] = self.catalog['CustomerID'].astype(str)
+        if 'Inventory_Level' in self.catalog.columns:
+            # Same validation as ProductCatalog: unknown levels fail the job instead of pricing at 1.0
+            try:
+                self.catalog['price_multiplier'] = inventory_price_multipliers(self.catalog['Inventory_Level'])
+            except ValueError as e:
+                raise ValueError(f"{str(e)} in {catalog_path}")
+        logger.info(f"Loaded {len(self.catalog)} catalog rows from {catalog_path}")
+
+    def _prepare_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Join catalog base prices and inventory multipliers onto the chunk; customers without an
+        entry keep the default price and a multiplier of 1"""
+        missing_cols = set(REQUIRED_FEATURES) - set(chunk.columns)
+        if missing_cols:
+            raise ValueError(f"Missing columns in customer data: {missing_cols}")
+        chunk = chunk.copy()
+        chunk['CustomerID'] = chunk['CustomerID'].astype(str)
+        if self.catalog is not None:
+            chunk = chunk.merge(self.catalog, on='CustomerID', how='left')
+            chunk['Base_Price'] = chunk['Base_Price'].fillna(self.config['base_price'])
+        else:
+            chunk['Base_Price'] = self.config['base_price']
+        if 'price_multiplier' in chunk.columns:
+            # Validated when the catalog was loaded; customers without an entry get 1
+            chunk['price_multiplier'] = chunk['price_multiplier'].fillna(1.0)
+        elif 'Inventory_Level' in chunk.columns:
+            chunk['price_multiplier'] = inventory_price_multipliers(chunk['Inventory_Level'])
+        else:
+            chunk['price_multiplier'] = 1.0
+        if 'product_cost' not in chunk.columns:
+            chunk['product_cost'] = self.config['product_cost']
+        return chunk
+
+    def _write_part(self, index: int, chunk: pd.DataFrame, columns: dict) -> int:
+        keep = [name for name in ('CustomerID', 'ProductID', 'Inventory_Level') if name in chunk.columns]
+        result = chunk[keep].reset_index(drop=True)
+        for name in RESULT_FIELDS + SEGMENT_FIELDS:
+            if name in columns:
+                result[name] = columns[name]
+        part_path = self.output_dir / f"part-{index:05d}.{self.config['format']}"
+        tmp_path = part_path.with_name(part_path.name + '.tmp')
+        if self.config['format'] == 'parquet':
+            result.to_parquet(tmp_path, index=False)
+        else:
+            result.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, part_path)
+        return len(result)
+
+    def run(self) -> bool:
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            manifest = self._load_manifest()
+            if manifest['finished']:
+                logger.info("Job already finished; nothing to do")
+                return True
+            self.load_catalog()
+            completed = set(manifest['completed_chunks'])
+            workers = self.config['workers']
+            max_pending = workers * 2
+
+            reader = pd.read_csv(self.config['customers_path'], chunksize=self.config['chunk_size'])
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.config['model_path'], self.config['base_price'],
+                                               self.config.get('segment_pricing', False))) as pool:
+                pending = []
+
+                def drain(limit):
+                    # Results are written in submission order so the manifest never has gaps
+                    while len(pending) > limit:
+                        index, chunk, future = pending.pop(0)
+                        rows = self._write_part(index, chunk, future.result())
+                        manifest['completed_chunks'].append(index)
+                        manifest['rows_written'] += rows
+                        self._save_manifest(manifest)
+                        logger.info(f"Chunk {index} done ({rows} rows, {manifest['rows_written']} total)")
+
+                for index, raw_chunk in enumerate(reader):
+                    if index in completed:
+                        continue
+                    chunk = self._prepare_chunk(raw_chunk)
+                    future = pool.submit(
+                        _score_chunk,
+                        chunk[REQUIRED_FEATURES].to_numpy(dtype=np.float64),
+                        chunk['product_cost'].to_numpy(dtype=np.float64),
+                        chunk['Base_Price'].to_numpy(dtype=np.float64),
+                        chunk['price_multiplier'].to_numpy(dtype=np.float64)
+                    )
+                    pending.append((index, chunk, future))
+                    drain(max_pending)
+                drain(0)
+
+            manifest['finished'] = True
+            self._save_manifest(manifest)
+            logger.info(f"Wrote {manifest['rows_written']} priced rows to {self.output_dir}")
+            return True
+        except Exception as e:
+            logger.error(f"Batch pricing failed: {str(e)}")
+            return False
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reprice all customers against the product catalog")
+    parser.add_argument('--customers', default=str(BASE_DIR / 'data/processed/clv_preprocessed_data.csv'))
+    parser.add_argument('--catalog', default=str(BASE_DIR / 'data/processed/product_data.csv'),
+                        help="CSV with CustomerID and Base_Price (optionally ProductID, Inventory_Level); '' to skip")
+    parser.add_argument('--model', default=str(BASE_DIR / 'models/clv_model.pkl'))
+    parser.add_argument('--output-dir', default=str(BASE_DIR / 'results/batch_prices'))
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--base-price', type=float, default=100.0)
+    parser.add_argument('--product-cost', type=float, default=50.0,
+                        help="Cost used when the customer file has no product_cost column")
+    parser.add_argument('--clv-segments', action='store_true',
+                        help="Price by the model's stored CLV segments instead of the continuous CLV factor")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing manifest and start over")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    job = BatchPricingJob({
+        'customers_path': args.customers,
+        'catalog_path': args.catalog,
+        'model_path': args.model,
+        'output_dir': args.output_dir,
+        'format': args.format,
+        'chunk_size': args.chunk_size,
+        'workers': args.workers,
+        'base_price': args.base_price,
+        'product_cost': args.product_cost,
+        'segment_pricing': args.clv_segments,
+        'restart': args.restart
+    })
+
+    if job.run():
+        logger.info("✅ Batch pricing completed successfully!")
+    else:
+        logger.error("❌ Batch pricing failed")
+        sys.exit(1)
@@ -0,0 +1,186 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Make the api package importable when run as a script
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.catalog import ProductCatalog
+from api.compiled_forest import file_signature
+from api.pricing_engine import PricingEngine, REQUIRED_FEATURES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODES = ('dense', 'topk')
+RANK_BY = ('profit', 'profit_margin', 'dynamic_price')
+# float64 temporaries alive per price cell while a block is priced and ranked
+BYTES_PER_CELL = 24
+
+def rank_scores(prices: np.ndarray, costs: np.ndarray, rank_by: str) -> np.ndarray:
+    """Per-cell score that top-K maximizes: profit per unit, margin or price"""
+    if rank_by == 'profit':
+        return prices - costs
+    if rank_by == 'profit_margin':
+        return (prices - costs) / prices
+    return prices.astype(np.float64)
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k highest scores in each row, best first"""
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1)
+
+class PriceMatrixJob:
+    """Prices every customer against every catalog product, one block of customers at a time.
+
+    CLV is predicted once per customer and each block broadcasts the pricing formula over the
+    product vectors, so peak memory is bounded by max_block_mb whatever the customer count.
+    'dense' fills a float32 prices.npy (customers x products, memory-mapped while it is
+    written); 'topk' keeps the k best products per customer by rank_by in topk.npz.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.output_dir = Path(config['output_dir'])
+        self.stats = {}
+
+    def load(self):
+        try:
+            self.customers = pd.read_csv(self.config['customers_path'])
+            missing_cols = set(REQUIRED_FEATURES) - set(self.customers.columns)
+            if missing_cols:
+                raise ValueError(f"Missing columns in customer data: {missing_cols}")
+            self.catalog = ProductCatalog.from_csv(self.config['catalog_path'])
+            arrays = self.catalog.pricing_arrays(self.catalog.product_ids, self.config['product_cost'])
+            self.product_costs = arrays['product_costs']
+            self.base_prices = arrays['base_prices']
+            self.price_multipliers = arrays['price_multipliers']
+            self.engine = PricingEngine(model_path=self.config['model_path'], fast_path=True,
+                                        segment_pricing=self.config.get('segment_pricing', False))
+            return True
+        except Exception as e:
+            logger.error(f"Error loading price matrix inputs: {str(e)}")
+            return False
+
+    def block_rows(self) -> int:
+        return max(1, int(self.config['max_block_mb'] * 2**20 // (BYTES_PER_CELL * len(self.catalog))))
+
+    def _write_axes(self, clv: np.ndarray):
+        """customers.csv and products.csv name the rows and columns of the matrix"""
+        customers = pd.DataFrame({'CustomerID': self.customers.get('CustomerID', pd.RangeIndex(len(clv)))})
+        customers['clv'] = np.round(clv, 2)
+        if self.engine.segments is not None:
+            customers['clv_segment'], customers['segment_multiplier'] = self.engine.segments.lookup_batch(clv)
+        customers.to_csv(self.output_dir / 'customers.csv', index=False)
+        pd.DataFrame({
+            'ProductID': self.catalog.product_ids,
+            'base_price': self.base_prices,
+            'product_cost': self.product_costs,
+            'price_multiplier': self.price_multipliers
+        }).to_csv(self.output_dir / 'products.csv', index=False)
+
+    def run(self):
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            mode, rows, products = self.config['mode'], len(self.customers), len(self.catalog)
+            block_rows = self.block_rows()
+            k = min(self.config['k'], products)
+            features = self.customers[REQUIRED_FEATURES].to_numpy(dtype=np.float64)
+            clv = np.empty(rows)
+            if mode == 'dense':
+                prices_path = self.output_dir / 'prices.npy'
+                matrix = np.lib.format.open_memmap(prices_path, mode='w+', dtype=np.float32, shape=(rows, products))
+            else:
+                best_products = np.empty((rows, k), dtype=np.int32)
+                best_prices = np.empty((rows, k), dtype=np.float32)
+                best_scores = np.empty((rows, k), dtype=np.float32)
+            logger.info(f"Pricing {rows} customers x {products} products ({mode}) in blocks of {block_rows}")
+
+            started = time.perf_counter()
+            for start in range(0, rows, block_rows):
+                stop = min(start + block_rows, rows)
+                clv[start:stop] = self.engine.predict_clv_batch(features[start:stop])
+                prices = self.engine.dynamic_price_matrix(clv[start:stop], self.product_costs, self.base_prices,
+                                                          self.price_multipliers)
+                if mode == 'dense':
+                    matrix[start:stop] = prices
+                else:
+                    scores = rank_scores(prices, self.product_costs, self.config['rank_by'])
+                    best = top_k(scores, k)
+                    best_products[start:stop] = best
+                    best_prices[start:stop] = np.take_along_axis(prices, best, axis=1)
+                    best_scores[start:stop] = np.take_along_axis(scores, best, axis=1)
+            if mode == 'dense':
+                matrix.flush()
+                del matrix
+            else:
+                np.savez(self.output_dir / 'topk.npz', product_index=best_products, dynamic_price=best_prices,
+                         score=best_scores)
+            seconds = time.perf_counter() - started
+
+            self._write_axes(clv)
+            self.stats = {
+                'mode': mode,
+                'customers': rows,
+                'products': products,
+                'pairs': rows * products,
+                'block_rows': block_rows,
+                'k': k if mode == 'topk' else None,
+                'rank_by': self.config['rank_by'] if mode == 'topk' else None,
+                'seconds': round(seconds, 3),
+                'pairs_per_second': round(rows * products / seconds, 1),
+                'model_signature': list(file_signature(self.config['model_path']))
+            }
+            (self.output_dir / 'manifest.json').write_text(json.dumps(self.stats, indent=2))
+            logger.info(f"Priced {rows * products:,} pairs in {seconds:.2f}s "
+                        f"({self.stats['pairs_per_second']:,.0f} pairs/s) into {self.output_dir}")
+            return True
+        except Exception as e:
+            logger.error(f"Price matrix generation failed: {str(e)}")
+            return False
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Price every customer against every catalog product")
+    parser.add_argument('--customers', default=str(BASE_DIR / 'data/processed/clv_preprocessed_data.csv'))
+    parser.add_argument('--catalog', default=str(BASE_DIR / 'data/processed/product_data.csv'))
+    parser.add_argument('--model', default=str(BASE_DIR / 'models/clv_model.pkl'))
+    parser.add_argument('--output-dir', default=str(BASE_DIR / 'results/price_matrix'))
+    parser.add_argument('--mode', choices=MODES, default='topk')
+    parser.add_argument('--k', type=int, default=10, help="Products kept per customer in topk mode")
+    parser.add_argument('--rank-by', choices=RANK_BY, default='profit')
+    parser.add_argument('--max-block-mb', type=float, default=256, help="Memory cap for one block")
+    parser.add_argument('--product-cost', type=float, default=50.0,
+                        help="Cost of products without a Product_Cost in the catalog")
+    parser.add_argument('--clv-segments', action='store_true',
+                        help="Price by the model's stored CLV segments instead of the continuous CLV factor")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    job = PriceMatrixJob({
+        'customers_path': args.customers,
+        'catalog_path': args.catalog,
+        'model_path': args.model,
+        'output_dir': args.output_dir,
+        'mode': args.mode,
+        'k': args.k,
+        'rank_by': args.rank_by,
+        'max_block_mb': args.max_block_mb,
+        'product_cost': args.product_cost,
+        'segment_pricing': args.clv_segments
+    })
+
+    if job.load() and job.run():
+        logger.info("✅ Price matrix completed successfully!")
+    else:
+        logger.error("❌ Price matrix failed")
+        sys.exit(1)
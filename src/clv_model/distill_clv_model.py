@@ -0,0 +1,212 @@
+import sys
+import time
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+# Make the api package importable when run as a script
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.pricing_engine import PricingEngine
+from api.surrogate import save_surrogate, surrogate_artifact_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class CLVModelDistiller:
+    """Distills the CLV forest into a much smaller surrogate judged by price error.
+
+    The student is trained on the teacher's predictions for the training customers plus
+    jittered copies of them (teacher labels are free for any input). Pricing only sees CLV
+    through the price adjustment factor, so by default the target is clipped to the range
+    where that factor varies and the student spends no capacity on CLVs that all map to the
+    same factor.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.teacher = None
+        self.pricing_engines = []
+        self.student = None
+        self.report = None
+        self.candidate_reports = []
+
+    def load_data(self):
+        """Load customers and the teacher model"""
+        try:
+            logger.info(f"Loading data from {self.config['data_path']}")
+            df = pd.read_csv(self.config['data_path'])
+            missing_cols = set(self.config['features']) - set(df.columns)
+            if missing_cols:
+                raise ValueError(f"Missing columns in data: {missing_cols}")
+            X = df[self.config['features']].to_numpy(dtype=np.float64)
+            self.X_train, self.X_test = train_test_split(
+                X, test_size=self.config['test_size'], random_state=self.config['random_state'])
+            self.teacher = PricingEngine(model_path=self.config['model_path'], fast_path=True)
+            # The surrogate is served with or without segment pricing, so it is judged under both
+            segmented = PricingEngine(model_path=self.config['model_path'], fast_path=True, segment_pricing=True)
+            self.pricing_engines = [self.teacher] + ([segmented] if segmented.segments is not None else [])
+            return True
+        except Exception as e:
+            logger.error(f"Error loading data: {str(e)}")
+            return False
+
+    def _augmented_training_set(self):
+        rng = np.random.default_rng(self.config['random_state'])
+        copies = [self.X_train] + [
+            self.X_train * rng.lognormal(0, self.config['augment_noise'], self.X_train.shape)
+            for _ in range(self.config['augment_copies'])
+        ]
+        X = np.vstack(copies)
+        y = self.teacher.predict_clv_batch(X)
+        if self.config['clip_target']:
+            low, high = self.teacher.clv_low, self.teacher.clv_high
+            for engine in self.pricing_engines:
+                if engine.segments is not None:
+                    low = min(low, engine.segments.boundaries.min())
+                    high = max(high, engine.segments.boundaries.max())
+            y = np.clip(y, low, high)
+        return X, y
+
+    def price_error(self, student) -> dict:
+        """Error of the price on the held-out customers, worst case over the pricing modes.
+
+        Prices come from the engine's own price path (segment multipliers included) with no
+        cost floor; the floor applies equally to both models, so this bounds the dynamic_price
+        error. Relative errors don't depend on the base price, which differs per product.
+        """
+        teacher_clv = self.teacher.predict_clv_batch(self.X_test)
+        student_clv = np.maximum(student.predict(self.X_test), 0)
+        costs, base = np.zeros(1), np.array([self.teacher.base_price])
+        relative = absolute = np.zeros(len(self.X_test))
+        for engine in self.pricing_engines:
+            teacher_price = engine.dynamic_price_matrix(teacher_clv, costs, base, dtype=np.float64)[:, 0]
+            student_price = engine.dynamic_price_matrix(student_clv, costs, base, dtype=np.float64)[:, 0]
+            error = np.abs(student_price - teacher_price)
+            relative = np.maximum(relative, error / teacher_price)
+            absolute = np.maximum(absolute, error)
+        return {
+            'mean_rel_price_error': float(relative.mean()),
+            'p99_rel_price_error': float(np.percentile(relative, 99)),
+            'max_rel_price_error': float(relative.max()),
+            'max_abs_price_error': float(absolute.max()),
+            'base_price': self.teacher.base_price,
+            'test_customers': len(self.X_test)
+        }
+
+    def distill(self):
+        """Fit each candidate and keep the cheapest one within the price error tolerance"""
+        try:
+            X, y = self._augmented_training_set()
+            fitted = []
+            for candidate in self.config['candidates']:
+                student = RandomForestRegressor(
+                    n_estimators=candidate['n_estimators'],
+                    max_depth=candidate['max_depth'],
+                    # A single tree sees all rows; larger students use the usual bootstrap
+                    bootstrap=candidate['n_estimators'] > 1,
+                    random_state=self.config['random_state']
+                )
+                student.fit(X, y)
+                depth = max(estimator.get_depth() for estimator in student.estimators_)
+                report = {
+                    'n_estimators': candidate['n_estimators'],
+                    'max_depth': depth,
+                    'serving_cost': candidate['n_estimators'] * depth,
+                    **self.price_error(student)
+                }
+                self.candidate_reports.append(report)
+                fitted.append((student, report))
+                logger.info(f"{candidate['n_estimators']} trees, depth {depth} | "
+                            f"price error mean {report['mean_rel_price_error']:.4%}, "
+                            f"p99 {report['p99_rel_price_error']:.4%}, max {report['max_rel_price_error']:.4%}")
+
+            within = [item for item in fitted if item[1]['max_rel_price_error'] <= self.config['tolerance']]
+            if within:
+                self.student, self.report = min(within, key=lambda item: item[1]['serving_cost'])
+            else:
+                self.student, self.report = min(fitted, key=lambda item: item[1]['max_rel_price_error'])
+                logger.warning(f"No candidate within tolerance {self.config['tolerance']:.4%}; the engine "
+                               f"will keep serving the full forest")
+            logger.info(f"Selected surrogate: {self.report['n_estimators']} trees, depth {self.report['max_depth']}")
+            return True
+        except Exception as e:
+            logger.error(f"Error distilling model: {str(e)}")
+            return False
+
+    def save_results(self):
+        """Save the surrogate next to the teacher model, where PricingEngine looks for it"""
+        try:
+            path = surrogate_artifact_path(self.config['model_path'])
+            save_surrogate(path, self.student, self.config['model_path'], self.report)
+            logger.info(f"Surrogate saved to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving surrogate: {str(e)}")
+            return False
+
+    def benchmark(self):
+        """Compare p50/p99 single-request latency and batch throughput of both engines"""
+        try:
+            surrogate = PricingEngine(model_path=self.config['model_path'], fast_path=True,
+                                      surrogate_tolerance=float('inf'))
+            customers = [dict(zip(self.config['features'], row)) for row in self.X_test.tolist()]
+            requests = self.config['benchmark_requests']
+            self.benchmark_results = {}
+            for name, engine in (('forest', self.teacher), ('surrogate', surrogate)):
+                latencies = np.empty(requests)
+                for i in range(requests):
+                    started = time.perf_counter()
+                    engine.calculate_dynamic_price(customers[i % len(customers)])
+                    latencies[i] = time.perf_counter() - started
+                costs = np.full(len(self.X_test), 50.0)
+                started = time.perf_counter()
+                engine.calculate_dynamic_prices_arrays(self.X_test, costs)
+                batch_seconds = time.perf_counter() - started
+                self.benchmark_results[name] = {
+                    'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                    'p99_ms': float(np.percentile(latencies, 99) * 1000),
+                    'batch_rows_per_second': len(self.X_test) / batch_seconds
+                }
+                result = self.benchmark_results[name]
+                logger.info(f"{name:>9} | p50 {result['p50_ms']:.3f}ms | p99 {result['p99_ms']:.3f}ms | "
+                            f"batch {result['batch_rows_per_second']:,.0f} rows/s")
+            return True
+        except Exception as e:
+            logger.error(f"Error benchmarking surrogate: {str(e)}")
+            return False
+
+# Configuration
+CONFIG = {
+    'data_path': str(BASE_DIR / 'data/processed/clv_preprocessed_data.csv'),
+    'model_path': str(BASE_DIR / 'models/clv_model.pkl'),
+    'features': ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
+                 'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount'],
+    'test_size': 0.25,
+    'random_state': 42,
+    'augment_copies': 5,
+    'augment_noise': 0.2,
+    'clip_target': True,
+    'candidates': [{'n_estimators': 1, 'max_depth': depth} for depth in (4, 6, 8, 10, 12)]
+                  + [{'n_estimators': 10, 'max_depth': 10}],
+    # Largest acceptable relative price error over the held-out customers
+    'tolerance': 0.005,
+    'benchmark_requests': 2000
+}
+
+if __name__ == "__main__":
+    distiller = CLVModelDistiller(CONFIG)
+
+    if (distiller.load_data() and
+        distiller.distill() and
+        distiller.save_results() and
+        distiller.benchmark()):
+        logger.info("✅ Distillation completed successfully!")
+    else:
+        logger.error("❌ Distillation failed")
+        sys.exit(1)
@@ -1,19 +1,48 @@
 import os
+import sys
+import math
+import time
+import argparse
 import joblib
 import pandas as pd
 import logging
+from itertools import product
+from pathlib import Path
+from joblib import Parallel, delayed
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 
+# Make the api package importable when run as a script
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from api.customer_store import CLVTable
+from api.compiled_forest import model_version
+from api.segments import CLVSegments, save_segments
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _grow_candidate(model, n_estimators, X_fit, y_fit, X_val, y_val):
+    """Grow a warm-started forest to n_estimators trees and score it on the validation split"""
+    started = time.perf_counter()
+    model.set_params(n_estimators=n_estimators)
+    model.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - started
+    rmse = mean_squared_error(y_val, model.predict(X_val)) ** 0.5
+    depth = max(estimator.get_depth() for estimator in model.estimators_)
+    return model, rmse, fit_seconds, depth
+
 class CLVModelTrainer:
     def __init__(self, config):
         self.config = config
         self.model = None
+        self.model_params = {
+            'n_estimators': config['n_estimators'],
+            'max_depth': config['max_depth']
+        }
+        self.tuning_results = []
         self._validate_paths()
         
     def _validate_paths(self):
@@ -39,26 +68,106 @@ class CLVModelTrainer:
             logger.error(f"Error loading data: {str(e)}")
             return False
 
-    def train_model(self):
-        """Train the Random Forest model"""
-        try:
-            X = self.df[self.config['features']]
-            y = self.df[self.config['target']]
+    def _split(self):
+        X = self.df[self.config['features']]
+        y = self.df[self.config['target']]
+        return train_test_split(
+            X, y,
+            test_size=self.config['test_size'],
+            random_state=self.config['random_state']
+        )
+
+    def tune_hyperparameters(self):
+        """Successive halving over forest configurations, growing trees with warm_start.
 
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, 
-                test_size=self.config['test_size'], 
+        Every configuration in the tuning grid starts with the first tree count in
+        tree_schedule. After each rung only the best 1/eta (by validation RMSE) keep growing
+        to the next tree count, so poor configurations are dropped after a few cheap trees.
+        Candidates in a rung are trained in parallel on all cores.
+        """
+        try:
+            tuning = self.config['tuning']
+            X_train, _, y_train, _ = self._split()
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train,
+                test_size=tuning['validation_size'],
                 random_state=self.config['random_state']
             )
 
-            # Initialize and train model
+            grid = tuning['param_grid']
+            survivors = [
+                RandomForestRegressor(warm_start=True, random_state=self.config['random_state'], n_jobs=1,
+                                      **dict(zip(grid, values)))
+                for values in product(*grid.values())
+            ]
+            logger.info(f"Tuning {len(survivors)} configurations over tree counts {tuning['tree_schedule']}")
+
+            started = time.perf_counter()
+            for rung, n_estimators in enumerate(tuning['tree_schedule']):
+                results = Parallel(n_jobs=tuning['n_jobs'])(
+                    delayed(_grow_candidate)(model, n_estimators, X_fit, y_fit, X_val, y_val)
+                    for model in survivors
+                )
+                for model, rmse, fit_seconds, depth in results:
+                    params = {name: model.get_params()[name] for name in grid}
+                    self.tuning_results.append({
+                        'rung': rung,
+                        'n_estimators': n_estimators,
+                        **params,
+                        'rmse': rmse,
+                        'fit_seconds': round(fit_seconds, 3),
+                        'tree_depth': depth,
+                        # The compiled forest walks every tree to the deepest leaf
+                        'serving_cost': n_estimators * depth
+                    })
+                    logger.info(f"Rung {rung} | {n_estimators} trees | {params} | RMSE: {rmse:.2f} | "
+                                f"depth: {depth} | fit: {fit_seconds:.2f}s")
+                ranked = sorted(results, key=lambda result: result[1])
+                survivors = [result[0] for result in ranked[:max(1, math.ceil(len(ranked) / tuning['eta']))]]
+
+            self.model_params = self.select_candidate()
+            logger.info(f"Tuning finished in {time.perf_counter() - started:.2f}s - selected {self.model_params}")
+            return True
+        except Exception as e:
+            logger.error(f"Error tuning hyperparameters: {str(e)}")
+            return False
+
+    def select_candidate(self) -> dict:
+        """Pick the most accurate candidate, or for 'serving' the cheapest one within score_tolerance.
+
+        score_tolerance is the allowed relative RMSE increase over the best candidate; serving
+        cost is trees x depth, which is what a prediction walks through.
+        """
+        tuning = self.config['tuning']
+        best_rmse = min(result['rmse'] for result in self.tuning_results)
+        if tuning['selection'] == 'serving':
+            eligible = [result for result in self.tuning_results
+                        if result['rmse'] <= best_rmse * (1 + tuning['score_tolerance'])]
+            chosen = min(eligible, key=lambda result: (result['serving_cost'], result['rmse']))
+        else:
+            chosen = min(self.tuning_results, key=lambda result: (result['rmse'], result['serving_cost']))
+        params = {'n_estimators': chosen['n_estimators']}
+        params.update({name: chosen[name] for name in tuning['param_grid']})
+        logger.info(f"Selected ({tuning['selection']}) - RMSE: {chosen['rmse']:.2f} "
+                    f"(best {best_rmse:.2f}), serving cost: {chosen['serving_cost']}")
+        return params
+
+    def train_model(self):
+        """Train the Random Forest model"""
+        try:
+            X_train, X_test, y_train, y_test = self._split()
+
+            # Initialize and train model on all cores
             self.model = RandomForestRegressor(
-                n_estimators=self.config['n_estimators'],
-                max_depth=self.config['max_depth'],
-                random_state=self.config['random_state']
+                random_state=self.config['random_state'],
+                n_jobs=self.config.get('n_jobs'),
+                **self.model_params
             )
+            started = time.perf_counter()
             self.model.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - started
+            # Serve single-threaded: the API parallelizes across requests, not within one
+            self.model.set_params(n_jobs=None)
 
             # Evaluate model
             y_pred = self.model.predict(X_test)
@@ -66,7 +175,7 @@ class CLVModelTrainer:
             rmse = mse ** 0.5  # Calculate RMSE manually
             r2 = r2_score(y_test, y_pred)
             
-            logger.info(f"Model trained successfully - RMSE: {rmse:.2f}, R²: {r2:.2f}")
+            logger.info(f"Model trained successfully in {fit_seconds:.2f}s - RMSE: {rmse:.2f}, R²: {r2:.2f}")
             return True
         except Exception as e:
             logger.error(f"Error training model: {str(e)}")
@@ -74,18 +183,45 @@ class CLVModelTrainer:
 
     def save_results(self):
         """Save model and predictions"""
+        model_path = self.config['model_path']
+        tmp_model_path = f"{model_path}.tmp-{os.getpid()}"
         try:
-            # Save model
-            joblib.dump(self.model, self.config['model_path'])
-            logger.info(f"Model saved to {self.config['model_path']}")
+            # The model is moved into place last, so a server watching model_path never loads it
+            # before its segments exist
+            joblib.dump(self.model, tmp_model_path)
+            version = model_version(tmp_model_path)
 
             # Save predictions
             self.df['Predicted_CLV'] = self.model.predict(self.df[self.config['features']])
             self.df[['CustomerID', 'Predicted_CLV']].to_csv(self.config['results_path'], index=False)
             logger.info(f"Predictions saved to {self.config['results_path']}")
+
+            # Segment boundaries from the predicted CLV distribution, stored alongside the model
+            segments = CLVSegments.from_predictions(self.df['Predicted_CLV'].to_numpy())
+            save_segments(model_path, segments, version=version)
+            logger.info(f"CLV segment boundaries {segments.info()['boundaries']} saved with the model")
+
+            os.replace(tmp_model_path, model_path)
+            logger.info(f"Model {version} saved to {model_path}")
+
+            if self.tuning_results:
+                tuning_path = os.path.join(os.path.dirname(self.config['results_path']), 'tuning_results.csv')
+                pd.DataFrame(self.tuning_results).to_csv(tuning_path, index=False)
+                logger.info(f"Tuning results saved to {tuning_path}")
+
+            # Save the indexed CLV table the API serves lookups from, tagged with the model version
+            if self.config.get('clv_table_path'):
+                CLVTable.from_predictions(
+                    self.df['CustomerID'].tolist(),
+                    self.df['Predicted_CLV'].to_numpy(),
+                    version
+                ).save(self.config['clv_table_path'])
+                logger.info(f"CLV table saved to {self.config['clv_table_path']}")
             return True
         except Exception as e:
             logger.error(f"Error saving results: {str(e)}")
+            if os.path.exists(tmp_model_path):
+                os.remove(tmp_model_path)
             return False
 
 # Configuration
@@ -93,19 +229,40 @@ CONFIG = {
     'data_path': "C:/Users/SherAsghar/Desktop/DYNAMIC_PRICING_ENGINE/data/processed/clv_preprocessed_data.csv",
     'model_path': "C:/Users/SherAsghar/Desktop/DYNAMIC_PRICING_ENGINE/models/clv_model.pkl",
     'results_path': "C:/Users/SherAsghar/Desktop/DYNAMIC_PRICING_ENGINE/results/clv_results.csv",
+    'clv_table_path': "C:/Users/SherAsghar/Desktop/DYNAMIC_PRICING_ENGINE/results/clv_table.joblib",
     'features': ['Recency', 'Frequency', 'MonetaryValue', 'Tenure', 
                 'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount'],
     'target': 'MonetaryValue',
     'test_size': 0.2,
     'random_state': 42,
     'n_estimators': 200,
-    'max_depth': 10
+    'max_depth': 10,
+    'n_jobs': -1,
+    'tuning': {
+        'param_grid': {
+            'max_depth': [6, 10, 14, None],
+            'min_samples_leaf': [1, 3, 5],
+            'max_features': [1.0, 0.5, 'sqrt']
+        },
+        'tree_schedule': [25, 50, 100, 200],
+        'eta': 3,
+        'validation_size': 0.25,
+        'selection': 'accuracy',  # or 'serving': cheapest model within score_tolerance
+        'score_tolerance': 0.02,
+        'n_jobs': -1
+    }
 }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the CLV model")
+    parser.add_argument('--tune', action='store_true', help="Search hyperparameters before training")
+    parser.add_argument('--selection', choices=['accuracy', 'serving'], default=CONFIG['tuning']['selection'])
+    args = parser.parse_args()
+    CONFIG['tuning']['selection'] = args.selection
     trainer = CLVModelTrainer(CONFIG)
     
     if (trainer.load_data() and 
+        (not args.tune or trainer.tune_hyperparameters()) and
         trainer.train_model() and 
         trainer.save_results()):
         logger.info("✅ CLV pipeline completed successfully!")
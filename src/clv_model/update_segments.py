@@ -0,0 +1,52 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Make the api package importable when run as a script
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.segments import CLVSegments, load_segments, save_segments
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def update_segments(model_path: str, clv_path: str, column: str = 'Predicted_CLV') -> bool:
+    """Fold newly predicted CLVs into the model's segment sketch and store the moved boundaries.
+
+    Only the new values are added to the sketch; earlier CLVs are not re-read or re-sorted.
+    A model without stored segments gets them built from these values.
+    """
+    try:
+        clv = pd.read_csv(clv_path, usecols=[column])[column].to_numpy()
+        segments = load_segments(model_path)
+        if segments is None:
+            logger.info(f"No segments stored for {model_path}; building them from {len(clv)} CLVs")
+            segments = CLVSegments.from_predictions(clv)
+        else:
+            previous = segments.info()['boundaries']
+            segments.update(clv)
+            logger.info(f"Boundaries moved from {previous} to {segments.info()['boundaries']}")
+        save_segments(model_path, segments)
+        logger.info(f"Segments for {model_path} now cover {len(segments.sketch)} customers")
+        return True
+    except Exception as e:
+        logger.error(f"Error updating CLV segments: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update CLV segment boundaries with new predictions")
+    parser.add_argument('--clv-file', required=True, help="CSV with newly predicted CLVs")
+    parser.add_argument('--column', default='Predicted_CLV')
+    parser.add_argument('--model', default=str(BASE_DIR / 'models/clv_model.pkl'))
+    args = parser.parse_args()
+
+    if update_segments(args.model, args.clv_file, args.column):
+        logger.info("✅ CLV segments updated successfully!")
+    else:
+        logger.error("❌ CLV segments update failed")
+        sys.exit(1)
@@ -1,80 +1,295 @@
-import pandas as pd
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
 import numpy as np
-from datetime import datetime
-
-# Load the dataset
-df = pd.read_excel('C:/Users/SherAsghar/Desktop/dynamic_pricing_engine/data/raw/online_retail.xlsx')
-
-# 1. Data Cleaning
-# Remove rows with missing CustomerID (these can't be used for CLV)
-df = df[df['CustomerID'].notna()]
-
-# Convert CustomerID to integer
-df['CustomerID'] = df['CustomerID'].astype(int)
-
-# Handle negative quantities (returns) - we'll keep them for accurate revenue calculation
-# Calculate revenue for each transaction
-df['Revenue'] = df['Quantity'] * df['UnitPrice']
-
-# Convert InvoiceDate to datetime
-df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
-
-# 2. Feature Engineering
-# Extract date features
-df['InvoiceYearMonth'] = df['InvoiceDate'].dt.to_period('M')
-df['InvoiceDay'] = df['InvoiceDate'].dt.day
-df['InvoiceDayOfWeek'] = df['InvoiceDate'].dt.dayofweek
-df['InvoiceHour'] = df['InvoiceDate'].dt.hour
-
-# 3. Create CLV Dataset - Customer Level Aggregation
-# Set snapshot date (last date in dataset + 1 day)
-snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
-
-# Create historical data for CLV
-clv_data = df.groupby('CustomerID').agg({
-    'InvoiceDate': lambda x: (snapshot_date - x.max()).days,  # Recency
-    'InvoiceNo': 'nunique',                                  # Frequency
-    'Revenue': 'sum'                                         # Monetary Value
-}).reset_index()
-
-# Rename columns
-clv_data.columns = ['CustomerID', 'Recency', 'Frequency', 'MonetaryValue']
-
-# Calculate average monetary value per transaction
-clv_data['MonetaryValue'] = clv_data['MonetaryValue'] / clv_data['Frequency']
-
-# 4. Additional Customer Features
-# Customer tenure (days since first purchase)
-customer_tenure = df.groupby('CustomerID')['InvoiceDate'].agg(['min', 'max'])
-customer_tenure['Tenure'] = (customer_tenure['max'] - customer_tenure['min']).dt.days
-clv_data = clv_data.merge(customer_tenure[['Tenure']], on='CustomerID', how='left')
-
-# Average days between purchases
-clv_data['AvgDaysBetweenPurchases'] = clv_data['Tenure'] / clv_data['Frequency']
-
-# 5. Demographic Features (if available)
-# Check if demographic columns exist before processing
-demo_features_list = []
-if 'Age' in df.columns:
-    demo_features_list.append(('Age', 'mean'))
-if 'Gender' in df.columns:
-    demo_features_list.append(('Gender', lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown'))
-if 'Country' in df.columns:
-    demo_features_list.append(('Country', lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown'))
-
-if demo_features_list:
-    demo_features = df.groupby('CustomerID').agg(dict(demo_features_list)).reset_index()
-    clv_data = clv_data.merge(demo_features, on='CustomerID', how='left')
-
-# 6. Product Preferences
-# Count of unique products purchased
-unique_products = df.groupby('CustomerID')['StockCode'].nunique().reset_index()
-unique_products.columns = ['CustomerID', 'UniqueProductsCount']
-clv_data = clv_data.merge(unique_products, on='CustomerID', how='left')
-
-# 7. Save preprocessed data
-clv_data.to_csv('C:/Users/SherAsghar/Desktop/dynamic_pricing_engine/data/processed/clv_preprocessed_data.csv', index=False)
-
-print("Preprocessing complete. Data saved to clv_preprocessed_data.csv")
-print(f"Final dataset shape: {clv_data.shape}")
-print(clv_data.head())
\ No newline at end of file
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+REQUIRED_COLUMNS = ['CustomerID', 'InvoiceNo', 'InvoiceDate', 'Quantity', 'UnitPrice', 'StockCode']
+# Demographic columns are optional; Gender and Country are reduced to the customer's most common value
+CATEGORICAL_COLUMNS = ['Gender', 'Country']
+OUTPUT_COLUMNS = ['CustomerID', 'Recency', 'Frequency', 'MonetaryValue', 'Tenure',
+                  'AvgDaysBetweenPurchases', 'Age', 'Gender', 'Country', 'UniqueProductsCount']
+
+DAY = np.timedelta64(1, 'D')
+# Per-customer arrays of TransactionAggregates, one entry per customer slot
+AGGREGATE_FIELDS = ['customer_ids', 'first_purchase', 'last_purchase', 'last_invoice',
+                    'invoice_count', 'revenue', 'age_sum', 'age_count', 'product_registers']
+
+TransactionSource = Union[str, Path, pd.DataFrame, Iterable[pd.DataFrame]]
+
+def iter_transactions(source: TransactionSource, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """Yield transaction chunks from a CSV/Parquet/Excel path, a DataFrame or an iterable of DataFrames"""
+    if isinstance(source, pd.DataFrame):
+        yield source
+        return
+    if not isinstance(source, (str, Path)):
+        yield from source
+        return
+
+    path = Path(source)
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif suffix == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(f"Reading {path} requires pyarrow: {str(e)}")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif suffix in ('.xlsx', '.xls'):
+        logger.warning(f"{path} is an Excel file and is read in one piece; convert it to CSV or Parquet to stream it")
+        yield pd.read_excel(path)
+    else:
+        raise ValueError(f"Unsupported transaction file type: {suffix}")
+
+def clean_transactions(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a raw transaction chunk into the columns the aggregations use"""
+    missing_cols = set(REQUIRED_COLUMNS) - set(chunk.columns)
+    if missing_cols:
+        raise ValueError(f"Missing columns in transactions: {missing_cols}")
+
+    # Rows without a CustomerID can't be used for CLV; returns (negative quantities) are kept
+    chunk = chunk[chunk['CustomerID'].notna()]
+    frame = pd.DataFrame({
+        'CustomerID': chunk['CustomerID'].astype(int),
+        'InvoiceDate': pd.to_datetime(chunk['InvoiceDate']),
+        'Revenue': chunk['Quantity'] * chunk['UnitPrice'],
+        'Age': chunk['Age'] if 'Age' in chunk.columns else float('nan'),
+        # Codes are compared as strings so chunks parsed with different dtypes still line up
+        'InvoiceNo': chunk['InvoiceNo'].astype(str),
+        'StockCode': chunk['StockCode'].astype(str)
+    })
+    for name in CATEGORICAL_COLUMNS:
+        if name in chunk.columns:
+            frame[name] = chunk[name]
+    return frame
+
+def _hll_alpha(m: int) -> float:
+    return {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+
+class TransactionAggregates:
+    """Running per-customer aggregates that transaction chunks are folded into.
+
+    Each customer owns one row of aligned arrays, found through a CustomerID -> row map:
+    first/last purchase, distinct invoice count, revenue and age sums, per-value counts of
+    the categorical columns and a HyperLogLog sketch of distinct products (2**precision
+    one-byte registers). Memory grows with customers only, and folding in a chunk costs time
+    proportional to the chunk.
+
+    Lines of an invoice are expected together, as in an invoice or time ordered export.
+    Invoices are deduplicated within a chunk, and an invoice split across two chunks is
+    counted once because it is still the customer's last invoice when the next one arrives.
+    """
+
+    def __init__(self, precision: int = 10):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = 1 << precision
+        self.size = 0
+        self._slots: Dict[int, int] = {}
+        # Per categorical column: the values seen, and a (customer, value) count matrix
+        self.category_values: Dict[str, List[Any]] = {}
+        self.category_counts: Dict[str, np.ndarray] = {}
+        self._allocate(0)
+
+    def _allocate(self, capacity: int):
+        self.customer_ids = np.zeros(capacity, dtype=np.int64)
+        self.first_purchase = np.full(capacity, np.iinfo(np.int64).max, dtype=np.int64)
+        self.last_purchase = np.full(capacity, np.iinfo(np.int64).min, dtype=np.int64)
+        self.last_invoice = np.full(capacity, '', dtype=object)
+        self.invoice_count = np.zeros(capacity, dtype=np.int64)
+        self.revenue = np.zeros(capacity, dtype=np.float64)
+        self.age_sum = np.zeros(capacity, dtype=np.float64)
+        self.age_count = np.zeros(capacity, dtype=np.int64)
+        self.product_registers = np.zeros((capacity, self.registers), dtype=np.uint8)
+        for name, values in self.category_values.items():
+            self.category_counts[name] = np.zeros((capacity, len(values)), dtype=np.int64)
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self.customer_ids)
+        if size <= capacity:
+            return
+        old = {name: getattr(self, name) for name in AGGREGATE_FIELDS}
+        old_counts = dict(self.category_counts)
+        self._allocate(max(size, capacity * 2, 1024))
+        for name, values in old.items():
+            getattr(self, name)[:capacity] = values
+        for name, counts in old_counts.items():
+            self.category_counts[name][:capacity] = counts
+
+    def _slots_for(self, customer_ids: np.ndarray) -> np.ndarray:
+        """Slot per customer id, appending customers not seen before"""
+        slots = np.fromiter((self._slots.get(customer_id, -1) for customer_id in customer_ids.tolist()),
+                            dtype=np.int64, count=len(customer_ids))
+        new = np.flatnonzero(slots < 0)
+        if len(new):
+            self._ensure_capacity(self.size + len(new))
+            slots[new] = np.arange(self.size, self.size + len(new))
+            self.customer_ids[slots[new]] = customer_ids[new]
+            self._slots.update(zip(customer_ids[new].tolist(), slots[new].tolist()))
+            self.size += len(new)
+        return slots
+
+    def _hash_products(self, codes: np.ndarray):
+        """Register index and rank (position of the lowest set bit) for each product code"""
+        hashes = pd.util.hash_array(codes.astype(object))
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        lowest_bit = rest & (~rest + np.uint64(1))
+        rank = np.where(rest == 0, 64 - self.precision + 1, np.log2(lowest_bit.astype(np.float64)) + 1)
+        return index, rank.astype(np.uint8)
+
+    def _count_categories(self, frame: pd.DataFrame, row_slots: np.ndarray):
+        for name in CATEGORICAL_COLUMNS:
+            if name not in frame.columns:
+                continue
+            values = frame[name].to_numpy()
+            present = pd.notna(values)
+            known = self.category_values.setdefault(name, [])
+            unique = pd.unique(values[present])
+            known.extend(unique[pd.Index(known).get_indexer(unique) < 0].tolist())
+            counts = self.category_counts.get(name)
+            if counts is None or counts.shape[1] < len(known):
+                grown = np.zeros((len(self.customer_ids), len(known)), dtype=np.int64)
+                if counts is not None:
+                    grown[:, :counts.shape[1]] = counts
+                self.category_counts[name] = counts = grown
+            np.add.at(counts, (row_slots[present], pd.Index(known).get_indexer(values[present])), 1)
+
+    def update(self, chunk: pd.DataFrame) -> int:
+        """Fold one chunk of raw transactions into the aggregates; returns the rows used"""
+        frame = clean_transactions(chunk)
+        if frame.empty:
+            return 0
+        batch = frame.groupby('CustomerID').agg(
+            first_purchase=('InvoiceDate', 'min'),
+            last_purchase=('InvoiceDate', 'max'),
+            revenue=('Revenue', 'sum'),
+            age_sum=('Age', 'sum'),
+            age_count=('Age', 'count')
+        )
+        customer_ids = batch.index.to_numpy(dtype=np.int64)
+        slots = self._slots_for(customer_ids)
+        # groupby sorts its keys, so rows map to their customer's slot by binary search
+        row_slots = slots[np.searchsorted(customer_ids, frame['CustomerID'].to_numpy())]
+
+        lines = pd.DataFrame({'slot': row_slots, 'InvoiceNo': frame['InvoiceNo'].to_numpy()})
+        invoices = lines.drop_duplicates()
+        carried_over = invoices['InvoiceNo'].to_numpy() == self.last_invoice[invoices['slot'].to_numpy()]
+        np.add.at(self.invoice_count, invoices['slot'].to_numpy()[~carried_over], 1)
+        boundary = lines.drop_duplicates('slot', keep='last')
+        self.last_invoice[boundary['slot'].to_numpy()] = boundary['InvoiceNo'].to_numpy()
+
+        # Each customer appears once in batch, so plain fancy indexing updates every slot once
+        self.first_purchase[slots] = np.minimum(self.first_purchase[slots],
+                                                batch['first_purchase'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+        self.last_purchase[slots] = np.maximum(self.last_purchase[slots],
+                                               batch['last_purchase'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+        self.revenue[slots] += batch['revenue'].to_numpy()
+        self.age_sum[slots] += batch['age_sum'].to_numpy()
+        self.age_count[slots] += batch['age_count'].to_numpy()
+
+        index, rank = self._hash_products(frame['StockCode'].to_numpy())
+        np.maximum.at(self.product_registers, (row_slots, index), rank)
+        self._count_categories(frame, row_slots)
+        return len(frame)
+
+    def unique_products(self, slots: np.ndarray) -> np.ndarray:
+        """HyperLogLog estimate of distinct products, with linear counting for small counts"""
+        m = self.registers
+        registers = self.product_registers[slots]
+        estimate = _hll_alpha(m) * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+        zeros = np.count_nonzero(registers == 0, axis=1)
+        small = (estimate <= 2.5 * m) & (zeros > 0)
+        with np.errstate(divide='ignore'):
+            linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.rint(np.where(small, linear, estimate)).astype(np.int64)
+
+    def _modes(self, name: str, slots: np.ndarray) -> np.ndarray:
+        """Most common value per customer; ties go to the smallest value, like Series.mode()[0]"""
+        values = np.array(self.category_values[name], dtype=object)
+        order = np.argsort(values, kind='stable')
+        counts = self.category_counts[name][slots][:, order]
+        modes = values[order][counts.argmax(axis=1)] if len(values) else np.full(len(slots), None)
+        return np.where(counts.sum(axis=1) > 0, modes, 'Unknown')
+
+    def features(self, snapshot_date=None, customer_ids: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """Derive the CLV features as of snapshot_date (default: the day after the latest purchase)"""
+        if self.size == 0:
+            raise ValueError("No transactions with a CustomerID found")
+        if customer_ids is None:
+            slots = np.arange(self.size)
+        else:
+            slots = np.array([self._slots[customer_id] for customer_id in customer_ids], dtype=np.int64)
+
+        first = self.first_purchase[slots].view('datetime64[ns]')
+        last = self.last_purchase[slots].view('datetime64[ns]')
+        if snapshot_date is None:
+            snapshot = self.last_purchase[:self.size].max().view('datetime64[ns]') + DAY
+        else:
+            snapshot = np.datetime64(pd.Timestamp(snapshot_date).as_unit('ns').to_datetime64())
+
+        frequency = self.invoice_count[slots]
+        tenure = (last - first) // DAY
+        clv_data = pd.DataFrame({
+            'CustomerID': self.customer_ids[slots],
+            'Recency': (snapshot - last) // DAY,
+            'Frequency': frequency,
+            # Average monetary value per transaction
+            'MonetaryValue': self.revenue[slots] / frequency,
+            'Tenure': tenure,
+            'AvgDaysBetweenPurchases': tenure / frequency,
+            'UniqueProductsCount': self.unique_products(slots)
+        })
+        if self.age_count[:self.size].any():
+            age_count = self.age_count[slots]
+            clv_data['Age'] = np.divide(self.age_sum[slots], age_count, out=np.full(len(slots), np.nan),
+                                        where=age_count > 0)
+        for name in self.category_counts:
+            clv_data[name] = self._modes(name, slots)
+        if customer_ids is None:
+            clv_data = clv_data.sort_values('CustomerID', ignore_index=True)
+        return clv_data[[name for name in OUTPUT_COLUMNS if name in clv_data.columns]]
+
+def build_clv_features(source: TransactionSource, chunk_size: int = 100000) -> pd.DataFrame:
+    """Compute customer-level CLV features from transaction-level data.
+
+    The input is consumed chunk by chunk and folded into TransactionAggregates, so memory
+    grows with customers rather than with transaction lines. Distinct products come from a
+    sketch and are exact only up to a small error.
+    """
+    aggregates = TransactionAggregates()
+    rows = sum(aggregates.update(chunk) for chunk in iter_transactions(source, chunk_size))
+    logger.info(f"Aggregated {rows} transactions into {aggregates.size} customers")
+    return aggregates.features()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the customer-level CLV dataset from raw transactions")
+    parser.add_argument('--input', default=str(BASE_DIR / 'data/raw/online_retail.xlsx'),
+                        help="Transactions as CSV, Parquet or Excel")
+    parser.add_argument('--output', default=str(BASE_DIR / 'data/processed/clv_preprocessed_data.csv'))
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        clv_data = build_clv_features(args.input, chunk_size=args.chunk_size)
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        clv_data.to_csv(args.output, index=False)
+        logger.info(f"Final dataset shape: {clv_data.shape}")
+        logger.info(f"✅ Preprocessing complete. Data saved to {args.output}")
+    except Exception as e:
+        logger.error(f"❌ Preprocessing failed: {str(e)}")
+        sys.exit(1)
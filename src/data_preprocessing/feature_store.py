@@ -0,0 +1,99 @@
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import joblib
+
+from data_preprocessing import AGGREGATE_FIELDS, BASE_DIR, TransactionAggregates, TransactionSource, iter_transactions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+class CustomerFeatureStore(TransactionAggregates):
+    """Running per-customer aggregates that new transaction batches are folded into.
+
+    Only the TransactionAggregates are kept, and model features are derived from them for any
+    snapshot date, so a refresh costs time proportional to the new batch rather than the full
+    history. Batches are expected in time order, so an invoice split across two consecutive
+    batches is counted once.
+    """
+
+    def __init__(self, precision: int = 10):
+        super().__init__(precision=precision)
+        self.ingested_batches: List[str] = []
+
+    def ingest(self, source: TransactionSource, batch_id: Optional[str] = None, chunk_size: int = 100000) -> int:
+        """Fold a transaction batch into the store; a batch_id that was already ingested is skipped"""
+        if batch_id is not None and batch_id in self.ingested_batches:
+            logger.info(f"Batch {batch_id} already ingested; skipping")
+            return 0
+        rows = sum(self.update(chunk) for chunk in iter_transactions(source, chunk_size))
+        if batch_id is not None:
+            self.ingested_batches.append(batch_id)
+        logger.info(f"Ingested {rows} transactions; store holds {self.size} customers")
+        return rows
+
+    def save(self, path: str):
+        """Write the store atomically so a crash mid-save keeps the previous version"""
+        state = {name: getattr(self, name)[:self.size] for name in AGGREGATE_FIELDS}
+        state.update(version=STORE_VERSION, precision=self.precision, ingested_batches=self.ingested_batches,
+                     category_values=self.category_values,
+                     category_counts={name: counts[:self.size] for name, counts in self.category_counts.items()})
+        tmp_path = f"{path}.tmp"
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CustomerFeatureStore':
+        state = joblib.load(path)
+        if state.get('version') != STORE_VERSION:
+            raise RuntimeError(f"Unsupported feature store version in {path}: {state.get('version')}")
+        store = cls(precision=state['precision'])
+        store.size = len(state['customer_ids'])
+        # Stores written before categorical columns were tracked have none
+        store.category_values = {name: list(values) for name, values in state.get('category_values', {}).items()}
+        store._ensure_capacity(store.size)
+        for name in AGGREGATE_FIELDS:
+            getattr(store, name)[:store.size] = state[name]
+        for name, counts in state.get('category_counts', {}).items():
+            store.category_counts[name][:store.size] = counts
+        store._slots = dict(zip(store.customer_ids[:store.size].tolist(), range(store.size)))
+        store.ingested_batches = list(state['ingested_batches'])
+        return store
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the incremental customer feature store")
+    parser.add_argument('--store', default=str(BASE_DIR / 'data/processed/customer_feature_store.joblib'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Fold a new transaction batch into the store")
+    ingest.add_argument('--input', required=True, help="Transactions as CSV, Parquet or Excel")
+    ingest.add_argument('--batch-id', help="Defaults to the input file name; a batch is only ingested once")
+    ingest.add_argument('--chunk-size', type=int, default=100000)
+
+    export = commands.add_parser('export', help="Write CLV features derived from the store")
+    export.add_argument('--output', default=str(BASE_DIR / 'data/processed/clv_preprocessed_data.csv'))
+    export.add_argument('--snapshot-date', help="Defaults to the day after the latest purchase")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        if args.command == 'ingest':
+            store = CustomerFeatureStore.load(args.store) if os.path.exists(args.store) else CustomerFeatureStore()
+            store.ingest(args.input, batch_id=args.batch_id or Path(args.input).name, chunk_size=args.chunk_size)
+            store.save(args.store)
+            logger.info(f"✅ Feature store saved to {args.store}")
+        else:
+            clv_data = CustomerFeatureStore.load(args.store).features(snapshot_date=args.snapshot_date)
+            clv_data.to_csv(args.output, index=False)
+            logger.info(f"✅ Exported features for {len(clv_data)} customers to {args.output}")
+    except Exception as e:
+        logger.error(f"❌ Feature store {args.command} failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+# Set up paths and imports
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+DATA_PATH = project_root / "data/processed/clv_preprocessed_data.csv"
+FEATURES = ['Recency', 'Frequency', 'MonetaryValue', 'Tenure',
+            'AvgDaysBetweenPurchases', 'Age', 'UniqueProductsCount']
+
+# pytest resets warning filters per test, so repeat the engine's module-level filter
+def pytest_collection_modifyitems(items):
+    for item in items:
+        item.add_marker(pytest.mark.filterwarnings("ignore:X does not have valid feature names"))
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    """Small forest trained the same way as CLVModelTrainer, saved like save_results"""
+    from sklearn.ensemble import RandomForestRegressor
+    df = pd.read_csv(DATA_PATH)
+    model = RandomForestRegressor(n_estimators=20, max_depth=10, random_state=42)
+    model.fit(df[FEATURES], df['MonetaryValue'])
+    path = tmp_path_factory.mktemp("models") / "clv_model.pkl"
+    joblib.dump(model, path)
+    return str(path)
+
+@pytest.fixture(scope="session")
+def customers():
+    """Customers from the processed data plus a few synthetic edge cases"""
+    df = pd.read_csv(DATA_PATH).sample(n=300, random_state=0)
+    rows = df[FEATURES].to_dict(orient="records")
+    rng = np.random.default_rng(42)
+    for row in rows:
+        row["product_cost"] = float(np.round(rng.uniform(1, 150), rng.integers(0, 3)))
+    rows.append({**rows[0], "MonetaryValue": 0.0, "Frequency": 1, "product_cost": 24.35})
+    rows.append({**rows[1], "MonetaryValue": 50000.0, "product_cost": 2.675})
+    return rows
@@ -0,0 +1,87 @@
+import json
+import sys
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES, project_root
+from api.catalog import ProductCatalog
+from api.pricing_engine import PricingEngine
+
+# Imported by name so worker processes can unpickle its functions
+sys.path.append(str(project_root / "src/batch_pricing"))
+import batch_pricing
+
+@pytest.fixture
+def job_config(model_path, tmp_path):
+    customers_path = tmp_path / "customers.csv"
+    pd.read_csv(DATA_PATH).head(250).to_csv(customers_path, index=False)
+    return {
+        'customers_path': str(customers_path),
+        'catalog_path': '',
+        'model_path': model_path,
+        'output_dir': str(tmp_path / "out"),
+        'format': 'csv',
+        'chunk_size': 100,
+        'workers': 2,
+        'base_price': 100.0,
+        'product_cost': 50.0,
+        'restart': False
+    }
+
+def read_parts(output_dir):
+    return pd.concat([pd.read_csv(path) for path in sorted(output_dir.glob("part-*.csv"))],
+                     ignore_index=True)
+
+def test_job_matches_engine_and_resumes(job_config, model_path, tmp_path):
+    assert batch_pricing.BatchPricingJob(job_config).run()
+    output_dir = tmp_path / "out"
+    first_run = read_parts(output_dir)
+
+    customers = pd.read_csv(job_config['customers_path'])
+    expected = PricingEngine(model_path=model_path).calculate_dynamic_prices_batch(
+        customers[FEATURES].to_dict(orient="records"))
+    assert first_run['dynamic_price'].tolist() == [row['dynamic_price'] for row in expected]
+    assert first_run['CustomerID'].tolist() == customers['CustomerID'].tolist()
+
+    # Simulate a crash after the first chunk: drop later parts from disk and the manifest
+    manifest_path = output_dir / batch_pricing.MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest.update(completed_chunks=[0], rows_written=100, finished=False)
+    manifest_path.write_text(json.dumps(manifest))
+    (output_dir / "part-00001.csv").unlink()
+    (output_dir / "part-00002.csv").unlink()
+    first_part_mtime = (output_dir / "part-00000.csv").stat().st_mtime_ns
+
+    assert batch_pricing.BatchPricingJob(job_config).run()
+    assert (output_dir / "part-00000.csv").stat().st_mtime_ns == first_part_mtime
+    pd.testing.assert_frame_equal(read_parts(output_dir), first_run)
+    assert json.loads(manifest_path.read_text())['rows_written'] == 250
+
+def test_resume_refuses_different_job(job_config):
+    assert batch_pricing.BatchPricingJob(job_config).run()
+    assert not batch_pricing.BatchPricingJob({**job_config, 'chunk_size': 50}).run()
+    assert batch_pricing.BatchPricingJob({**job_config, 'chunk_size': 50, 'restart': True}).run()
+
+def test_resume_refuses_changed_catalog(job_config, tmp_path):
+    catalog_path = tmp_path / "catalog.csv"
+    customer_ids = pd.read_csv(job_config['customers_path'])['CustomerID']
+    pd.DataFrame({'CustomerID': customer_ids, 'Base_Price': 90.0}).to_csv(catalog_path, index=False)
+    config = {**job_config, 'catalog_path': str(catalog_path)}
+    assert batch_pricing.BatchPricingJob(config).run()
+    pd.DataFrame({'CustomerID': customer_ids, 'Base_Price': 120.0}).to_csv(catalog_path, index=False)
+    assert not batch_pricing.BatchPricingJob(config).run()
+
+def test_unknown_inventory_level_fails_like_the_catalog(job_config, tmp_path):
+    catalog_path = tmp_path / "catalog.csv"
+    customer_ids = pd.read_csv(job_config['customers_path'])['CustomerID']
+    levels = ['low', 'High', '', 'meduim'] * (len(customer_ids) // 4) + ['low'] * (len(customer_ids) % 4)
+    pd.DataFrame({'CustomerID': customer_ids, 'ProductID': [f"P{i}" for i in range(len(customer_ids))], 'Base_Price': 90.0,
+                  'Inventory_Level': levels}).to_csv(catalog_path, index=False)
+    with pytest.raises(ValueError, match="meduim"):
+        ProductCatalog.from_csv(str(catalog_path))
+    config = {**job_config, 'catalog_path': str(catalog_path)}
+    job = batch_pricing.BatchPricingJob(config)
+    with pytest.raises(ValueError, match="meduim"):
+        job.load_catalog()
+    assert not job.run()
+    assert not list((tmp_path / "out").glob("part-*"))
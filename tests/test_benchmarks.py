@@ -0,0 +1,37 @@
+import sys
+import numpy as np
+import pytest
+
+from conftest import FEATURES, project_root
+
+sys.path.append(str(project_root / "benchmarks"))
+from generators import DISTRIBUTIONS, generate_customers
+from run_benchmarks import compare, reset_peak_rss, summarize
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_generators_are_reproducible(distribution):
+    customers = generate_customers(200, distribution, seed=3)
+    assert list(customers.columns) == FEATURES + ["product_cost"]
+    assert len(customers) == 200 and np.isfinite(customers.to_numpy()).all()
+    assert customers.equals(generate_customers(200, distribution, seed=3))
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"batch": summarize([0.010] * 99 + [0.020], rows=1000, wall_seconds=1.0)}
+    slower = {"batch": {**baseline["batch"], "p50_ms": 13.0, "rows_per_second": 700.0}}
+    flagged = {(item["metric"], item["change"]) for item in compare(slower, baseline, tolerance=0.2)}
+    assert flagged == {("p50_ms", 0.3), ("rows_per_second", -0.3)}
+    # Faster runs and sub-threshold latency jitter are not regressions
+    faster = {"batch": {**baseline["batch"], "p50_ms": 5.0, "rows_per_second": 2000.0}}
+    assert compare(faster, baseline, tolerance=0.2) == []
+    jitter = {"batch": {**baseline["batch"], "p99_ms": baseline["batch"]["p99_ms"] + 0.01}}
+    assert compare(jitter, baseline, tolerance=0.0001) == []
+
+@pytest.mark.skipif(not reset_peak_rss(), reason="needs /proc/self/clear_refs")
+def test_peak_rss_is_per_scenario():
+    reset_peak_rss()
+    block = np.ones(20_000_000)
+    del block
+    large = summarize([0.01], rows=1, wall_seconds=1.0)
+    # The 160 MB block is gone before the next scenario starts, so its peak does not carry over
+    small = summarize([0.01], rows=1, wall_seconds=1.0)
+    assert large['peak_rss_kb'] - small['peak_rss_kb'] > 100_000
@@ -0,0 +1,39 @@
+import os
+import time
+
+from api.cache import PricingCache
+
+def test_lru_eviction_and_counters():
+    cache = PricingCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" becomes most recently used
+    cache.put("c", 3)                   # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+def test_ttl_expiry():
+    cache = PricingCache(max_size=10, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_quantized_keys():
+    cache = PricingCache(quantum=0.5)
+    assert cache.make_key(10.1, 3.0) == cache.make_key(9.9, 3.2)
+    assert PricingCache().make_key(10.1) != PricingCache().make_key(9.9)
+
+def test_invalidated_when_watched_file_changes(tmp_path):
+    model_file = tmp_path / "clv_model.pkl"
+    model_file.write_bytes(b"v1")
+    cache = PricingCache(check_interval=0)
+    cache.watch(str(model_file))
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    model_file.write_bytes(b"version 2")
+    os.utime(model_file, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES
+from api.catalog import ProductCatalog, UnknownProduct
+from api.pricing_engine import PricingEngine
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text("CustomerID,ProductID,Base_Price,Inventory_Level,Product_Cost\n"
+                    "C1,P1,100.00,medium,\n"
+                    "C2,P1,100.00,High,\n"
+                    "C3,P2,150.00,low,60\n"
+                    "C4,P3,20.00,medium,40\n")
+    return ProductCatalog.from_csv(str(path))
+
+def test_catalog_warns_on_conflicting_duplicates(tmp_path, caplog):
+    path = tmp_path / "products.csv"
+    path.write_text("CustomerID,ProductID,Base_Price,Inventory_Level\n"
+                    "C1,P1,100.00,medium\n"
+                    "C2,P1,100.00,High\n"
+                    "C3,P2,150.00,low\n"
+                    "C4,P2,150.00, LOW\n")
+    with caplog.at_level("WARNING", logger="api.catalog"):
+        ProductCatalog.from_csv(str(path))
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert warnings == [f"Conflicting Inventory_Level for P1 in {path}, using the last one"]
+
+def test_catalog_indexes_products_once(catalog):
+    assert len(catalog) == 3
+    assert catalog.get("P1") == {"product_id": "P1", "base_price": 100.0, "product_cost": None,
+                                 "inventory_level": "high", "inventory_multiplier": 0.95}
+    arrays = catalog.pricing_arrays(["P2", "P1", "P2"], default_cost=50.0)
+    assert arrays["product_costs"].tolist() == [60.0, 50.0, 60.0]
+    assert arrays["base_prices"].tolist() == [150.0, 100.0, 150.0]
+    assert arrays["price_multipliers"].tolist() == [1.05, 0.95, 1.05]
+    with pytest.raises(UnknownProduct):
+        catalog.positions(["P1", "missing"])
+
+def test_product_prices_match_single_customer_pricing(catalog, model_path):
+    engine = PricingEngine(model_path=model_path, fast_path=True)
+    customers = pd.read_csv(DATA_PATH).head(40)[FEATURES].to_dict(orient="records")
+    product_ids = ["P1", "P2", "P3"]
+    arrays = catalog.pricing_arrays(product_ids, default_cost=50.0)
+
+    grid = engine.calculate_product_price_grid(
+        engine.build_feature_matrix(customers), arrays["product_costs"], arrays["base_prices"],
+        arrays["price_multipliers"])
+    assert grid["dynamic_price"].shape == (len(customers), len(product_ids))
+
+    requests = [{**customer, "product_id": product_id, "product_cost": 50.0}
+                for customer in customers for product_id in product_ids]
+    for request in requests:
+        catalog.apply(request)
+    batch = engine.calculate_dynamic_prices_batch(requests)
+    for row, request in enumerate(requests):
+        single = engine.calculate_dynamic_price(request, request["product_cost"], request["base_price"],
+                                                request["price_multiplier"])
+        assert batch[row] == single
+        customer, product = divmod(row, len(product_ids))
+        assert grid["dynamic_price"][customer, product] == single["dynamic_price"]
+        assert grid["profit_margin"][customer, product] == single["profit_margin"]
+        assert grid["min_price"][product] == single["min_price"]
+        assert grid["clv"][customer] == single["clv"]
+    # P3's cost floor binds for every customer
+    assert np.all(grid["dynamic_price"][:, 2] == 44.0)
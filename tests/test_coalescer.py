@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+
+from api.coalescer import RequestCoalescer
+from api.executor import ScoringExecutor
+
+class EchoEngine:
+    def __init__(self):
+        self.batch_calls = []
+
+    def calculate_dynamic_prices_batch(self, customers):
+        self.batch_calls.append(len(customers))
+        if any(customer["Age"] < 0 for customer in customers):
+            raise RuntimeError("bad row in batch")
+        return [{"clv": customer["Age"] * 10} for customer in customers]
+
+    def calculate_dynamic_price(self, customer_data, product_cost, base_price=None, price_multiplier=1.0):
+        if customer_data["Age"] < 0:
+            raise RuntimeError("negative age")
+        return {"clv": customer_data["Age"] * 10}
+
+def run_concurrently(coalescer, ages):
+    async def scenario():
+        return await asyncio.gather(*(coalescer.submit({"Age": age}) for age in ages),
+                                    return_exceptions=True)
+    return asyncio.run(scenario())
+
+def test_concurrent_requests_share_one_prediction():
+    engine = EchoEngine()
+    coalescer = RequestCoalescer(ScoringExecutor(engine), max_wait_ms=20, max_batch_size=100)
+    outcomes = run_concurrently(coalescer, range(10))
+    assert engine.batch_calls == [10]
+    assert [result["clv"] for result, _ in outcomes] == [age * 10 for age in range(10)]
+    assert all(timings["batch_size"] == 10 for _, timings in outcomes)
+    assert coalescer.stats()["batch_size"]["count"] == 1
+
+def test_flushes_at_max_batch_size():
+    engine = EchoEngine()
+    coalescer = RequestCoalescer(ScoringExecutor(engine), max_wait_ms=1000, max_batch_size=4)
+    run_concurrently(coalescer, range(8))
+    assert engine.batch_calls == [4, 4]
+
+def test_failing_row_only_fails_its_caller():
+    engine = EchoEngine()
+    coalescer = RequestCoalescer(ScoringExecutor(engine), max_wait_ms=20, max_batch_size=100)
+    outcomes = run_concurrently(coalescer, [1, -1, 3])
+    assert outcomes[0][0] == {"clv": 10} and outcomes[2][0] == {"clv": 30}
+    with pytest.raises(RuntimeError, match="negative age"):
+        raise outcomes[1]
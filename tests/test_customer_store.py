@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES
+from api.customer_store import (CLVTable, CustomerFeatureTable, CustomerStore, KeyIndex, PrecomputedCLV,
+                                 customer_store_path)
+from api.pricing_engine import PricingEngine
+
+def test_key_index_finds_every_key():
+    keys = [f"CUST{i:06d}" for i in range(20000)] + [12346, "12347"]
+    index = KeyIndex.build(keys)
+    assert [index.find(key) for key in keys] == list(range(len(keys)))
+    assert index.find("12346") == 20000
+    assert index.find("CUST999999") == -1
+    with pytest.raises(ValueError):
+        KeyIndex.build(["a", "b", "a"])
+
+def test_table_round_trips_through_mmap(tmp_path):
+    data = pd.read_csv(DATA_PATH).head(500)
+    data.to_csv(tmp_path / "features.csv", index=False)
+    CustomerFeatureTable.from_csv(tmp_path / "features.csv").save(tmp_path / "features.index.joblib")
+    table = CustomerFeatureTable.load(tmp_path / "features.index.joblib")
+    row = data.iloc[123]
+    assert table.get(row["CustomerID"]) == {name: float(row[name]) for name in FEATURES}
+    assert table.get("no-such-customer") is None
+
+def test_store_picks_up_rebuilt_table(tmp_path):
+    source = tmp_path / "features.csv"
+    data = pd.read_csv(DATA_PATH).head(100)
+    data.to_csv(source, index=False)
+    store = CustomerStore(str(source), check_interval=0)
+    store.load()
+    customer_id = data["CustomerID"].iloc[0]
+    assert store.get(customer_id)["Recency"] == data["Recency"].iloc[0]
+
+    data.loc[0, "Recency"] = 999
+    data.to_csv(source, index=False)
+    # Another worker sees the rebuilt artifact through its file signature
+    other = CustomerStore(str(source), check_interval=0)
+    other.load()
+    assert other.get(customer_id)["Recency"] == 999
+    assert store.get(customer_id)["Recency"] == 999
+    assert customer_store_path(str(source)).endswith("features.index.joblib")
+
+def test_precomputed_clv_matches_forest_and_tracks_staleness(model_path, tmp_path):
+    data = pd.read_csv(DATA_PATH).head(200)
+    engine = PricingEngine(model_path=model_path)
+    clv = engine.predict_clv_batch(data[FEATURES].to_numpy(dtype=float))
+    CLVTable.from_predictions(data["CustomerID"], clv, "v1").save(tmp_path / "clv.joblib")
+
+    precomputed = PrecomputedCLV(str(tmp_path / "clv.joblib"))
+    precomputed.load()
+    for _, row in data.iterrows():
+        table_clv = precomputed.get(row["CustomerID"], "v1")
+        features = {name: row[name] for name in FEATURES}
+        assert engine.price_from_clv(table_clv, 40.0) == engine.calculate_dynamic_price(features, 40.0)
+
+    assert precomputed.get("no-such-customer", "v1") is None
+    assert precomputed.get(data["CustomerID"].iloc[0], "v2") is None
+    info = precomputed.info()
+    assert (info["hits"], info["misses"], info["stale_lookups"], info["stale"]) == (200, 1, 1, True)
@@ -0,0 +1,75 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import project_root
+
+sys.path.append(str(project_root / "src/data_preprocessing"))
+from data_preprocessing import build_clv_features
+
+@pytest.fixture(scope="module")
+def transactions():
+    rng = np.random.default_rng(7)
+    n = 5000
+    frame = pd.DataFrame({
+        'InvoiceNo': rng.integers(500000, 501500, n),
+        'StockCode': rng.choice(['85123A', '71053', '84406B', '22752', '21730'], n),
+        'Quantity': rng.integers(-2, 20, n),
+        'InvoiceDate': pd.Timestamp('2011-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n), unit='min'),
+        'UnitPrice': rng.uniform(0.5, 20, n).round(2),
+        'CustomerID': rng.integers(12000, 12300, n).astype(float),
+        'Age': rng.integers(18, 80, n).astype(float),
+        'Gender': rng.choice(['F', 'M'], n),
+        'Country': rng.choice(['United Kingdom', 'France', 'Iceland'], n)
+    })
+    frame.loc[rng.choice(n, 100, replace=False), 'CustomerID'] = np.nan
+    frame.loc[rng.choice(n, 200, replace=False), 'Age'] = np.nan
+    # An invoice belongs to one customer
+    frame['InvoiceNo'] = frame['InvoiceNo'].astype(str) + '-' + frame['CustomerID'].astype(str)
+    return frame
+
+def reference_features(df):
+    """The original script's per-feature groupby passes"""
+    df = df[df['CustomerID'].notna()].copy()
+    df['CustomerID'] = df['CustomerID'].astype(int)
+    df['Revenue'] = df['Quantity'] * df['UnitPrice']
+    snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
+    clv_data = df.groupby('CustomerID').agg({
+        'InvoiceDate': lambda x: (snapshot_date - x.max()).days,
+        'InvoiceNo': 'nunique',
+        'Revenue': 'sum'
+    }).reset_index()
+    clv_data.columns = ['CustomerID', 'Recency', 'Frequency', 'MonetaryValue']
+    clv_data['MonetaryValue'] = clv_data['MonetaryValue'] / clv_data['Frequency']
+    tenure = df.groupby('CustomerID')['InvoiceDate'].agg(['min', 'max'])
+    tenure['Tenure'] = (tenure['max'] - tenure['min']).dt.days
+    clv_data = clv_data.merge(tenure[['Tenure']], on='CustomerID', how='left')
+    clv_data['AvgDaysBetweenPurchases'] = clv_data['Tenure'] / clv_data['Frequency']
+    demo = df.groupby('CustomerID').agg({
+        'Age': 'mean',
+        'Gender': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown',
+        'Country': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown'
+    }).reset_index()
+    clv_data = clv_data.merge(demo, on='CustomerID', how='left')
+    products = df.groupby('CustomerID')['StockCode'].nunique().reset_index()
+    products.columns = ['CustomerID', 'UniqueProductsCount']
+    return clv_data.merge(products, on='CustomerID', how='left')
+
+def test_single_frame_matches_original_script(transactions):
+    features = build_clv_features(transactions)
+    expected = reference_features(transactions)
+    exact = [name for name in expected.columns if name != 'UniqueProductsCount']
+    pd.testing.assert_frame_equal(features[exact], expected[exact], check_dtype=False)
+    # Distinct products come from a sketch, so allow a small relative error
+    error = np.abs(features['UniqueProductsCount'] - expected['UniqueProductsCount'])
+    assert (error / expected['UniqueProductsCount']).mean() < 0.02 and error.max() <= 1
+
+def test_chunked_csv_matches_single_frame(transactions, tmp_path):
+    path = tmp_path / "transactions.csv"
+    # Invoices in random order, with each invoice's lines together as in an export
+    order = transactions['InvoiceNo'].drop_duplicates().sample(frac=1, random_state=3)
+    rank = pd.Series(range(len(order)), index=order.to_numpy())
+    transactions.iloc[np.argsort(rank[transactions['InvoiceNo']].to_numpy(), kind='stable')].to_csv(path, index=False)
+    pd.testing.assert_frame_equal(build_clv_features(path, chunk_size=700),
+                                  build_clv_features(transactions), check_dtype=False)
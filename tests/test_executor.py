@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import pytest
+
+from api.executor import ScoringExecutor, ScoringQueueFull
+
+class SlowEngine:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def calculate_clv(self, value):
+        self.release.wait(timeout=5)
+        return value * 2
+
+def test_run_returns_result_and_timings():
+    engine = SlowEngine()
+    engine.release.set()
+    executor = ScoringExecutor(engine, max_workers=2, max_queue=2)
+    result, timings = asyncio.run(executor.run("calculate_clv", 21))
+    executor.shutdown()
+    assert result == 42
+    assert timings["queue_wait_ms"] >= 0 and timings["execution_ms"] >= 0
+
+def test_rejects_when_queue_is_full():
+    engine = SlowEngine()
+    executor = ScoringExecutor(engine, max_workers=1, max_queue=1)
+
+    async def scenario():
+        accepted = [asyncio.ensure_future(executor.run("calculate_clv", i)) for i in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ScoringQueueFull):
+            await executor.run("calculate_clv", 99)
+        engine.release.set()
+        return [result for result, _ in await asyncio.gather(*accepted)]
+
+    assert asyncio.run(scenario()) == [0, 2]
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
+
+class ConstantEngine:
+    def __init__(self, value):
+        self.value = value
+
+    def calculate_clv(self, customer):
+        return self.value
+
+def test_pinned_engine_survives_replace():
+    old, new = ConstantEngine("old"), ConstantEngine("new")
+    executor = ScoringExecutor(old, max_workers=1, max_queue=1)
+
+    async def scenario():
+        executor.replace_engine(new)
+        pinned, _ = await executor.run("calculate_clv", {}, engine=old)
+        current, _ = await executor.run("calculate_clv", {})
+        return pinned, current
+
+    try:
+        assert asyncio.run(scenario()) == ("old", "new")
+    finally:
+        executor.shutdown()
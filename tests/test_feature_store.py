@@ -0,0 +1,55 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import project_root
+
+sys.path.append(str(project_root / "src/data_preprocessing"))
+from data_preprocessing import build_clv_features
+from feature_store import CustomerFeatureStore
+
+@pytest.fixture(scope="module")
+def transactions():
+    rng = np.random.default_rng(11)
+    n = 6000
+    frame = pd.DataFrame({
+        'StockCode': rng.integers(0, 60, n).astype(str),
+        'Quantity': rng.integers(-1, 12, n),
+        'InvoiceDate': pd.Timestamp('2011-01-01') + pd.to_timedelta(rng.integers(0, 300 * 24 * 60, n), unit='min'),
+        'UnitPrice': rng.uniform(0.5, 20, n).round(2),
+        'CustomerID': rng.integers(12000, 12400, n).astype(float),
+        'Age': rng.integers(18, 80, n).astype(float)
+    })
+    frame.loc[rng.choice(n, 300, replace=False), 'Age'] = np.nan
+    # One invoice per customer per day, so a batch cut mid-day splits invoices across batches
+    frame['InvoiceNo'] = frame['CustomerID'].astype(int).astype(str) + '-' + frame['InvoiceDate'].dt.strftime('%Y%m%d')
+    return frame.sort_values('InvoiceDate', ignore_index=True)
+
+def test_incremental_batches_match_full_rebuild(transactions, tmp_path):
+    cut = pd.Timestamp('2011-06-15 13:00')
+    store = CustomerFeatureStore()
+    store.ingest(transactions[transactions['InvoiceDate'] < cut], batch_id='day-1')
+    store.save(tmp_path / "store.joblib")
+
+    store = CustomerFeatureStore.load(tmp_path / "store.joblib")
+    store.ingest(transactions[transactions['InvoiceDate'] >= cut], batch_id='day-2', chunk_size=500)
+    assert store.ingest(transactions, batch_id='day-2') == 0
+
+    expected = build_clv_features(transactions)
+    features = store.features()
+    exact = ['CustomerID', 'Recency', 'Frequency', 'MonetaryValue', 'Tenure', 'AvgDaysBetweenPurchases', 'Age']
+    pd.testing.assert_frame_equal(features[exact], expected[exact], check_dtype=False)
+    # Distinct products come from a sketch, so allow a small relative error
+    error = np.abs(features['UniqueProductsCount'] - expected['UniqueProductsCount'])
+    assert (error / expected['UniqueProductsCount']).mean() < 0.02 and error.max() <= 2
+
+def test_features_for_snapshot_date(transactions):
+    store = CustomerFeatureStore()
+    store.ingest(transactions)
+    customer_id = int(transactions['CustomerID'].iloc[0])
+    last_purchase = transactions.loc[transactions['CustomerID'] == customer_id, 'InvoiceDate'].max()
+    features = store.features(snapshot_date=last_purchase.normalize() + pd.Timedelta(days=30),
+                              customer_ids=[customer_id])
+    assert features['CustomerID'].tolist() == [customer_id]
+    assert features['Recency'].tolist() == [29]
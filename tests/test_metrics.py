@@ -0,0 +1,64 @@
+import asyncio
+
+from api.metrics import Histogram, MetricsMiddleware, MetricsRegistry
+
+def test_histogram_renders_cumulative_prometheus_buckets():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    lines = histogram.prometheus_lines("latency", 'stage="predict"')
+    assert lines == [
+        'latency_bucket{stage="predict",le="0.1"} 1',
+        'latency_bucket{stage="predict",le="1"} 3',
+        'latency_bucket{stage="predict",le="+Inf"} 4',
+        'latency_sum{stage="predict"} 4.25',
+        'latency_count{stage="predict"} 4',
+    ]
+
+def test_registry_renders_counters_histograms_and_gauges():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors")
+    registry.histogram("batch_size", "Batch sizes", [10, 100])
+    registry.gauge("model_info", "Model", lambda: [({"version": "abc"}, 1)])
+    registry.inc("errors_total", type="ValueError")
+    registry.inc("errors_total", type="ValueError")
+    registry.inc("errors_total", type='Bad"Name')
+    registry.observe("batch_size", 50)
+
+    text = registry.render()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "# TYPE errors_total counter" in lines
+    assert 'errors_total{type="ValueError"} 2' in lines
+    assert 'errors_total{type="Bad\\"Name"} 1' in lines
+    assert 'batch_size_bucket{le="100"} 1' in lines
+    assert "batch_size_count 1" in lines
+    assert 'model_info{version="abc"} 1' in lines
+    # Same label set always resolves to the same histogram
+    assert registry.labelled_histogram("batch_size") is registry.labelled_histogram("batch_size")
+
+def test_middleware_counts_requests_by_route_and_status():
+    registry = MetricsRegistry()
+    registry.counter("pricing_requests_total", "Requests")
+    registry.histogram("pricing_request_seconds", "Latency")
+
+    class Route:
+        path = "/api/items/{item_id}"
+
+    async def app(scope, receive, send):
+        assert "request_started" in scope["state"]
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    import api.metrics
+    original, api.metrics.REGISTRY = api.metrics.REGISTRY, registry
+    try:
+        asyncio.run(MetricsMiddleware(app)({"type": "http", "method": "POST"}, None, send))
+    finally:
+        api.metrics.REGISTRY = original
+    assert 'pricing_requests_total{method="POST",route="/api/items/{item_id}",status="201"} 1' \
+        in registry.render().splitlines()
@@ -0,0 +1,74 @@
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from api.compiled_forest import model_version
+from api.model_registry import ModelRegistry
+from api.pricing_engine import PricingEngine
+
+def test_reload_swaps_engine_and_notifies(model_path):
+    swapped = []
+    registry = ModelRegistry(lambda path: PricingEngine(model_path=path, fast_path=True), model_path)
+    first = registry.load()
+    registry.on_swap(swapped.append)
+    second = registry.load()
+    assert registry.engine is second and second is not first
+    assert swapped == [second]
+    info = registry.info()
+    assert info["version"] and info["loaded_at"] and info["last_error"] is None
+
+def test_failed_reload_keeps_current_engine(model_path, tmp_path):
+    candidate = tmp_path / "clv_model.pkl"
+    shutil.copy(model_path, candidate)
+    registry = ModelRegistry(lambda path: PricingEngine(model_path=path, fast_path=True), str(candidate))
+    current = registry.load()
+    version = registry.version
+    candidate.write_bytes(b"not a model")
+    with pytest.raises(RuntimeError):
+        registry.load()
+    assert registry.engine is current
+    assert registry.version == version
+    assert "Model loading failed" in registry.info()["last_error"]
+
+def test_concurrent_background_reloads_start_once(model_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_factory(path):
+        started.set()
+        release.wait(5)
+        return PricingEngine(model_path=path, fast_path=True)
+
+    registry = ModelRegistry(slow_factory, model_path)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: registry.reload_in_background(), range(8)))
+    assert results.count(True) == 1
+    assert started.wait(5)
+    release.set()
+    for _ in range(100):
+        if registry.reload_in_background():
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("background reload never finished")
+
+def test_load_retries_when_file_changes_mid_load(model_path, tmp_path):
+    candidate = tmp_path / "clv_model.pkl"
+    shutil.copy(model_path, candidate)
+    loads = []
+
+    def replacing_factory(path):
+        engine = PricingEngine(model_path=path, fast_path=True)
+        if not loads:
+            # A new model lands while the first load is still running
+            with open(candidate, "ab") as model_file:
+                model_file.write(b"\0")
+        loads.append(path)
+        return engine
+
+    registry = ModelRegistry(replacing_factory, str(candidate))
+    registry.load()
+    assert len(loads) == 2
+    assert registry.version == model_version(str(candidate))
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES
+from api.executor import ScoringExecutor
+from api.parallel_scoring import ParallelScorer
+from api.pricing_engine import PricingEngine
+from api.segments import CLVSegments, save_segments
+
+@pytest.fixture
+def segmented_model(model_path, tmp_path):
+    copied_model = str(tmp_path / "clv_model.pkl")
+    shutil.copy(model_path, copied_model)
+    engine = PricingEngine(model_path=model_path, fast_path=True)
+    clv = engine.predict_clv_batch(pd.read_csv(DATA_PATH)[FEATURES].to_numpy(dtype=np.float64))
+    save_segments(copied_model, CLVSegments.from_predictions(clv))
+    return copied_model
+
+def shared_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+def test_fanout_matches_in_process_scoring(segmented_model, customers):
+    engine = PricingEngine(model_path=segmented_model, fast_path=True, segment_pricing=True)
+    scorer = ParallelScorer(engine, workers=2, min_rows=0)
+    blocks_before = shared_blocks()
+    try:
+        rows = [{**customer, "base_price": 80.0 + i % 7, "price_multiplier": (0.95, 1.0, 1.05)[i % 3]}
+                for i, customer in enumerate(customers)]
+        assert scorer.calculate_dynamic_prices_batch(rows) == engine.calculate_dynamic_prices_batch(rows)
+
+        features = engine.build_feature_matrix(customers)
+        costs = np.array([customer["product_cost"] for customer in customers])
+        expected = engine.calculate_dynamic_prices_arrays(features, costs)
+        columns = scorer.calculate_dynamic_prices_arrays(features, costs)
+        assert list(columns) == engine.result_fields
+        for name in expected:
+            np.testing.assert_array_equal(columns[name], expected[name])
+    finally:
+        scorer.shutdown()
+    # Every input and output block is unlinked once its call returns
+    assert shared_blocks() == blocks_before
+
+def test_executor_fans_out_only_large_batches(model_path, customers):
+    engine = PricingEngine(model_path=model_path, fast_path=True)
+    scorer = ParallelScorer(engine, workers=2, min_rows=100)
+    executor = ScoringExecutor(engine, max_workers=2, max_queue=2, fanout=scorer)
+    try:
+        assert not scorer.accepts("calculate_dynamic_prices_batch", (customers[:99],))
+        assert not scorer.accepts("calculate_clv", (customers,))
+        assert scorer.accepts("calculate_dynamic_prices_batch", (customers,))
+        result, timings = asyncio.run(executor.run("calculate_dynamic_prices_batch", customers))
+        assert result == engine.calculate_dynamic_prices_batch(customers)
+        assert executor.stats()["fanout"] == {"workers": 2, "min_rows": 100}
+    finally:
+        executor.shutdown()
+
+def test_fanout_is_opt_in_and_capped_under_server_workers(model_path, monkeypatch):
+    engine = PricingEngine(model_path=model_path, fast_path=True)
+    monkeypatch.delenv("PRICING_FANOUT_WORKERS", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert ParallelScorer.from_env(engine) is None
+
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("PRICING_FANOUT_WORKERS", "8")
+    monkeypatch.setenv("WEB_CONCURRENCY", "8")
+    assert ParallelScorer.from_env(engine) is None
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    scorer = ParallelScorer.from_env(engine)
+    try:
+        assert scorer.workers == 2
+    finally:
+        scorer.shutdown()
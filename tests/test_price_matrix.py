@@ -0,0 +1,68 @@
+import json
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES, project_root
+from api.catalog import ProductCatalog
+from api.pricing_engine import PricingEngine
+
+sys.path.append(str(project_root / "src/batch_pricing"))
+sys.path.append(str(project_root / "benchmarks"))
+import price_matrix
+from generators import generate_products
+
+@pytest.fixture
+def job_config(model_path, tmp_path):
+    customers_path = tmp_path / "customers.csv"
+    catalog_path = tmp_path / "products.csv"
+    pd.read_csv(DATA_PATH).head(120).to_csv(customers_path, index=False)
+    generate_products(300).to_csv(catalog_path, index=False)
+    return {
+        'customers_path': str(customers_path),
+        'catalog_path': str(catalog_path),
+        'model_path': model_path,
+        'output_dir': str(tmp_path / "out"),
+        'mode': 'dense',
+        'k': 5,
+        'rank_by': 'profit',
+        # Small enough to force several blocks
+        'max_block_mb': 0.25,
+        'product_cost': 50.0
+    }
+
+def run_job(config):
+    job = price_matrix.PriceMatrixJob(config)
+    assert job.load() and job.run()
+    return job
+
+def test_dense_matrix_matches_product_grid(job_config):
+    job = run_job(job_config)
+    assert job.stats['block_rows'] < job.stats['customers']
+    prices = np.load(f"{job_config['output_dir']}/prices.npy")
+    assert prices.shape == (120, 300) and prices.dtype == np.float32
+
+    engine = PricingEngine(model_path=job_config['model_path'], fast_path=True)
+    catalog = ProductCatalog.from_csv(job_config['catalog_path'])
+    arrays = catalog.pricing_arrays(catalog.product_ids, default_cost=50.0)
+    customers = pd.read_csv(DATA_PATH).head(120)[FEATURES].to_dict(orient="records")
+    grid = engine.calculate_product_price_grid(engine.build_feature_matrix(customers), arrays["product_costs"],
+                                               arrays["base_prices"], arrays["price_multipliers"])
+    # float32 storage plus np.round on half-cent ties: never more than a cent apart
+    assert np.abs(prices - grid["dynamic_price"]).max() <= 0.0101
+
+def test_topk_keeps_best_products_per_customer(job_config):
+    dense = run_job(job_config)
+    prices = np.load(f"{job_config['output_dir']}/prices.npy")
+    job_config['output_dir'] += "_topk"
+    job = run_job({**job_config, 'mode': 'topk'})
+    topk = np.load(f"{job_config['output_dir']}/topk.npz")
+
+    assert topk["product_index"].shape == (120, 5)
+    assert json.loads((job.output_dir / "manifest.json").read_text())['pairs'] == 120 * 300
+    costs = dense.product_costs
+    scores = prices.astype(np.float64) - costs
+    expected = np.sort(scores, axis=1)[:, ::-1][:, :5]
+    np.testing.assert_allclose(topk["score"], expected, atol=1e-3)
+    np.testing.assert_array_equal(topk["dynamic_price"], np.take_along_axis(prices, topk["product_index"], axis=1))
@@ -0,0 +1,117 @@
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.pricing_engine import PricingEngine, REQUIRED_FEATURES
+
+@pytest.fixture(scope="module")
+def engine(model_path):
+    return PricingEngine(model_path=model_path, base_price=100.0)
+
+def test_batch_matches_single_row_path(engine, customers):
+    expected = [
+        engine.calculate_dynamic_price(customer, product_cost=customer["product_cost"])
+        for customer in customers
+    ]
+    assert engine.calculate_dynamic_prices_batch(customers) == expected
+
+def test_batch_builds_contiguous_float64_matrix(engine, customers):
+    features = engine.build_feature_matrix(customers)
+    assert features.dtype == np.float64
+    assert features.flags["C_CONTIGUOUS"]
+    assert features.shape == (len(customers), len(REQUIRED_FEATURES))
+
+def test_batch_rejects_missing_features(engine, customers):
+    incomplete = {k: v for k, v in customers[0].items() if k != "Age"}
+    with pytest.raises(RuntimeError, match="Age"):
+        engine.calculate_dynamic_prices_batch([customers[1], incomplete])
+
+def test_batch_empty(engine):
+    assert engine.calculate_dynamic_prices_batch([]) == []
+
+@pytest.fixture(scope="module")
+def fast_engine(model_path):
+    return PricingEngine(model_path=model_path, base_price=100.0, fast_path=True)
+
+def test_fast_path_matches_dataframe_path(engine, fast_engine, customers):
+    for customer in customers:
+        assert fast_engine.calculate_clv(customer) == engine.calculate_clv(customer)
+        assert (fast_engine.calculate_dynamic_price(customer, product_cost=customer["product_cost"]) ==
+                engine.calculate_dynamic_price(customer, product_cost=customer["product_cost"]))
+
+def test_fast_path_reads_pydantic_fields(engine, fast_engine, customers):
+    from api.models import CustomerData
+    for customer in customers[:50]:
+        model_input = CustomerData(**customer)
+        assert fast_engine.calculate_clv(model_input) == engine.calculate_clv(customer)
+        assert engine.calculate_clv(model_input) == engine.calculate_clv(customer)
+
+def test_fast_path_rejects_missing_features(fast_engine, customers):
+    incomplete = {k: v for k, v in customers[0].items() if k != "Tenure"}
+    with pytest.raises(RuntimeError, match="Tenure"):
+        fast_engine.calculate_clv(incomplete)
+
+def test_compiled_forest_matches_sklearn(model_path, customers):
+    from api.compiled_forest import CompiledForest
+    model = joblib.load(model_path)
+    compiled = CompiledForest.from_model(model)
+    rng = np.random.default_rng(7)
+    features = np.vstack([
+        pd.DataFrame(customers)[REQUIRED_FEATURES].to_numpy(dtype=np.float64),
+        rng.uniform(-100, 10000, size=(500, len(REQUIRED_FEATURES))),
+    ])
+    expected = model.predict(features)
+    np.testing.assert_allclose(compiled.predict(features), expected, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(compiled.predict(features[:1]), expected[:1], rtol=0, atol=1e-9)
+
+def test_compiled_forest_chunks_large_batches(model_path):
+    from api.compiled_forest import CompiledForest
+    model = joblib.load(model_path)
+    compiled = CompiledForest.from_model(model)
+    compiled.chunk_size = 64
+    features = np.random.default_rng(3).uniform(0, 1000, size=(300, len(REQUIRED_FEATURES)))
+    np.testing.assert_allclose(compiled.predict(features), model.predict(features), rtol=0, atol=1e-9)
+
+def test_engine_falls_back_to_sklearn(model_path, customers):
+    compiled_engine = PricingEngine(model_path=model_path, fast_path=True)
+    sklearn_engine = PricingEngine(model_path=model_path, fast_path=True, compile_forest=False)
+    assert compiled_engine.compiled_model is not None
+    assert sklearn_engine.compiled_model is None
+    assert (compiled_engine.calculate_dynamic_prices_batch(customers) ==
+            sklearn_engine.calculate_dynamic_prices_batch(customers))
+
+def test_cached_engine_matches_uncached(model_path, engine, customers):
+    from api.cache import PricingCache
+    cached_engine = PricingEngine(model_path=model_path, fast_path=True, cache=PricingCache(max_size=1000))
+    for _ in range(2):
+        for customer in customers[:100]:
+            result = cached_engine.calculate_dynamic_price(customer, product_cost=customer["product_cost"])
+            assert result == engine.calculate_dynamic_price(customer, product_cost=customer["product_cost"])
+    stats = cached_engine.cache.stats()
+    assert stats["hits"] >= 100
+    # Returned dicts are copies, so callers cannot corrupt cached entries
+    result["dynamic_price"] = -1
+    assert cached_engine.calculate_dynamic_price(customers[99], customers[99]["product_cost"])["dynamic_price"] != -1
+
+def test_mmap_engine_shares_compiled_arrays(model_path, engine, customers):
+    from api.compiled_forest import compiled_artifact_path, export_compiled_model
+    artifact_path = export_compiled_model(model_path)
+    assert artifact_path == compiled_artifact_path(model_path)
+    mmap_engine = PricingEngine(model_path=model_path, fast_path=True, mmap_compiled=True)
+    assert not mmap_engine.sklearn_model_loaded
+    assert isinstance(mmap_engine.compiled_model.threshold.base, np.memmap)
+    assert (mmap_engine.calculate_dynamic_prices_batch(customers) ==
+            engine.calculate_dynamic_prices_batch(customers))
+    assert not mmap_engine.sklearn_model_loaded
+
+def test_mmap_engine_ignores_stale_artifact(model_path, tmp_path):
+    import shutil
+    from api.compiled_forest import export_compiled_model
+    copied_model = str(tmp_path / "clv_model.pkl")
+    shutil.copy(model_path, copied_model)
+    export_compiled_model(copied_model)
+    Path(copied_model).touch()
+    stale_engine = PricingEngine(model_path=copied_model, mmap_compiled=True)
+    assert stale_engine.sklearn_model_loaded
@@ -0,0 +1,63 @@
+import asyncio
+import marshal
+import threading
+import time
+
+from api.executor import ScoringExecutor
+from api.profiling import ProfilingMiddleware, ProfilingService, collapsed_text, sample_stacks
+
+def _spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampler_collects_collapsed_stacks_of_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        counts = sample_stacks(0.2, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+    spinner = [stack for stack in counts if stack.startswith("spinner;")]
+    assert spinner and any("_spin (tests/test_profiling.py" in stack for stack in spinner)
+    line = collapsed_text(counts).splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_profiling_is_off_without_flag_or_token():
+    assert not ProfilingService().authorized("anything")
+    assert not ProfilingService(enabled=True, admin_token=None).enabled
+    service = ProfilingService(enabled=True, admin_token="secret")
+    assert service.authorized("secret") and not service.authorized("wrong") and not service.authorized(None)
+    # Header values arrive latin-1 decoded, so they can hold non-ASCII characters
+    assert not service.authorized("s\xe9cret")
+
+class SlowEngine:
+    def price(self, value):
+        time.sleep(0.001)
+        return value * 2
+
+def test_profiled_request_captures_engine_call():
+    service = ProfilingService(enabled=True, admin_token="secret")
+    executor = ScoringExecutor(SlowEngine(), max_workers=1)
+    sent = []
+
+    async def app(scope, receive, send):
+        result, _ = await executor.run("price", 21)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(result).encode()})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"x-profile", b"cprofile"), (b"x-admin-token", b"secret")]}
+    try:
+        asyncio.run(ProfilingMiddleware(app, service)(scope, None, send))
+    finally:
+        executor.shutdown()
+
+    profile_id = dict(sent[0]["headers"])[b"x-profile-id"].decode()
+    stats = marshal.loads(service.get(profile_id))
+    assert any(function == "price" for _, _, function in stats)
+    assert sent[1]["body"] == b"42"
@@ -0,0 +1,80 @@
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH, FEATURES
+from api.pricing_engine import PricingEngine
+from api.segments import (CLVSegments, QuantileSketch, SEGMENT_MULTIPLIERS, load_segments, save_segments,
+                          segments_artifact_path)
+
+def test_sketch_tracks_quantiles_incrementally():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(6, 1.2, 200_000)
+    sketch = QuantileSketch(capacity=512)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    assert len(sketch) == len(values)
+    assert sum(len(items) for items in sketch.levels) < 512 * 10
+    qs = np.array([0.01, 1 / 3, 0.5, 2 / 3, 0.99])
+    # Rank error of each estimate, relative to the full sort the sketch avoids
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(qs)) / len(values)
+    assert np.abs(ranks - qs).max() < 0.01
+
+    other = QuantileSketch(capacity=512, seed=1)
+    other.update(rng.lognormal(6, 1.2, 50_000))
+    sketch.merge(other)
+    assert len(sketch) == 250_000
+
+@pytest.fixture
+def segmented_model(model_path, tmp_path):
+    copied_model = str(tmp_path / "clv_model.pkl")
+    shutil.copy(model_path, copied_model)
+    clv = PricingEngine(model_path=model_path, fast_path=True).predict_clv_batch(
+        pd.read_csv(DATA_PATH)[FEATURES].to_numpy(dtype=np.float64))
+    save_segments(copied_model, CLVSegments.from_predictions(clv))
+    return copied_model
+
+def test_engine_prices_by_stored_segment(segmented_model, customers):
+    # Stored segments change nothing until segment pricing is switched on
+    plain_engine = PricingEngine(model_path=segmented_model, fast_path=True)
+    assert plain_engine.segments is None and "clv_segment" not in plain_engine.calculate_dynamic_price(customers[0])
+
+    engine = PricingEngine(model_path=segmented_model, fast_path=True, segment_pricing=True)
+    boundaries = engine.segments.boundaries
+    assert np.all(np.diff(boundaries) > 0)
+
+    batch = engine.calculate_dynamic_prices_batch(customers)
+    for customer, row in zip(customers, batch):
+        assert row == engine.calculate_dynamic_price(customer, customer["product_cost"])
+        segment = ("low", "medium", "high")[np.searchsorted(boundaries, row["clv"], side="right")]
+        if row["clv"] not in (round(boundary, 2) for boundary in boundaries):
+            assert row["clv_segment"] == segment
+        # The segment multiplier takes the place of the continuous CLV factor
+        assert row["segment_multiplier"] == row["price_adjustment_factor"] == SEGMENT_MULTIPLIERS[row["clv_segment"]]
+        assert row["dynamic_price"] == round(max(row["min_price"], 100.0 * row["segment_multiplier"]), 2)
+
+def test_segment_prices_are_monotonic_in_clv(segmented_model):
+    engine = PricingEngine(model_path=segmented_model, fast_path=True, segment_pricing=True)
+    low, high = engine.segments.boundaries
+    clv = np.sort(np.concatenate([np.linspace(0, 2000, 4001), [low, high],
+                                  np.nextafter([low, high], -np.inf), np.nextafter([low, high], np.inf)]))
+    prices = np.array([engine.price_from_clv(value, product_cost=10.0)["dynamic_price"] for value in clv])
+    assert np.all(np.diff(prices) <= 0)
+    assert prices[0] > prices[-1]
+    matrix = engine.dynamic_price_matrix(clv, np.array([10.0]), np.array([100.0]), dtype=np.float64)
+    np.testing.assert_array_equal(matrix[:, 0], prices)
+
+def test_segments_belong_to_their_model(segmented_model, tmp_path):
+    assert load_segments(segmented_model) is not None
+    # Tied to the model's content, so a copy or redeploy keeps them and another model does not
+    redeployed = tmp_path / "redeployed" / "clv_model.pkl"
+    redeployed.parent.mkdir()
+    shutil.copy(segmented_model, redeployed)
+    shutil.copy(segments_artifact_path(segmented_model), segments_artifact_path(str(redeployed)))
+    Path(redeployed).touch()
+    assert load_segments(str(redeployed)) is not None
+    with open(redeployed, "ab") as model_file:
+        model_file.write(b"\0")
+    assert load_segments(str(redeployed)) is None
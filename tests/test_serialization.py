@@ -0,0 +1,37 @@
+import json
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from api.pricing_engine import PricingEngine, rows_from_columns
+from api.serialization import (ARROW_STREAM, COLUMNAR_JSON, JSON, columnar_content, columns_response, dumps,
+                               negotiate, response_formats)
+
+def test_negotiate_picks_supported_type_by_quality():
+    assert negotiate(None) == JSON
+    assert negotiate("*/*") == JSON
+    assert negotiate(f"{COLUMNAR_JSON}, application/json;q=0.5") == COLUMNAR_JSON
+    assert negotiate(f"application/json;q=0.9, {COLUMNAR_JSON};q=0.1") == JSON
+    assert negotiate("text/html, */*;q=0.8") == JSON
+    assert negotiate("text/csv") is None
+    assert negotiate(ARROW_STREAM) == (ARROW_STREAM if ARROW_STREAM in response_formats() else None)
+
+def test_fast_and_columnar_json_carry_the_same_results(model_path, customers):
+    engine = PricingEngine(model_path=model_path, fast_path=True)
+    columns = engine.calculate_batch_columns(customers)
+    rows = rows_from_columns(columns)
+    assert rows == engine.calculate_dynamic_prices_batch(customers)
+
+    # Same bytes as the stdlib JSONResponse, including NumPy scalars from price_from_clv
+    single = engine.calculate_dynamic_price(customers[0], customers[0]["product_cost"])
+    for content in ({"status": "success", "data": rows}, {"status": "success", "data": single}):
+        assert dumps(content) == JSONResponse(content).body
+
+    response = columns_response(COLUMNAR_JSON, columns, len(rows))
+    assert response.media_type == COLUMNAR_JSON
+    payload = json.loads(response.body)
+    assert payload["rows"] == len(rows) and list(payload["data"]) == list(columns)
+    assert [dict(zip(payload["data"], values)) for values in zip(*payload["data"].values())] == rows
+    assert len(response.body) < len(dumps({"status": "success", "data": rows})) / 2
+
+    empty = columnar_content({name: np.empty(0) for name in columns}, 0)
+    assert json.loads(dumps(empty))["data"]["dynamic_price"] == []
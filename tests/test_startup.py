@@ -0,0 +1,12 @@
+import subprocess
+import sys
+
+from conftest import project_root
+
+def test_app_import_defers_pandas_and_sklearn():
+    # A fresh interpreter, since this test session has already imported both
+    code = ("import sys, api.app; "
+            "print(sorted(name for name in ('pandas', 'sklearn') if name in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,65 @@
+import asyncio
+import csv
+import io
+import json
+import pytest
+
+from api.pricing_engine import PricingEngine, REQUIRED_FEATURES
+from api.streaming import CSV, NDJSON, stream_prices
+
+@pytest.fixture(scope="module")
+def engine(model_path):
+    return PricingEngine(model_path=model_path, fast_path=True)
+
+def collect(engine, payload: bytes, fmt: str, chunk_size: int, piece: int = 37):
+    """Feed payload in small uneven pieces and return the full streamed output and chunk count"""
+    scored_chunks = []
+
+    async def body():
+        for start in range(0, len(payload), piece):
+            yield payload[start:start + piece]
+
+    async def score(features, costs):
+        scored_chunks.append(len(features))
+        return engine.calculate_dynamic_prices_arrays(features, costs)
+
+    async def run():
+        return "".join([part async for part in stream_prices(body(), fmt, score, chunk_size=chunk_size)])
+
+    return asyncio.run(run()), scored_chunks
+
+def test_ndjson_stream_matches_batch_path(engine, customers):
+    rows = [{"CustomerID": i, **customer} for i, customer in enumerate(customers[:50])]
+    payload = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    output, scored_chunks = collect(engine, payload, NDJSON, chunk_size=16)
+    results = [json.loads(line) for line in output.splitlines()]
+    expected = engine.calculate_dynamic_prices_batch(customers[:50])
+    assert [result.pop("CustomerID") for result in results] == list(range(50))
+    assert results == expected
+    assert scored_chunks == [16, 16, 16, 2]
+
+def test_csv_stream_reports_bad_rows_inline(engine, customers):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["CustomerID"] + REQUIRED_FEATURES)
+    writer.writerow(["CUST001"] + [customers[0][name] for name in REQUIRED_FEATURES])
+    writer.writerow(["CUST002", "not-a-number"] + [1] * (len(REQUIRED_FEATURES) - 1))
+    writer.writerow(["CUST003"] + [customers[1][name] for name in REQUIRED_FEATURES])
+    output, _ = collect(engine, buffer.getvalue().encode(), CSV, chunk_size=100)
+    results = list(csv.DictReader(io.StringIO(output)))
+    assert [row["CustomerID"] for row in results if not row["error"]] == ["CUST001", "CUST003"]
+    assert [row["error"] for row in results if row["error"]] == [
+        "line 3: Invalid value: could not convert string to float: 'not-a-number'"
+    ]
+    expected = engine.calculate_dynamic_price(customers[0], product_cost=50.0)
+    assert float(results[-2]["dynamic_price"]) == expected["dynamic_price"]
+
+def test_ndjson_stream_reports_undecodable_line_inline(engine, customers):
+    lines = [json.dumps(customer).encode() for customer in customers[:2]]
+    payload = lines[0] + b"\n" + b'{"Recency": "\xff"}\n' + lines[1] + b"\n"
+    output, _ = collect(engine, payload, NDJSON, chunk_size=100)
+    results = [json.loads(line) for line in output.splitlines()]
+    assert results[0]["status"] == "error" and results[0]["line"] == 2
+    assert "Unparseable line" in results[0]["message"]
+    assert [result["dynamic_price"] for result in results[1:]] == [
+        row["dynamic_price"] for row in engine.calculate_dynamic_prices_batch(customers[:2])]
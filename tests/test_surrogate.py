@@ -0,0 +1,70 @@
+import shutil
+import sys
+import joblib
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from conftest import DATA_PATH, FEATURES, project_root
+from api.pricing_engine import PricingEngine
+from api.segments import CLVSegments, save_segments
+from api.surrogate import surrogate_artifact_path
+
+sys.path.append(str(project_root / "src/clv_model"))
+from distill_clv_model import CLVModelDistiller, CONFIG
+
+@pytest.fixture(scope="module")
+def teacher_path(model_path, tmp_path_factory):
+    # A private copy, so the surrogate is written next to it rather than the shared model
+    path = tmp_path_factory.mktemp("teacher") / "clv_model.pkl"
+    shutil.copy(model_path, path)
+    distiller = CLVModelDistiller({
+        **CONFIG,
+        'data_path': str(DATA_PATH),
+        'model_path': str(path),
+        'candidates': [{'n_estimators': 1, 'max_depth': 4}, {'n_estimators': 1, 'max_depth': 10}],
+        'tolerance': 0.01
+    })
+    assert distiller.load_data() and distiller.distill() and distiller.save_results()
+    return str(path)
+
+def test_surrogate_prices_within_tolerance(teacher_path, customers):
+    forest = PricingEngine(model_path=teacher_path)
+    surrogate = PricingEngine(model_path=teacher_path, surrogate_tolerance=0.01)
+    assert forest.surrogate_report is None
+    assert surrogate.surrogate_report["max_rel_price_error"] <= 0.01
+    assert len(surrogate.model.estimators_) == 1
+
+    features = [{name: customer[name] for name in FEATURES} for customer in customers]
+    expected = forest.calculate_dynamic_prices_batch(features)
+    actual = surrogate.calculate_dynamic_prices_batch(features)
+    for want, got in zip(expected, actual):
+        # Report errors are measured on held-out customers; allow rounding on top
+        assert got["dynamic_price"] == pytest.approx(want["dynamic_price"], rel=0.02, abs=0.01)
+
+def test_surrogate_rejected_when_too_loose_or_stale(teacher_path, tmp_path):
+    assert PricingEngine(model_path=teacher_path, surrogate_tolerance=0.0).surrogate_report is None
+    # Tied to the teacher's content: a copied (redeployed) teacher keeps its surrogate...
+    copied = tmp_path / "clv_model.pkl"
+    shutil.copy(teacher_path, copied)
+    shutil.copy(surrogate_artifact_path(teacher_path), surrogate_artifact_path(str(copied)))
+    assert PricingEngine(model_path=str(copied), surrogate_tolerance=1.0).surrogate_report is not None
+    # ...and a different model file does not
+    joblib.dump(joblib.load(teacher_path), copied, compress=3)
+    assert PricingEngine(model_path=str(copied), surrogate_tolerance=1.0).surrogate_report is None
+
+def test_price_error_counts_segment_changes(teacher_path, tmp_path):
+    segmented_path = tmp_path / "clv_model.pkl"
+    shutil.copy(teacher_path, segmented_path)
+    config = {**CONFIG, 'data_path': str(DATA_PATH), 'model_path': str(segmented_path)}
+    plain = CLVModelDistiller(config)
+    assert plain.load_data()
+    clv = plain.teacher.predict_clv_batch(plain.X_train)
+    save_segments(str(segmented_path), CLVSegments.from_predictions(clv))
+    segmented = CLVModelDistiller(config)
+    assert segmented.load_data() and len(segmented.pricing_engines) == 2
+
+    # A stump puts many customers on the wrong side of a segment boundary
+    student = DecisionTreeRegressor(max_depth=1).fit(plain.X_train, clv)
+    without_segments, with_segments = plain.price_error(student), segmented.price_error(student)
+    assert with_segments['max_rel_price_error'] >= without_segments['max_rel_price_error']
+    assert with_segments['max_rel_price_error'] >= 0.0476
@@ -0,0 +1,52 @@
+import sys
+from conftest import DATA_PATH, project_root
+from api.segments import load_segments
+
+sys.path.append(str(project_root / "src/clv_model"))
+from train_clv_model import CLVModelTrainer, CONFIG
+
+def make_trainer(tmp_path, selection):
+    config = {
+        **CONFIG,
+        'data_path': str(DATA_PATH),
+        'model_path': str(tmp_path / "clv_model.pkl"),
+        'results_path': str(tmp_path / "clv_results.csv"),
+        'clv_table_path': '',
+        'tuning': {
+            **CONFIG['tuning'],
+            'param_grid': {'max_depth': [3, 8], 'min_samples_leaf': [1, 5]},
+            'tree_schedule': [4, 8],
+            'eta': 2,
+            'selection': selection,
+            'score_tolerance': 0.5,
+            'n_jobs': 1
+        }
+    }
+    trainer = CLVModelTrainer(config)
+    assert trainer.load_data()
+    return trainer
+
+def test_successive_halving_drops_candidates(tmp_path):
+    trainer = make_trainer(tmp_path, 'accuracy')
+    assert trainer.tune_hyperparameters()
+    rungs = [result['rung'] for result in trainer.tuning_results]
+    assert rungs.count(0) == 4 and rungs.count(1) == 2
+    best = min(trainer.tuning_results, key=lambda result: result['rmse'])
+    assert trainer.model_params['n_estimators'] == best['n_estimators']
+    assert trainer.train_model() and trainer.save_results()
+    assert (tmp_path / "tuning_results.csv").exists()
+    assert load_segments(str(tmp_path / "clv_model.pkl")) is not None
+    assert sorted(path.name for path in tmp_path.glob("clv_model.*")) == ["clv_model.pkl", "clv_model.segments.joblib"]
+
+def test_serving_selection_trades_accuracy_for_cost(tmp_path):
+    accurate = make_trainer(tmp_path, 'accuracy')
+    accurate.tune_hyperparameters()
+    serving = make_trainer(tmp_path, 'serving')
+    serving.tune_hyperparameters()
+    cost = {trainer: next(result['serving_cost'] for result in trainer.tuning_results
+                          if result['n_estimators'] == trainer.model_params['n_estimators']
+                          and result['max_depth'] == trainer.model_params['max_depth']
+                          and result['min_samples_leaf'] == trainer.model_params['min_samples_leaf'])
+            for trainer in (accurate, serving)}
+    assert cost[serving] <= cost[accurate]
+    assert isinstance(serving.model_params['max_depth'], int)